@@ -7,4 +7,9 @@ class AuditConfig(AppConfig):
     verbose_name = 'Auditoría'
 
     def ready(self):
-        import apps.audit.signals  # Importar las señales de la app
\ No newline at end of file
+        import apps.audit.signals  # Importar las señales de la app
+        from apps.audit.registry import compile_audit_registry
+
+        # Compilar la política de los modelos auditados y conectar sus señales
+        compile_audit_registry()
+        apps.audit.signals.connect_audit_signals()
\ No newline at end of file
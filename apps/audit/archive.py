@@ -0,0 +1,141 @@
+# archive.py
+import datetime
+import decimal
+import gzip
+import json
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+from pathlib import Path
+
+from django.db import router, transaction
+from django.db.models import Count
+from django.utils.dateparse import parse_datetime
+
+from apps.audit.models import AuditArchive, AuditLog
+from apps.audit.partitions import get_partition_config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 2000
+
+
+class ArchiveEncoder(json.JSONEncoder):
+    """Fechas en ISO 8601 completas (DjangoJSONEncoder recorta los microsegundos)"""
+
+    def default(self, value):
+        if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+            return value.isoformat()
+        if isinstance(value, (decimal.Decimal, uuid.UUID)):
+            return str(value)
+        return super().default(value)
+
+
+def get_archive_path(partition):
+    return Path(get_partition_config()['ARCHIVE_DIR']) / f'auditlog-{partition}.jsonl.gz'
+
+
+def get_partition_counts(before=None):
+    """[(partición, registros)] en la base de datos, opcionalmente anteriores a una partición"""
+    queryset = AuditLog.objects.filter(partition__gt=0)
+    if before is not None:
+        queryset = queryset.filter(partition__lt=before)
+    rows = queryset.order_by().values_list('partition').annotate(rows=Count('pk')).order_by('partition')
+    return list(rows)
+
+
+def iter_archive(path):
+    """Registros (dict por attname) de un archivo JSONL.gz"""
+    with gzip.open(path, 'rt', encoding='utf-8') as archive:
+        for line in archive:
+            if line.strip():
+                yield json.loads(line)
+
+
+def archive_partition(partition, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Mueve los registros de una partición a su archivo JSONL.gz y los elimina
+    de la base de datos. Devuelve el número de registros archivados.
+
+    Los registros se escriben primero en un archivo temporal; solo cuando está
+    completo se añade al archivo de la partición (como un nuevo miembro gzip, de
+    modo que archivar de nuevo el mismo mes acumula en lugar de reemplazar) y se
+    eliminan de la base de datos hasta el último id exportado.
+    """
+    path = get_archive_path(partition)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    columns = [field.attname for field in AuditLog._meta.concrete_fields]
+    queryset = AuditLog.objects.filter(partition=partition).order_by('pk').values(*columns)
+
+    rows = 0
+    last_pk = None
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb') as archive:
+            for row in queryset.iterator(chunk_size=batch_size):
+                archive.write(json.dumps(row, cls=ArchiveEncoder, ensure_ascii=False).encode('utf-8'))
+                archive.write(b'\n')
+                rows += 1
+                last_pk = row['id']
+        if not rows:
+            return 0
+
+        with open(temp_path, 'rb') as source, open(path, 'ab') as target:
+            shutil.copyfileobj(source, target)
+            target.flush()
+            os.fsync(target.fileno())
+    finally:
+        os.unlink(temp_path)
+
+    using = router.db_for_write(AuditLog)
+    deleted = 0
+    while True:
+        with transaction.atomic(using=using):
+            pks = list(
+                AuditLog.objects.filter(partition=partition, pk__lte=last_pk)
+                .order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            deleted += AuditLog.objects.filter(pk__in=pks).delete()[0]
+
+    archive_record, _ = AuditArchive.objects.get_or_create(partition=partition)
+    archive_record.file_path = str(path)
+    archive_record.rows += rows
+    archive_record.size = path.stat().st_size
+    archive_record.save()
+
+    if deleted != rows:
+        logger.warning(f"Partición {partition}: {rows} registros archivados y {deleted} eliminados")
+    return rows
+
+
+def restore_partition(partition, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Devuelve a la base de datos los registros archivados de una partición y
+    elimina su archivo. Devuelve el número de registros leídos.
+    """
+    archive_record = AuditArchive.objects.filter(partition=partition).first()
+    path = Path(archive_record.file_path) if archive_record else get_archive_path(partition)
+    if not path.exists():
+        raise FileNotFoundError(f'No existe el archivo de la partición {partition}: {path}')
+
+    rows = 0
+    batch = []
+    with transaction.atomic(using=router.db_for_write(AuditLog)):
+        for row in iter_archive(path):
+            row['timestamp'] = parse_datetime(row['timestamp'])
+            batch.append(AuditLog(**row))
+            rows += 1
+            if len(batch) >= batch_size:
+                # Los ids se conservan; los repetidos (archivados dos veces) se omiten
+                AuditLog.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        AuditLog.objects.bulk_create(batch, ignore_conflicts=True)
+        if archive_record:
+            archive_record.delete()
+
+    path.unlink()
+    return rows
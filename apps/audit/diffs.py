@@ -0,0 +1,128 @@
+# diffs.py
+from django.conf import settings
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+# Actualizaciones entre dos estados completos de un objeto
+DEFAULT_SNAPSHOT_INTERVAL = 20
+# Acciones que forman la historia de un objeto (las demás no llevan su estado)
+STATE_ACTIONS = ('CREATE', 'UPDATE', 'DELETE')
+
+
+class IncompleteHistory(Exception):
+    """No hay un estado completo del objeto a partir del cual reconstruirlo"""
+
+
+def get_snapshot_interval():
+    """settings.AUDIT_DIFFS = {'SNAPSHOT_INTERVAL': 20}; 1 guarda siempre el estado completo"""
+    return max(1, getattr(settings, 'AUDIT_DIFFS', {}).get('SNAPSHOT_INTERVAL', DEFAULT_SNAPSHOT_INTERVAL))
+
+
+def compute_diff(before, after):
+    """
+    Campos que cambiaron: ({campo: valor anterior}, {campo: valor nuevo}).
+    Los datos serializados omiten los valores nulos, así que un campo que pasa
+    a nulo aparece en el diff nuevo con None.
+    """
+    old, new = {}, {}
+    for key, value in after.items():
+        if before.get(key) != value:
+            new[key] = value
+            if key in before:
+                old[key] = before[key]
+    for key, value in before.items():
+        if key not in after:
+            old[key] = value
+            new[key] = None
+    return old, new
+
+
+def is_snapshot_due(chain):
+    """True si tras `chain` diffs seguidos la próxima actualización debe ser completa"""
+    return chain >= get_snapshot_interval() - 1
+
+
+def get_diff_chains(content_type_id, object_ids):
+    """
+    {object_id: diffs registrados desde el último estado completo} de objetos de
+    un modelo, contando primero los eventos de este contexto aún no escritos
+    (AuditWriter.pending_logs). Solo se cuenta hasta SNAPSHOT_INTERVAL.
+    """
+    from apps.audit.models import AuditLog
+    from apps.audit.writer import get_audit_writer
+
+    interval = get_snapshot_interval()
+    chains = {object_id: 0 for object_id in object_ids}
+    if interval == 1:
+        return chains
+    closed = set()
+    for log in reversed(get_audit_writer().pending_logs()):
+        object_id = log.object_id
+        if log.content_type_id != content_type_id or object_id not in chains or object_id in closed:
+            continue
+        if log.action not in STATE_ACTIONS:
+            continue
+        if log.is_diff:
+            chains[object_id] += 1
+        else:
+            closed.add(object_id)
+
+    open_ids = [object_id for object_id in chains if object_id not in closed and chains[object_id] < interval]
+    if not open_ids:
+        return chains
+
+    events = AuditLog.objects.filter(content_type_id=content_type_id, action__in=STATE_ACTIONS)
+    if len(open_ids) == 1:
+        # Un objeto: los últimos eventos por el índice (content_type, object_id, -timestamp)
+        rows = (
+            (open_ids[0], is_diff) for is_diff in
+            events.filter(object_id=open_ids[0]).order_by('-timestamp', '-pk')
+            .values_list('is_diff', flat=True)[:interval]
+        )
+    else:
+        # Varios objetos (bulk_update): los últimos eventos de cada uno en una consulta
+        rows = (
+            events.filter(object_id__in=open_ids)
+            .annotate(position=Window(
+                RowNumber(), partition_by=[F('object_id')], order_by=[F('timestamp').desc(), F('pk').desc()]
+            ))
+            .filter(position__lte=interval)
+            .order_by('object_id', 'position')
+            .values_list('object_id', 'is_diff')
+        )
+    for object_id, is_diff in rows:
+        if object_id in closed:
+            continue
+        if is_diff:
+            chains[object_id] += 1
+        else:
+            closed.add(object_id)
+    return chains
+
+
+def build_update(before, after, chain=0):
+    """
+    (data_before, data_after, is_diff) de un evento UPDATE. data_before siempre
+    lleva solo los valores anteriores de los campos modificados; data_after el
+    diff, salvo cuando el objeto acumula SNAPSHOT_INTERVAL - 1 diffs desde su
+    último estado completo (`chain`, ver get_diff_chains) o el estado anterior no
+    se conoce: entonces guarda todos los campos, de modo que reconstruir un
+    objeto nunca aplica más de SNAPSHOT_INTERVAL - 1 diffs.
+
+    Para un estado completo `after` debe incluir todos los campos auditados
+    (AuditPolicy.serialize_complete si la instancia tenía campos diferidos).
+    """
+    old, new = compute_diff(before, after)
+    if not before or is_snapshot_due(chain):
+        return old, after, False
+    return old, new, True
+
+
+def apply_diff(state, diff):
+    """Aplica el diff de data_after sobre el estado (None elimina el campo)"""
+    for key, value in diff.items():
+        if value is None:
+            state.pop(key, None)
+        else:
+            state[key] = value
+    return state
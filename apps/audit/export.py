@@ -0,0 +1,107 @@
+# export.py
+import datetime
+import json
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import F, Q
+from django.utils import timezone
+
+from apps.audit.archive import ArchiveEncoder
+from apps.audit.models import AuditLog
+
+DEFAULT_CHUNK_SIZE = 2000
+DEFAULT_SETTLE_SECONDS = 5
+DEFAULT_MAX_LIMIT = 10000
+
+
+def get_export_config():
+    """settings.AUDIT_EXPORT = {'SETTLE_SECONDS': 5, 'MAX_LIMIT': 10000, 'CHUNK_SIZE': 2000}"""
+    config = getattr(settings, 'AUDIT_EXPORT', {})
+    return {
+        'SETTLE_SECONDS': max(0, int(config.get('SETTLE_SECONDS', DEFAULT_SETTLE_SECONDS))),
+        'MAX_LIMIT': max(1, int(config.get('MAX_LIMIT', DEFAULT_MAX_LIMIT))),
+        'CHUNK_SIZE': max(1, int(config.get('CHUNK_SIZE', DEFAULT_CHUNK_SIZE))),
+    }
+
+
+def get_content_type(label):
+    """ContentType de 'app_label.Modelo'; LookupError/ValueError si no existe"""
+    return ContentType.objects.get_for_model(apps.get_model(label), for_concrete_model=False)
+
+
+def get_model_label(content_type_id):
+    """'app_label.Modelo' de un ContentType (de su caché: sin consulta por registro)"""
+    if content_type_id is None:
+        return None
+    content_type = ContentType.objects.get_for_id(content_type_id)
+    model = content_type.model_class()
+    return model._meta.label if model else '.'.join(content_type.natural_key())
+
+
+def filter_export(queryset, models=None, actions=None):
+    """Filtra por modelos ('app_label.Modelo') y acciones"""
+    if models:
+        queryset = queryset.filter(content_type__in=[get_content_type(label) for label in models])
+    if actions:
+        queryset = queryset.filter(action__in=actions)
+    return queryset
+
+
+def get_settled_bound(after=0):
+    """
+    Último id que se puede exportar sin saltarse registros; None si no hay
+    registros nuevos.
+
+    Los ids se asignan al insertar pero se hacen visibles al confirmar: mientras
+    una escritura grande sigue en curso, otra posterior (con ids mayores) puede
+    confirmarse antes. Por eso el corte es el mayor id insertado antes de los
+    últimos SETTLE_SECONDS (AuditLog.inserted_at, no la hora del evento, que
+    puede ser muy anterior a la escritura): todo registro aún sin confirmar se
+    insertó después y tiene un id mayor. Los registros sin inserted_at (previos
+    a la columna) cuentan como confirmados.
+    """
+    queryset = AuditLog.objects.filter(pk__gt=after).order_by('-pk').values_list('pk', flat=True)
+    settle = get_export_config()['SETTLE_SECONDS']
+    if settle:
+        cutoff = timezone.now() - datetime.timedelta(seconds=settle)
+        # Recorre el índice de la clave desde el final: solo lee las inserciones recientes
+        queryset = queryset.filter(Q(inserted_at__lte=cutoff) | Q(inserted_at__isnull=True))
+    return queryset.first()
+
+
+def get_export_window(after=0, limit=None, models=None, actions=None):
+    """
+    (queryset, marca) con los registros posteriores al id `after`, en orden de
+    id y como mucho `limit`. La marca es el id hasta el que quedan exportados
+    (incluido): la siguiente lectura continúa con after=marca. Con filtros la
+    marca avanza también sobre los registros que no coinciden, para no volver a
+    recorrerlos.
+    """
+    queryset = filter_export(AuditLog.objects.all(), models, actions)
+    bound = get_settled_bound(after)
+    if bound is None:
+        return queryset.none(), after
+
+    queryset = queryset.filter(pk__gt=after, pk__lte=bound).order_by('pk')
+    if limit:
+        # Recorre como mucho `limit` entradas del índice a partir de `after`
+        last = list(queryset.values_list('pk', flat=True)[limit - 1:limit])
+        if last:
+            bound = last[0]
+            queryset = queryset.filter(pk__lte=bound)
+    return queryset, bound
+
+
+def iter_export(queryset, chunk_size=None):
+    """
+    Registros en NDJSON (una línea por registro, en bytes): las columnas de
+    AuditLog como en los archivos de archive_audit_logs, más el modelo
+    ('app_label.Modelo') y el nombre del usuario.
+    """
+    columns = [field.attname for field in AuditLog._meta.concrete_fields]
+    rows = queryset.values(*columns, username=F('user__username'))
+    for row in rows.iterator(chunk_size=chunk_size or get_export_config()['CHUNK_SIZE']):
+        row['model'] = get_model_label(row['content_type_id'])
+        yield json.dumps(row, cls=ArchiveEncoder, ensure_ascii=False).encode('utf-8') + b'\n'
@@ -0,0 +1,111 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.audit.archive import (
+    DEFAULT_BATCH_SIZE, archive_partition, get_archive_path, get_partition_counts, restore_partition,
+)
+from apps.audit.models import AuditArchive
+from apps.audit.partitions import format_partition, get_archive_cutoff, parse_partition
+
+
+class Command(BaseCommand):
+    help = (
+        'Mueve las particiones mensuales antiguas de AuditLog a archivos comprimidos '
+        '(JSONL.gz) y las elimina de la base de datos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months',
+            type=int,
+            help='Meses (incluido el actual) que se conservan en la base de datos. '
+                 'Por defecto AUDIT_PARTITIONS["ARCHIVE_AFTER_MONTHS"]'
+        )
+        parser.add_argument(
+            '--partition',
+            action='append',
+            dest='partitions',
+            help='Partición a archivar (AAAAMM, se puede repetir) en lugar de las anteriores a --months'
+        )
+        parser.add_argument(
+            '--restore',
+            action='append',
+            help='Partición archivada (AAAAMM) a devolver a la base de datos'
+        )
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='Mostrar las particiones en la base de datos y las archivadas'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Mostrar las particiones que se archivarían sin modificar nada'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='Registros por lote al leer y eliminar'
+        )
+
+    def handle(self, *args, **options):
+        if options['list']:
+            return self.list_partitions()
+
+        if options['restore']:
+            for value in options['restore']:
+                partition = self.parse(value)
+                try:
+                    rows = restore_partition(partition, batch_size=options['batch_size'])
+                except FileNotFoundError as e:
+                    raise CommandError(str(e))
+                self.stdout.write(self.style.SUCCESS(
+                    f"{format_partition(partition)}: {rows} registros restaurados"
+                ))
+            return
+
+        if options['months'] is not None and options['months'] < 1:
+            raise CommandError('--months debe ser al menos 1')
+
+        counts = dict(get_partition_counts(before=get_archive_cutoff(options['months'])))
+        if options['partitions']:
+            selected = [self.parse(value) for value in options['partitions']]
+            all_counts = dict(get_partition_counts())
+            counts = {partition: all_counts.get(partition, 0) for partition in selected}
+
+        if not any(counts.values()):
+            self.stdout.write('No hay particiones para archivar')
+            return
+
+        for partition, rows in sorted(counts.items()):
+            label = format_partition(partition)
+            if options['dry_run']:
+                self.stdout.write(f"{label}: {rows} registros -> {get_archive_path(partition)}")
+                continue
+
+            start = time.monotonic()
+            archived = archive_partition(partition, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f"{label}: {archived} registros archivados en {get_archive_path(partition)} "
+                f"({time.monotonic() - start:.2f}s)"
+            ))
+
+    def parse(self, value):
+        try:
+            return parse_partition(value)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+    def list_partitions(self):
+        self.stdout.write('En la base de datos:')
+        for partition, rows in get_partition_counts():
+            self.stdout.write(f"  {format_partition(partition)}: {rows} registros")
+
+        self.stdout.write('Archivadas:')
+        for archive in AuditArchive.objects.all():
+            self.stdout.write(
+                f"  {format_partition(archive.partition)}: {archive.rows} registros, "
+                f"{archive.size / 1024:.1f} KB en {archive.file_path}"
+            )
@@ -0,0 +1,174 @@
+import datetime
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router
+from django.test import RequestFactory
+from django.utils import timezone
+
+from apps.audit.models import AuditLog
+from apps.audit.registry import get_audited_models
+from apps.audit.views import AuditLogListView
+
+# Marca de los registros sintéticos, para poder eliminarlos con --cleanup
+BENCHMARK_TABLE = '__benchmark__'
+ACTIONS = ['CREATE', 'UPDATE', 'UPDATE', 'UPDATE', 'DELETE', 'LOGIN', 'VIEW']
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide la latencia (p50/p95) de AuditLogListView para las combinaciones de filtros '
+        'que ofrece, opcionalmente sobre registros sintéticos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Registros sintéticos a insertar antes de medir (p.ej. 10000000)'
+        )
+        parser.add_argument(
+            '--months',
+            type=int,
+            default=12,
+            help='Meses hacia atrás en los que se reparten los registros sintéticos'
+        )
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=20,
+            help='Repeticiones por escenario'
+        )
+        parser.add_argument(
+            '--explain',
+            action='store_true',
+            help='Mostrar el plan de la consulta de cada escenario'
+        )
+        parser.add_argument(
+            '--cleanup',
+            action='store_true',
+            help='Eliminar los registros sintéticos y terminar'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Registros por lote al insertar'
+        )
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            deleted, _ = AuditLog.objects.filter(table_name=BENCHMARK_TABLE).delete()
+            self.stdout.write(self.style.SUCCESS(f'{deleted} registros sintéticos eliminados'))
+            return
+
+        if options['seed']:
+            self.seed(options['seed'], options['months'], options['batch_size'])
+
+        total = AuditLog.objects.count()
+        if not total:
+            raise CommandError('No hay registros de auditoría; use --seed para generar registros sintéticos')
+        self.stdout.write(f'Registros en AuditLog: {total}')
+
+        for name, params in self.get_scenarios():
+            timings = []
+            for _ in range(options['runs']):
+                start = time.perf_counter()
+                queryset = self.run_view(params)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(round(len(timings) * 0.95)) - 1)]
+            self.stdout.write(
+                f'{name:<28} p50 {statistics.median(timings):8.1f} ms   p95 {p95:8.1f} ms   '
+                f'máx {timings[-1]:8.1f} ms'
+            )
+            if options['explain']:
+                self.stdout.write(self.style.NOTICE(f'    {queryset.explain()}'.replace('\n', '\n    ')))
+
+    def run_view(self, params):
+        """Consulta, pagina y arma el contexto de la primera página (sin renderizar la plantilla)"""
+        request = RequestFactory().get('/', params)
+        request.user = AnonymousUser()
+        view = AuditLogListView()
+        view.setup(request)
+        view.object_list = view.get_queryset()
+        context = view.get_context_data()
+        list(context['object_list'])
+        list(context['users'])
+        return view.object_list
+
+    def get_scenarios(self):
+        """Escenarios con valores tomados de los registros existentes"""
+        sample = AuditLog.objects.filter(content_type__isnull=False, user__isnull=False).hot().first()
+        if sample is None:
+            sample = AuditLog.objects.filter(content_type__isnull=False).first()
+        scenarios = [('sin filtros', {})]
+        if sample is not None:
+            model = sample.content_type.model_class()
+            model_id = f'{model._meta.app_label}.{model.__name__}' if model else None
+            if model_id:
+                scenarios += [
+                    ('modelo', {'model': model_id}),
+                    ('modelo + acción', {'model': model_id, 'action': 'UPDATE'}),
+                    ('modelo + objeto', {'model': model_id, 'object_id': sample.object_id}),
+                ]
+            if sample.user_id:
+                scenarios.append(('usuario', {'user': str(sample.user_id)}))
+        old = timezone.localtime() - datetime.timedelta(days=300)
+        scenarios += [
+            ('acción + este mes', {'action': 'DELETE', 'period': 'month'}),
+            ('rango antiguo (1 mes)', {
+                'date_start': old.strftime('%Y-%m-%d'),
+                'date_end': (old + datetime.timedelta(days=30)).strftime('%Y-%m-%d'),
+            }),
+            ('búsqueda de texto', {'search': 'zz-no-existe'}),
+        ]
+        return scenarios
+
+    def seed(self, count, months, batch_size):
+        content_types = [ContentType.objects.get_for_model(model) for model in get_audited_models()][:20]
+        if not content_types:
+            raise CommandError('No hay modelos auditados para generar registros')
+        user_ids = list(get_user_model().objects.values_list('pk', flat=True)[:50]) or [None]
+
+        now = timezone.now()
+        span = months * 30 * 24 * 3600
+        rng = random.Random(42)
+        start = time.monotonic()
+        using = router.db_for_write(AuditLog)
+        created = 0
+        while created < count:
+            size = min(batch_size, count - created)
+            logs = []
+            for _ in range(size):
+                content_type = rng.choice(content_types)
+                action = rng.choice(ACTIONS)
+                logs.append(AuditLog(
+                    user_id=rng.choice(user_ids),
+                    action=action,
+                    timestamp=now - datetime.timedelta(seconds=rng.randrange(span)),
+                    content_type=content_type,
+                    object_id=str(rng.randrange(1, 200000)),
+                    table_name=BENCHMARK_TABLE,
+                    data_after={'benchmark': True},
+                    description=f'{action} en {content_type.model}',
+                    ip_address='127.0.0.1',
+                ))
+            # Fuera del resumen de usuarios y modelos: --cleanup solo elimina los registros
+            AuditLog.objects.bulk_create(logs, summary=False)
+            created += size
+            if created % (batch_size * 20) == 0 or created == count:
+                self.stdout.write(f'  {created}/{count} registros ({time.monotonic() - start:.0f}s)')
+
+        if connections[using].vendor == 'postgresql':
+            with connections[using].cursor() as cursor:
+                cursor.execute(f'ANALYZE "{AuditLog._meta.db_table}"')
+        elif connections[using].vendor == 'sqlite':
+            with connections[using].cursor() as cursor:
+                cursor.execute('ANALYZE')
@@ -0,0 +1,128 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.audit.export import get_export_config, get_export_window, iter_export
+
+
+class Command(BaseCommand):
+    help = (
+        'Exporta los registros de auditoría en NDJSON, en orden de id, a partir de una marca '
+        'que se puede guardar en un archivo para continuar en la siguiente ejecución'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--after',
+            type=int,
+            help='Exportar los registros con id mayor a este (por defecto el de --watermark-file, o 0)'
+        )
+        parser.add_argument(
+            '--watermark-file',
+            help='Archivo con el último id exportado; se actualiza tras escribir cada lote'
+        )
+        parser.add_argument(
+            '--output',
+            default='-',
+            help='Archivo NDJSON al que se añaden los registros ("-" para la salida estándar)'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Registros por lote. Por defecto AUDIT_EXPORT["MAX_LIMIT"]'
+        )
+        parser.add_argument(
+            '--model',
+            action='append',
+            dest='models',
+            help='Modelo a exportar (app_label.Modelo, se puede repetir)'
+        )
+        parser.add_argument(
+            '--action',
+            action='append',
+            dest='actions',
+            help='Acción a exportar (CREATE, UPDATE, ..., se puede repetir)'
+        )
+        parser.add_argument(
+            '--follow',
+            action='store_true',
+            help='No terminar: seguir exportando los registros nuevos'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Segundos de espera entre consultas con --follow cuando no hay registros nuevos'
+        )
+
+    def handle(self, *args, **options):
+        watermark_file = Path(options['watermark_file']) if options['watermark_file'] else None
+        after = options['after']
+        if after is None:
+            after = self.read_watermark(watermark_file) if watermark_file else 0
+        limit = options['limit'] or get_export_config()['MAX_LIMIT']
+        if after < 0 or limit < 1:
+            raise CommandError('--after y --limit deben ser enteros positivos')
+
+        to_stdout = options['output'] == '-'
+        # Con la salida estándar ocupada por los registros, los mensajes van a stderr
+        log = self.stderr if to_stdout else self.stdout
+        output = sys.stdout.buffer if to_stdout else open(options['output'], 'ab')
+
+        total = 0
+        try:
+            while True:
+                try:
+                    queryset, watermark = get_export_window(
+                        after=after, limit=limit, models=options['models'], actions=options['actions'],
+                    )
+                except (LookupError, ValueError) as e:
+                    raise CommandError(f'Modelo no válido: {e}')
+
+                rows = 0
+                for line in iter_export(queryset):
+                    output.write(line)
+                    rows += 1
+                if rows:
+                    output.flush()
+                    if not to_stdout:
+                        os.fsync(output.fileno())
+                total += rows
+
+                # La marca se guarda solo después de escribir el lote: si el
+                # proceso se interrumpe, el lote se repite en lugar de perderse
+                if watermark != after:
+                    after = watermark
+                    if watermark_file:
+                        self.write_watermark(watermark_file, after)
+                    if rows:
+                        log.write(f'{rows} registros exportados (marca {after})')
+                    continue
+
+                if not options['follow']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if not to_stdout:
+                output.close()
+
+        log.write(self.style.SUCCESS(f'{total} registros exportados. Marca: {after}'))
+
+    def read_watermark(self, path):
+        if not path.exists():
+            return 0
+        try:
+            return int(path.read_text().strip() or 0)
+        except ValueError:
+            raise CommandError(f'El archivo de marca {path} no contiene un id válido')
+
+    def write_watermark(self, path, value):
+        # Reemplazo atómico: nunca queda un archivo de marca a medio escribir
+        temp_path = path.with_name(f'{path.name}.tmp')
+        temp_path.write_text(f'{value}\n')
+        os.replace(temp_path, path)
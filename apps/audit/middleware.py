@@ -1,5 +1,6 @@
 # middleware.py
-from apps.audit.signals import thread_local
+from apps.audit.signals import audit_context
+from apps.audit.writer import get_audit_writer
 
 class AuditMiddleware:
     """
@@ -9,22 +10,13 @@ class AuditMiddleware:
         self.get_response = get_response
 
     def __call__(self, request):
-        # Almacenar el usuario y la solicitud en la variable local de thread
-        if hasattr(request, 'user') and request.user.is_authenticated:
-            thread_local.request_user = request.user
-        else:
-            # Si no hay usuario autenticado, eliminar si existe previamente
-            if hasattr(thread_local, 'request_user'):
-                del thread_local.request_user
-                
-        # Almacenar la solicitud para acceder a información como IP, user-agent, etc.
-        thread_local.request = request
+        # Usuario autenticado de la solicitud (None si es anónimo)
+        user = request.user if hasattr(request, 'user') and request.user.is_authenticated else None
         
-        # Procesar la solicitud
-        response = self.get_response(request)
-        
-        # Limpiar después de procesar
-        if hasattr(thread_local, 'request'):
-            del thread_local.request
+        # Publicar el usuario y la solicitud (IP, user-agent, etc.) solo durante
+        # esta solicitud; los eventos de auditoría confirmados durante ella se
+        # escriben juntos al terminar
+        with audit_context(request=request, user=user), get_audit_writer().request_scope():
+            response = self.get_response(request)
             
-        return response
\ No newline at end of file
+        return response
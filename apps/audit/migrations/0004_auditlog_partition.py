@@ -0,0 +1,53 @@
+# Generated by Django 5.1.7 on 2026-10-17 11:05
+
+import datetime
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_partitions(apps, schema_editor):
+    """Asigna la partición (AAAAMM, hora local) a los registros existentes, mes a mes"""
+    AuditLog = apps.get_model('audit', 'AuditLog')
+    pending = AuditLog.objects.using(schema_editor.connection.alias).filter(partition=0)
+    for month in pending.dates('timestamp', 'month'):
+        start = datetime.datetime(month.year, month.month, 1)
+        end = datetime.datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+        if settings.USE_TZ:
+            start, end = timezone.make_aware(start), timezone.make_aware(end)
+        pending.filter(timestamp__gte=start, timestamp__lt=end).update(
+            partition=month.year * 100 + month.month
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0003_alter_auditlog_timestamp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('partition', models.PositiveIntegerField(unique=True, verbose_name='Partición')),
+                ('file_path', models.CharField(max_length=500, verbose_name='Archivo')),
+                ('rows', models.PositiveIntegerField(default=0, verbose_name='Registros')),
+                ('size', models.PositiveBigIntegerField(default=0, verbose_name='Tamaño (bytes)')),
+                ('archived_at', models.DateTimeField(auto_now=True, verbose_name='Fecha de archivo')),
+            ],
+            options={
+                'verbose_name': 'Archivo de auditoría',
+                'verbose_name_plural': 'Archivos de auditoría',
+                'ordering': ['-partition'],
+            },
+        ),
+        migrations.AddField(
+            model_name='auditlog',
+            name='partition',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='Partición'),
+        ),
+        migrations.RunPython(fill_partitions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 5.1.7 on 2026-10-17 12:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def fill_summary(apps, schema_editor):
+    """Usuarios y modelos distintos de los registros existentes"""
+    alias = schema_editor.connection.alias
+    AuditLog = apps.get_model('audit', 'AuditLog')
+    AuditUser = apps.get_model('audit', 'AuditUser')
+    AuditContentType = apps.get_model('audit', 'AuditContentType')
+    logs = AuditLog.objects.using(alias).order_by()
+
+    users = logs.filter(user__isnull=False).values('user_id').annotate(seen=Min('timestamp'))
+    AuditUser.objects.using(alias).bulk_create(
+        [AuditUser(user_id=row['user_id'], first_seen=row['seen']) for row in users],
+        ignore_conflicts=True,
+    )
+    content_types = logs.filter(content_type__isnull=False).values('content_type_id').annotate(seen=Min('timestamp'))
+    AuditContentType.objects.using(alias).bulk_create(
+        [AuditContentType(content_type_id=row['content_type_id'], first_seen=row['seen']) for row in content_types],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0004_auditlog_partition'),
+        ('base', '0001_initial'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditContentType',
+            fields=[
+                ('content_type', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='contenttypes.contenttype', verbose_name='Tipo de contenido')),
+                ('first_seen', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Primer registro')),
+            ],
+            options={
+                'verbose_name': 'Modelo auditado',
+                'verbose_name_plural': 'Modelos auditados',
+            },
+        ),
+        migrations.CreateModel(
+            name='AuditUser',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+                ('first_seen', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Primer registro')),
+            ],
+            options={
+                'verbose_name': 'Usuario auditado',
+                'verbose_name_plural': 'Usuarios auditados',
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='auditlog',
+            name='audit_audit_user_id_292c79_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='auditlog',
+            name='audit_audit_action_86e815_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='auditlog',
+            name='audit_audit_content_4c2ead_idx',
+        ),
+        migrations.AlterField(
+            model_name='auditlog',
+            name='content_type',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype', verbose_name='Tipo de contenido'),
+        ),
+        migrations.AlterField(
+            model_name='auditlog',
+            name='user',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='audit_logs', to=settings.AUTH_USER_MODEL, verbose_name='Usuario'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['user', '-timestamp'], name='audit_audit_user_id_ea8c9f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['action', '-timestamp'], name='audit_audit_action_e33994_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['content_type', '-timestamp'], name='audit_audit_content_72ada2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['content_type', 'action', '-timestamp'], name='audit_audit_content_c0a6f4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['content_type', 'object_id', '-timestamp'], name='audit_audit_content_b00bcf_idx'),
+        ),
+        migrations.RunPython(fill_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-17 13:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0005_auditlog_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditlog',
+            name='is_diff',
+            field=models.BooleanField(default=False, verbose_name='Solo cambios'),
+        ),
+    ]
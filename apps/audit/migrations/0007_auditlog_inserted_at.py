@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-17 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0006_auditlog_is_diff'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditlog',
+            name='inserted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Fecha de inserción'),
+        ),
+    ]
@@ -1 +1 @@
-from .audit import AuditLog
\ No newline at end of file
+from .audit import AuditArchive, AuditContentType, AuditLog, AuditUser
\ No newline at end of file
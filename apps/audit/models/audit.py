@@ -2,10 +2,109 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from apps.audit.partitions import get_hot_partition, partition_bounds, partition_for
+
 User = get_user_model()
 
+class AuditLogQuerySet(models.QuerySet):
+    """
+    Consultas por partición mensual (AuditLog.partition = AAAAMM): las vistas
+    leen solo los meses recientes (hot) salvo que el rango pida anteriores, y
+    el archivo mueve particiones completas (for_partitions).
+    """
+
+    def for_partitions(self, first=None, last=None):
+        if first is not None:
+            self = self.filter(partition__gte=first)
+        if last is not None:
+            self = self.filter(partition__lte=last)
+        return self
+
+    def hot(self):
+        """Solo las particiones recientes (settings.AUDIT_PARTITIONS['HOT_MONTHS'])"""
+        # El límite por timestamp permite recorrer los índices (..., timestamp)
+        return self.in_range(start=partition_bounds(get_hot_partition())[0])
+
+    def in_range(self, start=None, end=None):
+        """
+        Registros con start <= timestamp < end. El rango ya determina las
+        particiones: repetirlo sobre partition obligaría a leer cada fila en lugar
+        de resolver la consulta (y el COUNT de la paginación) con los índices
+        (..., timestamp).
+        """
+        queryset = self
+        if start is not None:
+            queryset = queryset.filter(timestamp__gte=start)
+        if end is not None:
+            queryset = queryset.filter(timestamp__lt=end)
+        return queryset
+
+    def state_at(self, model, pk, at=None):
+        """
+        Estado registrado (datos serializados) de un objeto en la fecha indicada,
+        o el último si no se indica; None si en ese momento no existía (antes de
+        crearse o tras eliminarse) o no tiene registros.
+
+        Parte del último estado completo anterior a la fecha (creación, UPDATE
+        completo o eliminación) y aplica en orden los diffs posteriores, de modo
+        que solo se leen los eventos desde ese estado. Si hay diffs pero ningún
+        estado completo anterior (p.ej. porque su mes fue archivado con
+        archive_audit_logs) lanza IncompleteHistory en lugar de devolver un
+        estado parcial.
+        """
+        from apps.audit.diffs import STATE_ACTIONS, IncompleteHistory, apply_diff
+
+        content_type = ContentType.objects.get_for_model(model)
+        events = self.filter(content_type=content_type, object_id=str(pk), action__in=STATE_ACTIONS)
+        if at is not None:
+            events = events.filter(timestamp__lte=at)
+
+        fields = ('pk', 'timestamp', 'action', 'data_before', 'data_after')
+        base = events.filter(is_diff=False).order_by('-timestamp', '-pk').values(*fields).first()
+        diffs = events.filter(is_diff=True)
+        if base is None:
+            if diffs.exists():
+                raise IncompleteHistory(
+                    f'{model._meta.label} {pk}: no hay un estado completo anterior a los cambios '
+                    'registrados (¿partición archivada?)'
+                )
+            return None
+        if base['action'] == 'DELETE':
+            return None
+
+        state = dict(base['data_after'] or {})
+        diffs = diffs.filter(
+            models.Q(timestamp__gt=base['timestamp']) | models.Q(timestamp=base['timestamp'], pk__gt=base['pk'])
+        )
+        for diff in diffs.order_by('timestamp', 'pk').values_list('data_after', flat=True).iterator():
+            apply_diff(state, diff or {})
+        return state
+
+    def bulk_create(self, objs, batch_size=None, summary=True, **kwargs):
+        # bulk_create no llama a save(): asignar aquí la partición y la hora de
+        # inserción, esta por lote, justo antes de insertarlo. summary=False no
+        # registra usuarios ni modelos en el resumen (registros sintéticos)
+        from apps.audit.summary import record_summary
+
+        objs = list(objs)
+        for obj in objs:
+            obj.set_partition()
+        step = batch_size or len(objs) or 1
+        created = []
+        for start in range(0, len(objs), step):
+            batch = objs[start:start + step]
+            inserted_at = timezone.now()
+            for obj in batch:
+                obj.inserted_at = inserted_at
+            created += super().bulk_create(batch, **kwargs)
+        if summary:
+            record_summary(objs)
+        return created
+
+
 class AuditLog(models.Model):
     """
     Modelo para registrar todas las actividades de CRUD en las tablas de la aplicación
@@ -26,17 +125,35 @@ class AuditLog(models.Model):
         null=True, 
         blank=True,
         verbose_name=_('Usuario'),
-        related_name='audit_logs'
+        related_name='audit_logs',
+        db_index=False  # Cubierto por el índice (user, timestamp)
     )
     action = models.CharField(
         max_length=20, 
         choices=ACTION_CHOICES, 
         verbose_name=_('Acción')
     )
+    # Hora del evento (no de la escritura, que puede diferirse por lotes o Celery)
     timestamp = models.DateTimeField(
-        auto_now_add=True, 
+        default=timezone.now,
+        editable=False,
         verbose_name=_('Fecha y hora')
     )
+    # Hora de la inserción (AuditLog.save / bulk_create). La exportación la usa
+    # para no adelantar su marca sobre registros que aún no se confirmaron
+    inserted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name=_('Fecha de inserción')
+    )
+    # Mes del evento (AAAAMM), clave de partición para consultar y archivar por meses
+    partition = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        db_index=True,
+        verbose_name=_('Partición')
+    )
     ip_address = models.GenericIPAddressField(
         null=True, 
         blank=True, 
@@ -54,7 +171,8 @@ class AuditLog(models.Model):
         on_delete=models.CASCADE,
         null=True,
         blank=True,
-        verbose_name=_('Tipo de contenido')
+        verbose_name=_('Tipo de contenido'),
+        db_index=False  # Cubierto por los índices (content_type, ...)
     )
     object_id = models.CharField(
         max_length=255, 
@@ -86,20 +204,97 @@ class AuditLog(models.Model):
         blank=True,
         verbose_name=_('Descripción')
     )
+    # UPDATE con solo los campos modificados en data_after (ver apps.audit.diffs);
+    # False en los estados completos y en los demás eventos
+    is_diff = models.BooleanField(
+        default=False,
+        verbose_name=_('Solo cambios')
+    )
+    
+    objects = AuditLogQuerySet.as_manager()
     
     class Meta:
         verbose_name = _('Registro de auditoría')
         verbose_name_plural = _('Registros de auditoría')
         ordering = ['-timestamp']
+        # Compuestos según los filtros de AuditLogListView, terminando en la
+        # fecha para filtrar por rango y ordenar sin un paso de ordenamiento
         indexes = [
-            models.Index(fields=['user']),
-            models.Index(fields=['action']),
+            models.Index(fields=['user', '-timestamp']),
+            models.Index(fields=['action', '-timestamp']),
+            models.Index(fields=['content_type', '-timestamp']),
+            models.Index(fields=['content_type', 'action', '-timestamp']),
+            models.Index(fields=['content_type', 'object_id', '-timestamp']),
             models.Index(fields=['timestamp']),
-            models.Index(fields=['content_type', 'object_id']),
             models.Index(fields=['table_name']),
         ]
     
     def __str__(self):
         if self.user:
             return f"{self.get_action_display()} por {self.user.username} en {self.timestamp}"
-        return f"{self.get_action_display()} en {self.timestamp}"
\ No newline at end of file
+        return f"{self.get_action_display()} en {self.timestamp}"
+    
+    def set_partition(self):
+        if self.timestamp is None:
+            self.timestamp = timezone.now()
+        self.partition = partition_for(self.timestamp)
+    
+    def save(self, *args, **kwargs):
+        from apps.audit.summary import record_summary
+
+        self.set_partition()
+        if self._state.adding:
+            self.inserted_at = timezone.now()
+        super().save(*args, **kwargs)
+        record_summary([self])
+
+
+class AuditArchive(models.Model):
+    """
+    Partición de AuditLog movida a un archivo comprimido (JSONL.gz) por el
+    comando archive_audit_logs.
+    """
+    partition = models.PositiveIntegerField(unique=True, verbose_name=_('Partición'))
+    file_path = models.CharField(max_length=500, verbose_name=_('Archivo'))
+    rows = models.PositiveIntegerField(default=0, verbose_name=_('Registros'))
+    size = models.PositiveBigIntegerField(default=0, verbose_name=_('Tamaño (bytes)'))
+    archived_at = models.DateTimeField(auto_now=True, verbose_name=_('Fecha de archivo'))
+    
+    class Meta:
+        verbose_name = _('Archivo de auditoría')
+        verbose_name_plural = _('Archivos de auditoría')
+        ordering = ['-partition']
+    
+    def __str__(self):
+        return f"{self.partition}: {self.rows} registros"
+
+
+class AuditUser(models.Model):
+    """
+    Usuarios con registros de auditoría. Se mantiene al escribir los registros
+    para no recorrer AuditLog al armar los filtros de la vista.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, verbose_name=_('Usuario'))
+    first_seen = models.DateTimeField(default=timezone.now, verbose_name=_('Primer registro'))
+    
+    class Meta:
+        verbose_name = _('Usuario auditado')
+        verbose_name_plural = _('Usuarios auditados')
+    
+    def __str__(self):
+        return str(self.user)
+
+
+class AuditContentType(models.Model):
+    """Modelos con registros de auditoría (ver AuditUser)"""
+    content_type = models.OneToOneField(
+        ContentType, on_delete=models.CASCADE, primary_key=True, verbose_name=_('Tipo de contenido')
+    )
+    first_seen = models.DateTimeField(default=timezone.now, verbose_name=_('Primer registro'))
+    
+    class Meta:
+        verbose_name = _('Modelo auditado')
+        verbose_name_plural = _('Modelos auditados')
+    
+    def __str__(self):
+        return str(self.content_type)
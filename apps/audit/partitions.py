@@ -0,0 +1,91 @@
+# partitions.py
+import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+# Meses (incluido el actual) que se consultan por defecto en las vistas
+DEFAULT_HOT_MONTHS = 3
+# Meses que se conservan en la base de datos antes de archivarse
+DEFAULT_ARCHIVE_AFTER_MONTHS = 12
+
+
+def get_partition_config():
+    """
+    settings.AUDIT_PARTITIONS = {
+        'HOT_MONTHS': 3,              # Consultados por defecto en las vistas
+        'ARCHIVE_AFTER_MONTHS': 12,   # Antigüedad a partir de la cual se archivan
+        'ARCHIVE_DIR': BASE_DIR / 'archive' / 'audit',
+    }
+    """
+    config = getattr(settings, 'AUDIT_PARTITIONS', {})
+    archive_dir = config.get('ARCHIVE_DIR')
+    if archive_dir is None:
+        archive_dir = Path(getattr(settings, 'BASE_DIR', '')) / 'archive' / 'audit'
+    return {
+        'HOT_MONTHS': config.get('HOT_MONTHS', DEFAULT_HOT_MONTHS),
+        'ARCHIVE_AFTER_MONTHS': config.get('ARCHIVE_AFTER_MONTHS', DEFAULT_ARCHIVE_AFTER_MONTHS),
+        'ARCHIVE_DIR': archive_dir,
+    }
+
+
+def _local(moment):
+    """Fecha u hora en la zona horaria local (los meses se cortan en hora local)"""
+    if isinstance(moment, datetime.datetime):
+        if settings.USE_TZ and timezone.is_aware(moment):
+            return timezone.localtime(moment)
+        return moment
+    return datetime.datetime.combine(moment, datetime.time.min)
+
+
+def partition_for(moment):
+    """Partición (AAAAMM) de una fecha u hora"""
+    moment = _local(moment)
+    return moment.year * 100 + moment.month
+
+
+def shift_partition(partition, months):
+    year, month = divmod(partition, 100)
+    index = year * 12 + (month - 1) + months
+    return (index // 12) * 100 + index % 12 + 1
+
+
+def partition_bounds(partition):
+    """Rango [inicio, fin) de la partición"""
+    year, month = divmod(partition, 100)
+    start = datetime.datetime(year, month, 1)
+    next_year, next_month = divmod(shift_partition(partition, 1), 100)
+    end = datetime.datetime(next_year, next_month, 1)
+    if settings.USE_TZ:
+        start, end = timezone.make_aware(start), timezone.make_aware(end)
+    return start, end
+
+
+def current_partition():
+    return partition_for(timezone.now())
+
+
+def get_hot_partition():
+    """Primera partición que se consulta por defecto"""
+    return shift_partition(current_partition(), 1 - get_partition_config()['HOT_MONTHS'])
+
+
+def get_archive_cutoff(months=None):
+    """Primera partición que se conserva; las anteriores se pueden archivar"""
+    if months is None:
+        months = get_partition_config()['ARCHIVE_AFTER_MONTHS']
+    return shift_partition(current_partition(), 1 - months)
+
+
+def format_partition(partition):
+    year, month = divmod(partition, 100)
+    return f'{year:04d}-{month:02d}'
+
+
+def parse_partition(value):
+    """'AAAAMM' o 'AAAA-MM' a partición. Lanza ValueError si no es válida"""
+    value = str(value).replace('-', '').strip()
+    if len(value) != 6 or not value.isdigit() or not 1 <= int(value[4:]) <= 12:
+        raise ValueError(f'Partición inválida: {value} (se espera AAAAMM)')
+    return int(value)
@@ -0,0 +1,150 @@
+# registry.py
+import json
+
+from django.apps import apps
+from django.conf import settings
+from django.db import models
+from django.utils.encoding import force_str
+
+# Campos sensibles que nunca se guardan en la auditoría
+SENSITIVE_FIELDS = ('password', 'token', 'secret', 'key')
+
+
+class AuditableModelMixin:
+    """
+    Mixin para añadir a modelos que queremos auditar
+    """
+    # Lista de campos a excluir de la auditoría, por ejemplo, campos sensibles
+    audit_exclude = []
+
+    # Si es False, no se auditará el modelo. Útil para deshabilitar temporalmente
+    audit_enabled = True
+
+
+# --- Conversión de valores a JSON según el tipo de campo ---
+
+def _as_is(value):
+    return value
+
+
+def _as_text(value):
+    return force_str(value)
+
+
+def _as_json(value):
+    """Tipos sin conversión conocida: el valor si es serializable, si no su texto"""
+    if hasattr(value, 'pk'):
+        return value.pk
+    try:
+        json.dumps(value)
+        return value
+    except (TypeError, OverflowError):
+        return force_str(value)
+
+
+# Campos cuyos valores ya son tipos JSON
+NATIVE_FIELDS = (models.IntegerField, models.BooleanField, models.FloatField, models.CharField, models.TextField)
+# Campos cuyos valores se guardan como texto (fechas, decimales, UUID, archivos...)
+TEXT_FIELDS = (
+    models.DateField, models.TimeField, models.DurationField, models.DecimalField,
+    models.UUIDField, models.FileField,
+)
+
+
+def get_converter(field):
+    if field.is_relation:
+        # Se guarda la clave, con el tipo del campo al que apunta
+        field = field.target_field
+    if isinstance(field, NATIVE_FIELDS):
+        return _as_is
+    if isinstance(field, TEXT_FIELDS):
+        return _as_text
+    return _as_json
+
+
+class AuditPolicy:
+    """
+    Política de auditoría de un modelo, compilada una sola vez: campos a
+    registrar (sin exclusiones) con el conversor de cada uno.
+    """
+
+    def __init__(self, model, exclude=None):
+        self.model = model
+        if exclude is None:
+            exclude = getattr(model, 'audit_exclude', [])
+        excluded = {*exclude, *SENSITIVE_FIELDS}
+        self.fields = tuple(
+            (field.name, field.attname, get_converter(field))
+            for field in model._meta.fields
+            if field.name not in excluded
+        )
+        self.attnames = tuple(attname for _, attname, _ in self.fields)
+        # audit_enabled solo se consulta en los modelos con AuditableModelMixin
+        self.check_enabled = issubclass(model, AuditableModelMixin)
+
+    def __repr__(self):
+        return f'<AuditPolicy {self.model._meta.label}>'
+
+    def is_enabled(self, instance_or_model):
+        return not self.check_enabled or getattr(instance_or_model, 'audit_enabled', True)
+
+    def serialize(self, values):
+        """
+        Datos para el registro de auditoría a partir de valores crudos
+        ({attname: valor}). Los campos sin valor (diferidos) o nulos se omiten.
+        """
+        data = {}
+        for name, attname, convert in self.fields:
+            value = values.get(attname)
+            if value is not None:
+                data[name] = convert(value)
+        return data
+
+    def is_complete(self, instance):
+        """True si la instancia tiene cargados todos los campos auditados"""
+        data = instance.__dict__
+        return all(attname in data for attname in self.attnames)
+
+    def serialize_instance(self, instance):
+        # Solo los valores ya cargados: no se consultan los campos diferidos
+        return self.serialize(instance.__dict__)
+
+    def serialize_complete(self, instance):
+        """Datos con todos los campos auditados, consultando los diferidos si los hay"""
+        values = instance.__dict__
+        missing = [attname for attname in self.attnames if attname not in values]
+        if missing:
+            stored = self.model._base_manager.filter(pk=instance.pk).values(*missing).first() or {}
+            values = {**values, **stored}
+        return self.serialize(values)
+
+
+# {modelo: AuditPolicy} de los modelos auditados (compilado en AuditConfig.ready)
+_registry = {}
+
+
+def is_audited_model(model):
+    if model._meta.label == 'audit.AuditLog':
+        return False
+    if issubclass(model, AuditableModelMixin):
+        return True
+    model_path = f"{model._meta.app_label}.{model.__name__}"
+    return model_path in getattr(settings, 'AUDIT_MODELS', [])
+
+
+def compile_audit_registry():
+    """Compila la política de cada modelo auditado (mixin o settings.AUDIT_MODELS)"""
+    _registry.clear()
+    for model in apps.get_models():
+        if is_audited_model(model):
+            _registry[model] = AuditPolicy(model)
+    return dict(_registry)
+
+
+def get_audit_policy(model):
+    """Política del modelo, o None si no se audita"""
+    return _registry.get(model)
+
+
+def get_audited_models():
+    return list(_registry)
@@ -1,28 +1,57 @@
 # signals.py
-from django.db.models.signals import post_save, post_delete, pre_save
+from django.db.models.signals import post_init, post_save, post_delete, pre_save
 from django.dispatch import receiver
 from django.contrib.contenttypes.models import ContentType
-from django.utils.encoding import force_str
-from django.conf import settings
 from django.contrib.auth import user_logged_in, user_logged_out
 from django.db.models import Model
-import json
-import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
 
+from apps.audit.diffs import build_update, get_diff_chains, is_snapshot_due
 from apps.audit.models import AuditLog
+# AuditableModelMixin se importa desde aquí en los modelos y vistas
+from apps.audit.registry import AuditableModelMixin, AuditPolicy, get_audit_policy, get_audited_models
+from apps.audit.tracker import get_tracked_state, track_refresh, track_state
+from apps.audit.writer import get_audit_writer
 
-# Variable local de thread para almacenar datos temporales entre señales
-thread_local = threading.local()
+# Contexto de la solicitud en curso (AuditMiddleware). Con ContextVar cada
+# solicitud ve el suyo aunque varias compartan hilo (ASGI).
+_audit_request = ContextVar('audit_request', default=None)
+_audit_user = ContextVar('audit_user', default=None)
+# Datos anteriores de los guardados en curso, {(modelo, pk): datos}, para que
+# un guardado anidado (p.ej. dentro de otro save) no pise el de su llamador
+_previous_data = ContextVar('audit_previous_data', default=None)
 
-class AuditableModelMixin:
-    """
-    Mixin para añadir a modelos que queremos auditar
-    """
-    # Lista de campos a excluir de la auditoría, por ejemplo, campos sensibles
-    audit_exclude = []
-    
-    # Si es False, no se auditará el modelo. Útil para deshabilitar temporalmente
-    audit_enabled = True
+@contextmanager
+def audit_context(request=None, user=None):
+    """Publica la solicitud y el usuario para la auditoría mientras dure el bloque"""
+    tokens = (_audit_request.set(request), _audit_user.set(user), _previous_data.set(None))
+    try:
+        yield
+    finally:
+        _previous_data.reset(tokens[2])
+        _audit_user.reset(tokens[1])
+        _audit_request.reset(tokens[0])
+
+def get_audit_user():
+    return _audit_user.get()
+
+def get_audit_request():
+    return _audit_request.get()
+
+def set_previous_data(key, data):
+    pending = _previous_data.get()
+    # Nuevo diccionario en lugar de modificarlo: puede estar compartido con
+    # otros contextos copiados del actual (tareas asyncio, sync_to_async)
+    _previous_data.set({**pending, key: data} if pending else {key: data})
+
+def pop_previous_data(key):
+    pending = _previous_data.get()
+    if not pending or key not in pending:
+        return {}
+    data = pending[key]
+    _previous_data.set({k: v for k, v in pending.items() if k != key} or None)
+    return data
 
 def get_client_ip(request):
     """Obtiene la dirección IP del cliente desde la solicitud"""
@@ -47,40 +76,11 @@ def get_serialized_data(instance, exclude_fields=None):
     """
     Serializa los datos de un modelo para almacenarlos en el registro de auditoría
     """
-    if exclude_fields is None:
-        exclude_fields = getattr(instance, 'audit_exclude', [])
-    
-    # Agregar campos sensibles predeterminados
-    exclude_fields.extend(['password', 'token', 'secret', 'key'])
-    
-    data = {}
-    
-    # Obtener todos los campos del modelo
-    for field in instance._meta.fields:
-        field_name = field.name
-        
-        # Excluir campos específicos
-        if field_name in exclude_fields:
-            continue
-        
-        # Obtener valor del campo
-        value = getattr(instance, field_name)
-        
-        # Convertir a un formato serializable
-        if value is not None:
-            if hasattr(value, 'pk'):
-                # Si es una relación, guardar solo la clave primaria
-                data[field_name] = value.pk
-            else:
-                try:
-                    # Intentar serializar directamente
-                    json.dumps({field_name: value})
-                    data[field_name] = value
-                except (TypeError, OverflowError):
-                    # Si no es serializable, convertir a string
-                    data[field_name] = force_str(value)
-    
-    return data
+    policy = get_audit_policy(type(instance)) if exclude_fields is None else None
+    if policy is None:
+        # Modelo no auditado o exclusiones propias: compilar la política al vuelo
+        policy = AuditPolicy(type(instance), exclude=exclude_fields)
+    return policy.serialize_instance(instance)
 
 def should_audit_model(model_instance_or_class):
     """
@@ -92,130 +92,149 @@ def should_audit_model(model_instance_or_class):
     else:
         model_class = model_instance_or_class
     
-    # Verificar si el modelo hereda de AuditableModelMixin
-    if isinstance(model_instance_or_class, AuditableModelMixin):
-        if not getattr(model_instance_or_class, 'audit_enabled', True):
-            return False
-        return True
-    
-    # Verificar si el modelo está en AUDIT_MODELS
-    model_path = f"{model_class._meta.app_label}.{model_class.__name__}"
-    return model_path in getattr(settings, 'AUDIT_MODELS', [])
+    # Modelos auditados (AuditableModelMixin o AUDIT_MODELS), compilados al iniciar
+    policy = get_audit_policy(model_class)
+    return policy is not None and policy.is_enabled(model_instance_or_class)
+
+def connect_audit_signals():
+    """
+    Conecta las señales de auditoría solo para los modelos auditados (ver
+    registry.compile_audit_registry), de modo que el resto no tenga ningún costo.
+    post_init registra los valores al cargar, para que audit_pre_save no tenga
+    que consultar la base de datos; refresh_from_db los actualiza al recargar.
+    """
+    for model in get_audited_models():
+        label = model._meta.label
+        track_refresh(model)
+        post_init.connect(track_state, sender=model, dispatch_uid=f'audit_track_state_{label}')
+        pre_save.connect(audit_pre_save, sender=model, dispatch_uid=f'audit_pre_save_{label}')
+        post_save.connect(audit_post_save, sender=model, dispatch_uid=f'audit_post_save_{label}')
+        post_delete.connect(audit_post_delete, sender=model, dispatch_uid=f'audit_post_delete_{label}')
 
-@receiver(pre_save)
 def audit_pre_save(sender, instance, **kwargs):
     """Captura el estado anterior antes de guardar"""
-    # Evitar auditar el modelo AuditLog para prevenir recursión
-    if sender == AuditLog:
-        return
-        
     # Verificar si el modelo debe ser auditado
-    if not should_audit_model(instance):
+    policy = get_audit_policy(sender)
+    if policy is None or not policy.is_enabled(instance):
         return
     
     # Si es una instancia nueva, no hay estado anterior
     if not instance.pk:
         return
     
+    key = (sender._meta.label, instance.pk)
+    
+    # Estado registrado al cargar la instancia: evita volver a consultarla
+    loaded_state = get_tracked_state(instance)
+    if loaded_state is not None:
+        set_previous_data(key, policy.serialize(loaded_state))
+        return
+    
     try:
-        # Obtener la instancia antes de modificarse
-        previous = sender.objects.get(pk=instance.pk)
-        thread_local.previous_data = get_serialized_data(previous)
+        # Instancia sin estado conocido (p.ej. construida con una pk): consultarla
+        previous = sender._base_manager.get(pk=instance.pk)
+        set_previous_data(key, policy.serialize_instance(previous))
     except sender.DoesNotExist:
-        thread_local.previous_data = {}
+        set_previous_data(key, {})
     except Exception as e:
         # Capturar cualquier error para evitar interrumpir el flujo normal
         print(f"Error al obtener datos anteriores: {e}")
-        thread_local.previous_data = {}
+        set_previous_data(key, {})
 
-@receiver(post_save)
 def audit_post_save(sender, instance, created, **kwargs):
     """
     Registra eventos de creación y actualización
     """
-    # Evitar auditar el modelo AuditLog para prevenir recursión
-    if sender == AuditLog:
-        return
-        
     # Verificar si el modelo debe ser auditado
-    if not should_audit_model(instance):
+    policy = get_audit_policy(sender)
+    if policy is None or not policy.is_enabled(instance):
         return
     
+    # Datos anteriores de este guardado (solo para actualizaciones)
+    previous_data = pop_previous_data((sender._meta.label, instance.pk))
+    
     try:
         # Obtener los datos actuales
-        current_data = get_serialized_data(instance)
+        current_data = policy.serialize_instance(instance)
         
         # Determinar si es creación o actualización
         action = 'CREATE' if created else 'UPDATE'
-        
-        # Obtener datos anteriores (solo para actualizaciones)
-        previous_data = getattr(thread_local, 'previous_data', {}) if not created else {}
+        if created:
+            previous_data = {}
         
         # Si no hay cambios en los datos (para actualizaciones), evitar registro
         if action == 'UPDATE' and previous_data == current_data:
             return
         
-        # Obtener el usuario actual desde el contexto (si está disponible)
-        user = getattr(thread_local, 'request_user', None)
-        
         # Crear registro de auditoría
         content_type = ContentType.objects.get_for_model(sender)
         
+        # Las actualizaciones guardan solo los campos modificados, con un estado
+        # completo cada SNAPSHOT_INTERVAL actualizaciones (ver diffs.py)
+        data_before, data_after, is_diff = None, current_data, False
+        if action == 'UPDATE':
+            chain = 0
+            if previous_data:
+                object_id = str(instance.pk)
+                chain = get_diff_chains(content_type.pk, [object_id])[object_id]
+                if is_snapshot_due(chain) and not policy.is_complete(instance):
+                    current_data = policy.serialize_complete(instance)
+            data_before, data_after, is_diff = build_update(previous_data, current_data, chain)
+        
+        # Obtener el usuario actual desde el contexto (si está disponible)
+        user = get_audit_user()
+        
         # Obtener información de la solicitud si está disponible
-        request = getattr(thread_local, 'request', None)
+        request = get_audit_request()
         ip_address = get_client_ip(request)
         user_agent = get_user_agent(request)
         
-        # Crear el registro
-        AuditLog.objects.create(
+        # Registrar el evento; se escribe por lotes al confirmarse la transacción
+        get_audit_writer().add(AuditLog(
             user=user,
             action=action,
             content_type=content_type,
             object_id=str(instance.pk),
             table_name=sender._meta.db_table,
-            data_before=previous_data if action == 'UPDATE' else None,
-            data_after=current_data,
+            data_before=data_before,
+            data_after=data_after,
+            is_diff=is_diff,
             ip_address=ip_address,
             user_agent=user_agent,
             description=f"{action} en {sender._meta.verbose_name}: {instance}"
-        )
+        ))
     except Exception as e:
         # Capturar cualquier error para evitar interrumpir la operación principal
         print(f"Error al registrar auditoría: {e}")
     finally:
-        # Limpiar datos almacenados
-        if hasattr(thread_local, 'previous_data'):
-            del thread_local.previous_data
+        # Los valores guardados son el nuevo estado en la base de datos
+        track_state(sender, instance)
 
-@receiver(post_delete)
 def audit_post_delete(sender, instance, **kwargs):
     """
     Registra eventos de eliminación
     """
-    # Evitar auditar el modelo AuditLog para prevenir recursión
-    if sender == AuditLog:
-        return
-        
     # Verificar si el modelo debe ser auditado
-    if not should_audit_model(instance):
+    policy = get_audit_policy(sender)
+    if policy is None or not policy.is_enabled(instance):
         return
     
     try:
         # Obtener datos antes de eliminación
-        previous_data = get_serialized_data(instance)
+        previous_data = policy.serialize_instance(instance)
         
         # Obtener el usuario actual desde el contexto (si está disponible)
-        user = getattr(thread_local, 'request_user', None)
+        user = get_audit_user()
         
         # Crear registro de auditoría
         content_type = ContentType.objects.get_for_model(sender)
         
         # Obtener información de la solicitud si está disponible
-        request = getattr(thread_local, 'request', None)
+        request = get_audit_request()
         ip_address = get_client_ip(request)
         user_agent = get_user_agent(request)
         
-        AuditLog.objects.create(
+        get_audit_writer().add(AuditLog(
             user=user,
             action='DELETE',
             content_type=content_type,
@@ -226,11 +245,82 @@ def audit_post_delete(sender, instance, **kwargs):
             ip_address=ip_address,
             user_agent=user_agent,
             description=f"DELETE en {sender._meta.verbose_name}: {instance}"
-        )
+        ))
     except Exception as e:
         # Capturar cualquier error para evitar interrumpir la operación principal
         print(f"Error al registrar auditoría de eliminación: {e}")
 
+def audit_bulk_save(sender, created=(), updated=(), previous_data=None):
+    """
+    Registra la auditoría de operaciones bulk_create/bulk_update, que no disparan
+    las señales pre_save/post_save. Los registros se escriben junto con los demás
+    eventos de la transacción.
+
+    Args:
+        sender: Modelo afectado
+        created: Instancias creadas (con pk asignado)
+        updated: Instancias actualizadas
+        previous_data: {pk: datos serializados antes de la actualización}
+    """
+    policy = get_audit_policy(sender)
+    if policy is None or not policy.is_enabled(sender):
+        return
+
+    previous_data = previous_data or {}
+
+    try:
+        user = get_audit_user()
+        content_type = ContentType.objects.get_for_model(sender)
+        request = get_audit_request()
+        ip_address = get_client_ip(request)
+        user_agent = get_user_agent(request)
+
+        # Diffs de cada objeto actualizado desde su último estado completo
+        chains = {}
+        if updated:
+            chains = get_diff_chains(
+                content_type.pk, [str(instance.pk) for instance in updated if previous_data.get(instance.pk)]
+            )
+
+        logs = []
+        for action, instances in (('CREATE', created), ('UPDATE', updated)):
+            for instance in instances:
+                current_data = policy.serialize_instance(instance)
+                before = previous_data.get(instance.pk, {}) if action == 'UPDATE' else None
+
+                # Si no hay cambios en los datos, evitar registro
+                if action == 'UPDATE' and before == current_data:
+                    continue
+
+                after, is_diff = current_data, False
+                if action == 'UPDATE':
+                    chain = chains.get(str(instance.pk), 0)
+                    if before and is_snapshot_due(chain) and not policy.is_complete(instance):
+                        current_data = policy.serialize_complete(instance)
+                    before, after, is_diff = build_update(before, current_data, chain)
+                    # Los siguientes del mismo objeto en este lote continúan la cadena
+                    chains[str(instance.pk)] = chain + 1 if is_diff else 0
+
+                logs.append(AuditLog(
+                    user=user,
+                    action=action,
+                    content_type=content_type,
+                    object_id=str(instance.pk),
+                    table_name=sender._meta.db_table,
+                    data_before=before,
+                    data_after=after,
+                    is_diff=is_diff,
+                    ip_address=ip_address,
+                    user_agent=user_agent,
+                    description=f"{action} en {sender._meta.verbose_name}: {instance}"
+                ))
+
+        # Se insertan con un solo bulk_create al confirmarse la transacción
+        get_audit_writer().add_many(logs)
+    except Exception as e:
+        # Capturar cualquier error para evitar interrumpir la operación principal
+        print(f"Error al registrar auditoría masiva: {e}")
+
 # Registrar eventos de inicio y cierre de sesión
 @receiver(user_logged_in)
 def audit_user_login(sender, request, user, **kwargs):
@@ -239,13 +329,13 @@ def audit_user_login(sender, request, user, **kwargs):
         ip_address = get_client_ip(request)
         user_agent = get_user_agent(request)
         
-        AuditLog.objects.create(
+        get_audit_writer().add(AuditLog(
             user=user,
             action='LOGIN',
             ip_address=ip_address,
             user_agent=user_agent,
             description=f"Inicio de sesión: {user.username}"
-        )
+        ))
     except Exception as e:
         print(f"Error al registrar inicio de sesión: {e}")
 
@@ -257,12 +347,12 @@ def audit_user_logout(sender, request, user, **kwargs):
             ip_address = get_client_ip(request)
             user_agent = get_user_agent(request)
             
-            AuditLog.objects.create(
+            get_audit_writer().add(AuditLog(
                 user=user,
                 action='LOGOUT',
                 ip_address=ip_address,
                 user_agent=user_agent,
                 description=f"Cierre de sesión: {user.username}"
-            )
+            ))
     except Exception as e:
         print(f"Error al registrar cierre de sesión: {e}")
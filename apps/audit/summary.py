@@ -0,0 +1,74 @@
+# summary.py
+import logging
+
+from django.db import router, transaction
+from django.db.models import Min
+
+from apps.audit.models import AuditContentType, AuditLog, AuditUser
+
+logger = logging.getLogger(__name__)
+
+# Ids ya registrados por este proceso: tras la primera vez, escribir un
+# registro de auditoría no cuesta ninguna consulta adicional
+_known_users = set()
+_known_content_types = set()
+
+
+def record_summary(logs):
+    """
+    Registra los usuarios y modelos de los AuditLog escritos. Las filas ya
+    existentes se ignoran; nunca se eliminan, de modo que ningún proceso deja de
+    registrar un id que otro haya borrado.
+    """
+    users = {}
+    content_types = {}
+    for log in logs:
+        if log.user_id is not None and log.user_id not in _known_users:
+            users.setdefault(log.user_id, log.timestamp)
+        if log.content_type_id is not None and log.content_type_id not in _known_content_types:
+            content_types.setdefault(log.content_type_id, log.timestamp)
+    if not users and not content_types:
+        return
+
+    try:
+        # Savepoint propio: un error aquí no invalida la transacción que escribe
+        with transaction.atomic(using=router.db_for_write(AuditUser)):
+            if users:
+                AuditUser.objects.bulk_create(
+                    [AuditUser(user_id=pk, first_seen=seen) for pk, seen in users.items()],
+                    ignore_conflicts=True,
+                )
+            if content_types:
+                AuditContentType.objects.bulk_create(
+                    [AuditContentType(content_type_id=pk, first_seen=seen) for pk, seen in content_types.items()],
+                    ignore_conflicts=True,
+                )
+    except Exception as e:
+        # El resumen se puede reconstruir (rebuild_summary); no interrumpir la escritura
+        logger.warning(f"No se pudo actualizar el resumen de auditoría: {e}")
+        return
+
+    # Recordarlos solo si la transacción se confirma
+    def remember():
+        _known_users.update(users)
+        _known_content_types.update(content_types)
+
+    transaction.on_commit(remember, using=router.db_for_write(AuditUser))
+
+
+def rebuild_summary():
+    """Agrega los usuarios y modelos de AuditLog que falten en el resumen"""
+    users = AuditLog.objects.filter(user__isnull=False).order_by().values('user_id').annotate(seen=Min('timestamp'))
+    AuditUser.objects.bulk_create(
+        [AuditUser(user_id=row['user_id'], first_seen=row['seen']) for row in users],
+        ignore_conflicts=True,
+    )
+    content_types = (
+        AuditLog.objects.filter(content_type__isnull=False)
+        .order_by().values('content_type_id').annotate(seen=Min('timestamp'))
+    )
+    AuditContentType.objects.bulk_create(
+        [AuditContentType(content_type_id=row['content_type_id'], first_seen=row['seen']) for row in content_types],
+        ignore_conflicts=True,
+    )
+    return AuditUser.objects.count(), AuditContentType.objects.count()
@@ -0,0 +1,22 @@
+# tasks.py
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def write_audit_logs_task(events):
+    """
+    Inserta registros de auditoría enviados por AuditWriter en modo 'celery'.
+
+    Args:
+        events: Lista de diccionarios con los campos de AuditLog (AuditWriter.serialize)
+    """
+    from apps.audit.writer import get_audit_writer
+
+    writer = get_audit_writer()
+    writer.write_logs([writer.deserialize(event) for event in events])
+    logger.info(f"Written {len(events)} audit log entries")
+    return len(events)
@@ -1,3 +1,354 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import io
+import json
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models.signals import pre_save
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from apps.audit import summary
+from apps.audit.archive import archive_partition, get_archive_path, restore_partition
+from apps.audit.diffs import IncompleteHistory
+from apps.audit.export import get_export_window, iter_export
+from apps.audit.middleware import AuditMiddleware
+from apps.audit.models import AuditArchive, AuditLog
+from apps.audit.partitions import partition_for
+from apps.audit.registry import AuditPolicy, get_audit_policy, get_audited_models
+from apps.audit.signals import audit_context, audit_pre_save, get_audit_request, get_audit_user
+from apps.audit.views import AuditLogListView
+from apps.audit.writer import GROUPS_ATTR
+from apps.base.models import Country, DocType, User
+
+
+@override_settings(AUDIT_EXPORT={'SETTLE_SECONDS': 60})
+class AuditExportWatermarkTests(TestCase):
+
+    def export(self, after):
+        queryset, watermark = get_export_window(after=after)
+        return [json.loads(line)['id'] for line in iter_export(queryset)], watermark
+
+    def settle(self):
+        """Simula que pasó el tiempo de espera desde todas las inserciones"""
+        AuditLog.objects.update(inserted_at=timezone.now() - datetime.timedelta(minutes=5))
+
+    def test_late_commit_with_lower_id_is_not_skipped(self):
+        old_event = timezone.now() - datetime.timedelta(days=1)
+        first = AuditLog.objects.create(action='LOGIN', description='previo')
+        self.settle()
+
+        # B se confirma con ids altos y eventos antiguos mientras A (ids menores,
+        # insertados antes) sigue sin confirmar
+        AuditLog.objects.bulk_create([
+            AuditLog(pk=first.pk + 100 + i, action='UPDATE', timestamp=old_event, description='B')
+            for i in range(3)
+        ])
+        ids, watermark = self.export(0)
+        self.assertEqual(ids, [first.pk])
+        self.assertEqual(watermark, first.pk)
+
+        # A se confirma después, con ids menores y eventos aún más antiguos
+        AuditLog.objects.bulk_create([
+            AuditLog(pk=first.pk + 1 + i, action='UPDATE', timestamp=old_event - datetime.timedelta(hours=1),
+                     description='A')
+            for i in range(3)
+        ])
+        ids, next_watermark = self.export(watermark)
+        self.assertEqual(ids, [])
+        self.assertEqual(next_watermark, watermark)
+
+        self.settle()
+        ids, watermark = self.export(watermark)
+        self.assertEqual(ids, [first.pk + 1 + i for i in range(3)] + [first.pk + 100 + i for i in range(3)])
+        self.assertEqual(watermark, first.pk + 102)
+
+    def test_rows_without_inserted_at_are_settled(self):
+        log = AuditLog.objects.create(action='LOGIN', description='previo a la columna')
+        AuditLog.objects.filter(pk=log.pk).update(inserted_at=None)
+        self.assertEqual(self.export(0), ([log.pk], log.pk))
+
+
+@override_settings(AUDIT_DIFFS={'SNAPSHOT_INTERVAL': 4})
+class AuditDiffCadenceTests(TestCase):
+
+    def update(self, country, times):
+        for i in range(times):
+            country.name = f'{country.name[:40]}-{i}'
+            country.save()
+
+    def sequence(self, country):
+        updates = AuditLog.objects.filter(object_id=str(country.pk), action='UPDATE').order_by('pk')
+        return ''.join('.' if is_diff else 'S' for is_diff in updates.values_list('is_diff', flat=True))
+
+    def test_snapshot_every_interval_updates(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            country = Country.objects.create(name='Pais', iso_name='P', alfa2='PA', alfa3='PAI', code='001')
+        # Parte de los eventos aún sin escribir (misma transacción) y parte ya escritos
+        with self.captureOnCommitCallbacks(execute=True):
+            self.update(country, 5)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.update(country, 6)
+        self.assertEqual(self.sequence(country), '...S...S...')
+
+        # Desde un estado con campos diferidos, el estado completo incluye todos los campos
+        with self.captureOnCommitCallbacks(execute=True):
+            deferred = Country.objects.only('name').get(pk=country.pk)
+            deferred.name = 'Diferido'
+            deferred.save()
+        last = AuditLog.objects.filter(object_id=str(country.pk), action='UPDATE').order_by('pk').last()
+        self.assertFalse(last.is_diff)
+        self.assertEqual(last.data_after['alfa3'], 'PAI')
+        self.assertEqual(AuditLog.objects.state_at(Country, country.pk)['name'], 'Diferido')
+
+    def test_state_without_full_base_raises(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            country = Country.objects.create(name='Pais', iso_name='P', alfa2='PA', alfa3='PAI', code='001')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.update(country, 2)
+        # Como si el mes de la creación se hubiera archivado
+        AuditLog.objects.filter(object_id=str(country.pk), is_diff=False).delete()
+        with self.assertRaises(IncompleteHistory):
+            AuditLog.objects.state_at(Country, country.pk)
+
+
+class AuditWriterGroupTests(TestCase):
+
+    def create(self, code):
+        return Country.objects.create(name=f'Pais {code}', iso_name='P', alfa2='PA', alfa3='PAI', code=code)
+
+    def test_rolled_back_savepoints_release_their_groups(self):
+        groups = lambda: connections[DEFAULT_DB_ALIAS].__dict__.get(GROUPS_ATTR, {})
+        with self.captureOnCommitCallbacks(execute=True):
+            kept = self.create('001')
+            for i in range(20):
+                try:
+                    with transaction.atomic():
+                        self.create(f'1{i:02}')
+                        raise ValueError
+                except ValueError:
+                    pass
+            self.assertEqual(len(groups()), 1)
+
+        created = AuditLog.objects.filter(action='CREATE').values_list('object_id', flat=True)
+        self.assertEqual(list(created), [str(kept.pk)])
+        self.assertEqual(len(groups()), 0)
+
+
+class AuditTrackerRefreshTests(TestCase):
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.country = Country.objects.create(name='Pais', iso_name='P', alfa2='PA', alfa3='PAI', code='001')
+
+    def updates(self):
+        return AuditLog.objects.filter(object_id=str(self.country.pk), action='UPDATE')
+
+    def test_refresh_updates_the_loaded_state(self):
+        Country.objects.filter(pk=self.country.pk).update(name='Otro')
+        self.country.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.country.save()
+        # Sin cambios respecto a lo recargado: nada que auditar
+        self.assertFalse(self.updates().exists())
+
+    def test_partial_refresh_keeps_unsaved_changes(self):
+        self.country.iso_name = 'Q'
+        Country.objects.filter(pk=self.country.pk).update(name='Otro')
+        self.country.refresh_from_db(fields=['name'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.country.save()
+        update = self.updates().get()
+        self.assertEqual(update.data_before, {'iso_name': 'P'})
+        self.assertEqual(update.data_after, {'iso_name': 'Q'})
+
+
+class AuditArchiveTests(TestCase):
+
+    def setUp(self):
+        archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, archive_dir, ignore_errors=True)
+        settings_override = override_settings(AUDIT_PARTITIONS={
+            'HOT_MONTHS': 3, 'ARCHIVE_AFTER_MONTHS': 6, 'ARCHIVE_DIR': archive_dir,
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def create_logs(self, months_ago, count):
+        moment = timezone.now().replace(day=15) - datetime.timedelta(days=31 * months_ago)
+        AuditLog.objects.bulk_create([
+            AuditLog(
+                action='UPDATE', description=f'{months_ago} {i}', data_after={'i': i, 'nombre': 'Añil'},
+                timestamp=moment.replace(microsecond=123456 + i),
+            )
+            for i in range(count)
+        ])
+        return partition_for(moment)
+
+    def stored(self, partition):
+        # inserted_at es la hora de la inserción: al restaurar se vuelven a insertar
+        fields = [field.attname for field in AuditLog._meta.concrete_fields if field.name != 'inserted_at']
+        return list(AuditLog.objects.filter(partition=partition).order_by('pk').values(*fields))
+
+    def test_archive_and_restore_round_trip(self):
+        partition = self.create_logs(8, 5)
+        before = self.stored(partition)
+
+        self.assertEqual(archive_partition(partition, batch_size=2), 5)
+        self.assertEqual(self.stored(partition), [])
+        self.assertTrue(get_archive_path(partition).exists())
+        self.assertEqual(AuditArchive.objects.get(partition=partition).rows, 5)
+
+        self.assertEqual(restore_partition(partition, batch_size=2), 5)
+        self.assertEqual(self.stored(partition), before)
+        self.assertFalse(get_archive_path(partition).exists())
+        self.assertFalse(AuditArchive.objects.filter(partition=partition).exists())
+
+    def test_archiving_a_month_again_accumulates(self):
+        partition = self.create_logs(8, 3)
+        archive_partition(partition)
+        # Registros del mismo mes escritos después (p.ej. restaurados a mano)
+        self.create_logs(8, 2)
+        archive_partition(partition)
+        self.assertEqual(AuditArchive.objects.get(partition=partition).rows, 5)
+        self.assertEqual(restore_partition(partition), 5)
+        self.assertEqual(len(self.stored(partition)), 5)
+
+    def test_command_archives_only_past_the_cutoff(self):
+        old = self.create_logs(8, 2)
+        recent = self.create_logs(1, 2)
+        call_command('archive_audit_logs', stdout=io.StringIO())
+        self.assertEqual(list(AuditArchive.objects.values_list('partition', flat=True)), [old])
+        self.assertEqual(len(self.stored(recent)), 2)
+
+
+class AuditContextTests(TestCase):
+
+    def create(self, name, code):
+        return Country.objects.create(name=name, iso_name='P', alfa2='PA', alfa3='PAI', code=code)
+
+    def test_nested_save_keeps_the_callers_previous_data(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            outer = self.create('Externo', '001')
+            inner = self.create('Interno', '002')
+
+        def save_inner(sender, instance, **kwargs):
+            if instance.pk == outer.pk:
+                nested = Country.objects.get(pk=inner.pk)
+                nested.name = 'Interno 2'
+                nested.save()
+
+        pre_save.connect(save_inner, sender=Country, dispatch_uid='test_save_inner')
+        self.addCleanup(pre_save.disconnect, sender=Country, dispatch_uid='test_save_inner')
+        with self.captureOnCommitCallbacks(execute=True):
+            outer.name = 'Externo 2'
+            outer.save()
+
+        updates = AuditLog.objects.filter(action='UPDATE').order_by('pk')
+        self.assertEqual(
+            [(log.object_id, log.data_before['name'], log.data_after['name']) for log in updates],
+            [(str(inner.pk), 'Interno', 'Interno 2'), (str(outer.pk), 'Externo', 'Externo 2')],
+        )
+
+    def test_concurrent_tasks_see_their_own_user(self):
+        users = [User(username='uno'), User(username='dos')]
+
+        async def worker(user):
+            seen = []
+            with audit_context(user=user):
+                for _ in range(3):
+                    await asyncio.sleep(0)
+                    seen.append(get_audit_user().username)
+            return seen
+
+        async def main():
+            return await asyncio.gather(*(worker(user) for user in users))
+
+        self.assertEqual(asyncio.run(main()), [['uno'] * 3, ['dos'] * 3])
+        self.assertIsNone(get_audit_user())
+
+    def test_middleware_scopes_the_request(self):
+        user = User.objects.create(username='auditor', identification_number='1')
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.1', HTTP_USER_AGENT='pruebas')
+        request.user = user
+
+        def view(request):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.create('Pais', '001')
+            return 'respuesta'
+
+        self.assertEqual(AuditMiddleware(view)(request), 'respuesta')
+        log = AuditLog.objects.get(action='CREATE')
+        self.assertEqual((log.user_id, log.ip_address, log.user_agent), (user.pk, '10.0.0.1', 'pruebas'))
+        self.assertIsNone(get_audit_user())
+        self.assertIsNone(get_audit_request())
+
+
+class AuditRegistryTests(TestCase):
+
+    def test_receivers_only_for_audited_models(self):
+        self.assertIn(Country, get_audited_models())
+        self.assertNotIn(DocType, get_audited_models())
+        self.assertNotIn(AuditLog, get_audited_models())
+        self.assertIn(audit_pre_save, pre_save._live_receivers(Country)[0])
+        self.assertNotIn(audit_pre_save, pre_save._live_receivers(DocType)[0])
+
+    def test_policy_is_compiled_once_per_model(self):
+        policy = get_audit_policy(Country)
+        self.assertIs(get_audit_policy(Country), policy)
+        self.assertIsNone(get_audit_policy(DocType))
+        self.assertEqual(policy.attnames, ('id', 'name', 'iso_name', 'alfa2', 'alfa3', 'code', 'demonym'))
+
+    def test_sensitive_and_excluded_fields_are_not_serialized(self):
+        user = User(username='auditor', password='secreto', identification_number='1')
+        self.assertNotIn('password', AuditPolicy(User).serialize_instance(user))
+        data = AuditPolicy(User, exclude=['identification_number']).serialize_instance(user)
+        self.assertEqual(data['username'], 'auditor')
+        self.assertNotIn('identification_number', data)
+
+
+class AuditLogListViewTests(TestCase):
+
+    def setUp(self):
+        # Ids que otras pruebas (revertidas) dejaron marcados como ya registrados
+        for name in ('_known_users', '_known_content_types'):
+            patcher = mock.patch.object(summary, name, set())
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.admin = User.objects.create(username='admin', identification_number='1', is_superuser=True)
+        self.auditor = User.objects.create(username='auditor', identification_number='2')
+
+    def render(self, **params):
+        request = RequestFactory().get('/audit/', params)
+        request.user = self.admin
+        view = AuditLogListView()
+        view.setup(request)
+        view.object_list = view.get_queryset()
+        return view.get_context_data()
+
+    def test_filter_choices_come_from_the_summary(self):
+        with audit_context(user=self.auditor), self.captureOnCommitCallbacks(execute=True):
+            Country.objects.create(name='Pais', iso_name='P', alfa2='PA', alfa3='PAI', code='001')
+        # Filas de benchmark_audit_list: fuera del resumen
+        AuditLog.objects.bulk_create([AuditLog(action='OTHER', user=self.admin, description='bench')], summary=False)
+
+        context = self.render()
+        self.assertEqual([user.username for user in context['users']], ['auditor'])
+        self.assertEqual([model['id'] for model in context['audit_models']], ['base.Country'])
+
+    def test_only_recent_partitions_by_default(self):
+        old = timezone.now() - datetime.timedelta(days=400)
+        AuditLog.objects.bulk_create([
+            AuditLog(action='OTHER', description='reciente'),
+            AuditLog(action='OTHER', description='antiguo', timestamp=old),
+        ])
+        context = self.render()
+        self.assertEqual([log.description for log in context['object_list']], ['reciente'])
+        self.assertIn('hot_since', context)
+
+        context = self.render(date_start=timezone.localdate(old).isoformat())
+        self.assertEqual([log.description for log in context['object_list']], ['reciente', 'antiguo'])
@@ -0,0 +1,84 @@
+# tracker.py
+import copy
+import functools
+
+from django.core.exceptions import FieldDoesNotExist
+
+from apps.audit.registry import get_audit_policy
+
+# Atributo de la instancia con los valores tal como se cargaron o guardaron
+STATE_ATTR = '_audit_loaded_state'
+
+
+def get_loaded_values(instance, attnames=None):
+    """
+    Valores crudos (por attname) de los campos concretos ya cargados en la
+    instancia. Los campos diferidos (only/defer) se omiten para no consultarlos.
+    """
+    if attnames is None:
+        attnames = [field.attname for field in instance._meta.concrete_fields]
+    data = instance.__dict__
+    values = {}
+    for attname in attnames:
+        if attname in data:
+            value = data[attname]
+            # Copiar los valores mutables (JSONField) para detectar cambios in situ
+            if isinstance(value, (dict, list)):
+                value = copy.deepcopy(value)
+            values[attname] = value
+    return values
+
+
+def track_state(sender, instance, **kwargs):
+    """
+    Guarda los valores actuales de la instancia como su estado en la base de datos.
+    Conectado a post_init de los modelos auditados: en Model.from_db se ejecuta
+    con los valores leídos de la base de datos.
+    """
+    # Solo los campos que registra la auditoría del modelo
+    policy = get_audit_policy(sender)
+    instance.__dict__[STATE_ATTR] = get_loaded_values(instance, policy.attnames if policy else None)
+
+
+def track_refresh(model):
+    """
+    Envuelve refresh_from_db del modelo auditado para actualizar el estado con
+    los valores recargados: Django los lee en otra instancia (cuyo post_init no
+    es el de esta) y solo copia los campos. Con fields solo se actualizan esos
+    campos, los demás pueden tener cambios sin guardar.
+    """
+    refresh_from_db = model.refresh_from_db
+    if getattr(refresh_from_db, '_audit_tracked', False):
+        return
+
+    @functools.wraps(refresh_from_db)
+    def tracked_refresh_from_db(instance, using=None, fields=None, *args, **kwargs):
+        refresh_from_db(instance, using, fields, *args, **kwargs)
+        if fields is None:
+            track_state(type(instance), instance)
+            return
+        policy = get_audit_policy(type(instance))
+        attnames = set()
+        for name in fields:
+            try:
+                attnames.add(instance._meta.get_field(name).attname)
+            except FieldDoesNotExist:
+                continue
+        if policy is not None:
+            attnames &= set(policy.attnames)
+        state = instance.__dict__.setdefault(STATE_ATTR, {})
+        state.update(get_loaded_values(instance, attnames))
+
+    tracked_refresh_from_db._audit_tracked = True
+    model.refresh_from_db = tracked_refresh_from_db
+
+
+def get_tracked_state(instance):
+    """
+    Valores de la instancia en la base de datos, o None si no se conocen
+    (instancias nuevas o construidas a mano con una pk).
+    """
+    # _state.adding es False solo tras from_db o tras guardar la instancia
+    if instance._state.adding:
+        return None
+    return instance.__dict__.get(STATE_ATTR)
@@ -2,7 +2,7 @@
 from django.urls import path
 from django.contrib.auth.decorators import login_required
 from apps.base.templatetags.menu_decorador import add_menu_name
-from apps.audit.views import AuditLogListView
+from apps.audit.views import AuditLogExportView, AuditLogListView
 
 app_name = 'auditoria'  # Define el nombre de la app para los templates y urls
 app_icon= 'settings'
@@ -12,5 +12,7 @@ urlpatterns = [
     path('audit/', 
          login_required(add_menu_name('historial','manage_search')(AuditLogListView.as_view())), 
          name='audit_log_list'),
+    # NDJSON para recolectores externos (sin entrada en el menú)
+    path('audit/export/', AuditLogExportView.as_view(), name='audit_log_export'),
 ]
 
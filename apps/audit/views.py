@@ -1,12 +1,16 @@
-from django.views.generic import ListView
+from django.views.generic import ListView, View
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
 from django.db.models import Q
 from django.utils.translation import gettext_lazy as _
+from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
-from django.apps import apps
+from django.utils import timezone
 from datetime import datetime, timedelta
 
-from apps.audit.models import AuditLog
+from apps.audit.export import get_export_config, get_export_window, iter_export
+from apps.audit.models import AuditArchive, AuditContentType, AuditLog, AuditUser
+from apps.audit.partitions import format_partition, get_hot_partition, partition_bounds, partition_for
 
 class AuditLogListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
     """
@@ -22,7 +26,8 @@ class AuditLogListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
         """
         Filtra los registros de AuditLog según los parámetros de la solicitud.
         """
-        queryset = super().get_queryset()
+        # Usuario y modelo se muestran en cada fila: traerlos en la misma consulta
+        queryset = super().get_queryset().select_related('user', 'content_type')
         
         # Obtener filtros de la solicitud
         filters = self.request.GET.dict()
@@ -49,60 +54,65 @@ class AuditLogListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
         if object_id_filter:
             queryset = queryset.filter(object_id=object_id_filter)
         
-        # Filtro por fecha
-        date_start = filters.get('date_start')
-        date_end = filters.get('date_end')
+        # Rango de fechas (fecha inicio/fin y período predefinido). Si no pide
+        # meses anteriores solo se consultan las particiones recientes
+        range_start, range_end = self.get_date_range(filters)
+        queryset = queryset.in_range(range_start, range_end)
+        hot_start = partition_bounds(get_hot_partition())[0]
+        self.hot_only = range_start is None and (range_end is None or range_end > hot_start)
+        if self.hot_only:
+            queryset = queryset.hot()
+        self.date_range = (range_start, range_end)
         
+        # Búsqueda de texto
+        search_query = filters.get('search')
+        if search_query:
+            queryset = queryset.filter(
+                Q(description__icontains=search_query) |
+                Q(object_id__icontains=search_query) |
+                Q(user__username__icontains=search_query) |
+                Q(ip_address__icontains=search_query)
+            )
+        
+        return queryset
+    
+    def get_date_range(self, filters):
+        """
+        (inicio, fin) del rango solicitado, con fin exclusivo; None donde no se
+        limita. Si se indican fechas y período se usa su intersección.
+        """
+        starts, ends = [], []
+        
+        date_start = filters.get('date_start')
         if date_start:
             try:
-                date_start = datetime.strptime(date_start, '%Y-%m-%d')
-                queryset = queryset.filter(timestamp__gte=date_start)
+                starts.append(timezone.make_aware(datetime.strptime(date_start, '%Y-%m-%d')))
             except ValueError:
                 pass
         
+        date_end = filters.get('date_end')
         if date_end:
             try:
-                date_end = datetime.strptime(date_end, '%Y-%m-%d')
                 # Añadir un día para incluir todo el día final
-                date_end = date_end + timedelta(days=1)
-                queryset = queryset.filter(timestamp__lt=date_end)
+                ends.append(timezone.make_aware(datetime.strptime(date_end, '%Y-%m-%d')) + timedelta(days=1))
             except ValueError:
                 pass
         
         # Filtro de período predefinido
         period = filters.get('period')
-        today = datetime.now()
+        today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
         if period == 'today':
-            queryset = queryset.filter(
-                timestamp__gte=today.replace(hour=0, minute=0, second=0),
-                timestamp__lt=(today + timedelta(days=1)).replace(hour=0, minute=0, second=0)
-            )
+            starts.append(today)
+            ends.append(today + timedelta(days=1))
         elif period == 'yesterday':
-            yesterday = today - timedelta(days=1)
-            queryset = queryset.filter(
-                timestamp__gte=yesterday.replace(hour=0, minute=0, second=0),
-                timestamp__lt=today.replace(hour=0, minute=0, second=0)
-            )
+            starts.append(today - timedelta(days=1))
+            ends.append(today)
         elif period == 'week':
-            start_of_week = today - timedelta(days=today.weekday())
-            queryset = queryset.filter(
-                timestamp__gte=start_of_week.replace(hour=0, minute=0, second=0)
-            )
+            starts.append(today - timedelta(days=today.weekday()))
         elif period == 'month':
-            start_of_month = today.replace(day=1, hour=0, minute=0, second=0)
-            queryset = queryset.filter(timestamp__gte=start_of_month)
+            starts.append(today.replace(day=1))
         
-        # Búsqueda de texto
-        search_query = filters.get('search')
-        if search_query:
-            queryset = queryset.filter(
-                Q(description__icontains=search_query) |
-                Q(object_id__icontains=search_query) |
-                Q(user__username__icontains=search_query) |
-                Q(ip_address__icontains=search_query)
-            )
-        
-        return queryset
+        return (max(starts) if starts else None, min(ends) if ends else None)
     
     def get_context_data(self, **kwargs):
         """
@@ -111,20 +121,17 @@ class AuditLogListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
         context = super().get_context_data(**kwargs)
         context['title'] = _('Registros de Auditoría')
         
-        # Modelos auditados (obtenidos de AUDIT_MODELS en settings.py)
-        from django.conf import settings
-        
+        # Modelos con registros de auditoría (resumen mantenido al escribirlos)
         context['audit_models'] = []
-        for model_path in getattr(settings, 'AUDIT_MODELS', []):
-            try:
-                app_label, model_name = model_path.split('.')
-                model_class = apps.get_model(app_label, model_name)
-                context['audit_models'].append({
-                    'id': model_path,
-                    'name': model_class._meta.verbose_name
-                })
-            except (ValueError, LookupError):
+        for summary in AuditContentType.objects.select_related('content_type'):
+            model_class = summary.content_type.model_class()
+            if model_class is None:
                 continue
+            context['audit_models'].append({
+                'id': f"{model_class._meta.app_label}.{model_class.__name__}",
+                'name': model_class._meta.verbose_name
+            })
+        context['audit_models'].sort(key=lambda model: str(model['name']))
         
         # Tipos de acciones
         context['action_types'] = [
@@ -145,13 +152,66 @@ class AuditLogListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
             {'id': 'month', 'name': _('Este mes')},
         ]
         
-        # Usuarios que han realizado acciones
-        User = apps.get_model(settings.AUTH_USER_MODEL.split('.')[0], settings.AUTH_USER_MODEL.split('.')[1])
+        # Usuarios que han realizado acciones (resumen, sin recorrer AuditLog)
+        User = get_user_model()
         context['users'] = User.objects.filter(
-            id__in=AuditLog.objects.values_list('user_id', flat=True).distinct()
+            id__in=AuditUser.objects.values('user_id')
         ).order_by('username')
         
+        # Particiones consultadas: recientes por defecto; las archivadas del rango
+        # ya no están en la base de datos (ver archive_audit_logs)
+        range_start, range_end = getattr(self, 'date_range', (None, None))
+        archived = AuditArchive.objects.all()
+        if getattr(self, 'hot_only', False):
+            context['hot_since'] = partition_bounds(get_hot_partition())[0]
+            archived = archived.filter(partition__gte=get_hot_partition())
+        elif range_start is not None:
+            archived = archived.filter(partition__gte=partition_for(range_start))
+        if range_end is not None:
+            archived = archived.filter(partition__lte=partition_for(range_end - timedelta(microseconds=1)))
+        context['archived_partitions'] = [format_partition(archive.partition) for archive in archived]
+        
         # Guardar los filtros actuales para mantener el estado en la UI
         context['current_filters'] = self.request.GET.dict()
         
-        return context
\ No newline at end of file
+        return context
+
+
+class AuditLogExportView(LoginRequiredMixin, PermissionRequiredMixin, View):
+    """
+    Exporta los registros de auditoría en NDJSON, en orden de id, a partir de
+    una marca (?after=<id>). La respuesta incluye la marca para la siguiente
+    lectura en la cabecera X-Audit-Watermark, de modo que un recolector externo
+    (SIEM) puede seguir el historial sin paginar la vista ni recorrer OFFSET.
+
+    Parámetros: after, limit (máximo AUDIT_EXPORT['MAX_LIMIT']), model
+    ('app_label.Modelo') y action, estos dos repetibles.
+    """
+    permission_required = 'audit.view_auditlog'
+    # Cliente automático: 403 en lugar de redirigir al login
+    raise_exception = True
+
+    def get(self, request, *args, **kwargs):
+        max_limit = get_export_config()['MAX_LIMIT']
+        try:
+            after = int(request.GET.get('after') or 0)
+            limit = min(int(request.GET.get('limit') or max_limit), max_limit)
+            if after < 0 or limit < 1:
+                raise ValueError
+        except ValueError:
+            return HttpResponseBadRequest('after y limit deben ser enteros positivos')
+
+        try:
+            queryset, watermark = get_export_window(
+                after=after,
+                limit=limit,
+                models=request.GET.getlist('model'),
+                actions=request.GET.getlist('action'),
+            )
+        except (LookupError, ValueError):
+            return HttpResponseBadRequest('Modelo no válido')
+
+        response = StreamingHttpResponse(iter_export(queryset), content_type='application/x-ndjson')
+        response['X-Audit-Watermark'] = str(watermark)
+        response['Cache-Control'] = 'no-store'
+        return response
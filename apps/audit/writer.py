@@ -0,0 +1,211 @@
+# writer.py
+import logging
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.utils.dateparse import parse_datetime
+
+from apps.audit.models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+# Campos de AuditLog que viajan a Celery en modo 'celery'
+EVENT_FIELDS = (
+    'user_id', 'action', 'timestamp', 'ip_address', 'user_agent', 'content_type_id',
+    'object_id', 'table_name', 'data_before', 'data_after', 'is_diff', 'description',
+)
+
+# Eventos confirmados de la solicitud en curso (None fuera de request_scope)
+_request_logs = ContextVar('audit_request_logs', default=None)
+# Atributo de la conexión con sus grupos de eventos por savepoint
+GROUPS_ATTR = '_audit_writer_groups'
+
+
+class _Group:
+    """
+    Eventos registrados dentro de un mismo savepoint (o de la transacción). Solo
+    el callback on_commit del grupo lo referencia: si Django lo descarta (al
+    revertir el savepoint o la transacción) el grupo se libera con sus eventos.
+    """
+
+    def __init__(self):
+        self.logs = []
+
+
+class AuditWriter:
+    """
+    Escritor de registros de auditoría por lotes.
+
+    Los eventos se acumulan por transacción y se insertan con un solo
+    bulk_create cuando la transacción se confirma (transaction.on_commit):
+    - Cada savepoint tiene su propio grupo. Si el savepoint se revierte, Django
+      descarta su callback y con él los eventos de cambios que no ocurrieron,
+      sin afectar a los del resto de la transacción.
+    - Dentro de una solicitud (AuditMiddleware) los eventos confirmados se
+      escriben juntos al terminarla; fuera de una solicitud, al confirmarse.
+    - Modo 'celery': los eventos confirmados se envían a una tarea. Si no se
+      pueden encolar, se escriben en la base de datos.
+    - Si la escritura falla, se reintenta registro por registro y lo que aun así
+      falle queda en el log de errores con todos sus datos.
+
+    Configuración: settings.AUDIT_WRITER = {'MODE': 'sync' | 'celery', 'BATCH_SIZE': 500}
+    """
+
+    def __init__(self, mode='sync', batch_size=500):
+        self.mode = mode
+        self.batch_size = batch_size
+
+    # --- Estado por conexión y por solicitud ---
+
+    @staticmethod
+    def _groups(connection):
+        # Los grupos pertenecen a la transacción de la conexión, que Django no
+        # comparte entre hilos ni entre solicitudes concurrentes (ASGI). Las
+        # referencias son débiles: los grupos de savepoints revertidos no quedan
+        # retenidos en conexiones persistentes
+        groups = connection.__dict__.get(GROUPS_ATTR)
+        if groups is None:
+            groups = connection.__dict__[GROUPS_ATTR] = weakref.WeakValueDictionary()
+        return groups
+
+    @contextmanager
+    def request_scope(self):
+        """Acumula los eventos confirmados durante la solicitud y los escribe al final"""
+        if _request_logs.get() is not None:
+            # Ámbito anidado: los escribe el exterior
+            yield
+            return
+        token = _request_logs.set([])
+        try:
+            yield
+        finally:
+            self.flush()
+            _request_logs.reset(token)
+
+    # --- Registro de eventos ---
+
+    def add(self, log):
+        self.add_many([log])
+
+    def add_many(self, logs):
+        """Registra AuditLog sin guardar; se escriben cuando su transacción se confirma"""
+        logs = list(logs)
+        if not logs:
+            return
+
+        using = router.db_for_write(AuditLog)
+        connection = connections[using]
+        if not connection.in_atomic_block:
+            # Sin transacción el cambio ya está confirmado
+            self.confirm(logs)
+            return
+
+        self._get_group(connection).logs.extend(logs)
+
+    def pending_logs(self):
+        """
+        Eventos de este contexto registrados y aún no escritos: los de la
+        transacción en curso y los confirmados que esperan el fin de la solicitud
+        """
+        logs = list(_request_logs.get() or [])
+        connection = connections[router.db_for_write(AuditLog)]
+        for group in list(self._groups(connection).values()):
+            logs.extend(group.logs)
+        return logs
+
+    def _get_group(self, connection):
+        """Grupo del savepoint actual, registrando su callback si hace falta"""
+        groups = self._groups(connection)
+        key = connection.savepoint_ids[-1] if connection.savepoint_ids else None
+        group = groups.get(key)
+        if group is None:
+            group = _Group()
+            transaction.on_commit(partial(self._commit_group, connection, key, group), using=connection.alias)
+            groups[key] = group
+        return group
+
+    def _commit_group(self, connection, key, group):
+        groups = self._groups(connection)
+        if groups.get(key) is group:
+            del groups[key]
+        self.confirm(group.logs)
+
+    def confirm(self, logs):
+        """Eventos de cambios ya confirmados: escribir ahora o al final de la solicitud"""
+        pending = _request_logs.get()
+        if pending is None:
+            self.write(logs)
+            return
+        pending.extend(logs)
+        if len(pending) >= self.batch_size * 10:
+            self.flush()
+
+    def flush(self):
+        """Escribe los eventos acumulados de la solicitud en curso"""
+        pending = _request_logs.get()
+        if pending:
+            logs = pending[:]
+            pending.clear()
+            self.write(logs)
+
+    # --- Escritura ---
+
+    def write(self, logs):
+        if self.mode == 'celery':
+            from apps.audit.tasks import write_audit_logs_task
+
+            try:
+                write_audit_logs_task.delay([self.serialize(log) for log in logs])
+                return
+            except Exception as e:
+                logger.warning(f"No se pudieron encolar {len(logs)} registros de auditoría, se escriben ahora: {e}")
+        self.write_logs(logs)
+
+    def write_logs(self, logs):
+        try:
+            # Savepoint propio para no invalidar la transacción de quien escribe
+            with transaction.atomic(using=router.db_for_write(AuditLog)):
+                AuditLog.objects.bulk_create(logs, batch_size=self.batch_size)
+            return
+        except Exception as e:
+            logger.warning(f"Falló la escritura por lotes de {len(logs)} registros de auditoría: {e}")
+
+        for log in logs:
+            try:
+                with transaction.atomic(using=router.db_for_write(AuditLog)):
+                    log.save(force_insert=True)
+            except Exception:
+                logger.exception(f"Registro de auditoría no guardado: {self.serialize(log)}")
+
+    @staticmethod
+    def serialize(log):
+        event = {name: getattr(log, name) for name in EVENT_FIELDS}
+        if event['timestamp'] is not None:
+            event['timestamp'] = event['timestamp'].isoformat()
+        return event
+
+    @staticmethod
+    def deserialize(event):
+        event = dict(event)
+        if event.get('timestamp'):
+            event['timestamp'] = parse_datetime(event['timestamp'])
+        return AuditLog(**event)
+
+
+_audit_writer = None
+
+
+def get_audit_writer():
+    """Instancia compartida configurada con settings.AUDIT_WRITER"""
+    global _audit_writer
+    if _audit_writer is None:
+        config = getattr(settings, 'AUDIT_WRITER', {})
+        _audit_writer = AuditWriter(
+            mode=config.get('MODE', 'sync'),
+            batch_size=config.get('BATCH_SIZE', 500),
+        )
+    return _audit_writer
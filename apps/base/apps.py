@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class BaseConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.base'
+
+    def ready(self):
+        from apps.base.signals.listcache import connect_list_count_signals
+        from apps.base.signals.pdfcache import connect_pdf_cache_signals
+        from apps.base.signals.search import connect_search_signals
+
+        # Receptores por modelo según settings, en todos los procesos (carguen
+        # o no las vistas): web, Celery, comandos y shell
+        connect_search_signals()
+        connect_pdf_cache_signals()
+        connect_list_count_signals()
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.urls import get_resolver
+
+from apps.base.services.listfilters import get_list_views
+
+
+class Command(BaseCommand):
+    help = 'Informa de los filtros y ordenamientos de las vistas de lista que no tienen un índice que los soporte'
+
+    def handle(self, *args, **options):
+        # Cargar las URLs importa las vistas, que se registran al definirse
+        get_resolver().url_patterns
+
+        missing = 0
+        for view_path, view_class in sorted(get_list_views().items()):
+            try:
+                report = view_class.get_index_report()
+            except ValueError as e:
+                self.stderr.write(self.style.ERROR(f'{view_path}: declaración inválida: {e}'))
+                continue
+
+            if view_class.filter_fields is None:
+                self.stdout.write(self.style.WARNING(
+                    f'{view_path}: sin filter_fields, acepta cualquier filter_*'
+                ))
+            for parameter, lookup, problem in report:
+                missing += 1
+                self.stdout.write(f'{view_path}: {parameter} ({lookup}): {problem}')
+
+        if missing:
+            self.stdout.write(self.style.WARNING(
+                f'{missing} filtros u ordenamientos sin índice. Añadir models.Index(fields=[...]) '
+                f'en Meta.indexes del modelo indicado o un índice de búsqueda (rebuild_search_index)'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('Todos los filtros y ordenamientos declarados tienen índice'))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from apps.base.services.pdfcache import get_pdf_cache
+
+
+class Command(BaseCommand):
+    help = 'Muestra aciertos, fallos y tiempo medio de generación de la caché de PDFs por modelo'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Reiniciar los contadores después de mostrarlos'
+        )
+
+    def handle(self, *args, **options):
+        cache = get_pdf_cache()
+        stats = cache.get_stats()
+        if not stats:
+            self.stdout.write('Sin métricas registradas')
+
+        for label, values in sorted(stats.items()):
+            hits = int(values.get('hits', 0))
+            misses = int(values.get('misses', 0))
+            renders = int(values.get('renders', 0))
+            requests = hits + misses
+            hit_ratio = hits / requests * 100 if requests else 0
+            avg_render = values.get('render_time', 0) / renders if renders else 0
+            self.stdout.write(
+                f'{label}: {hits} aciertos, {misses} fallos ({hit_ratio:.1f}% aciertos), '
+                f'{renders} generaciones, {avg_render * 1000:.0f} ms de media'
+            )
+
+        if options['reset']:
+            cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS('Contadores reiniciados'))
@@ -0,0 +1,71 @@
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router, transaction
+from django.urls import get_resolver
+
+from apps.base.services.search import get_search_backend, get_search_models
+
+
+class Command(BaseCommand):
+    help = 'Crea o reconstruye los índices de búsqueda de los modelos con search_fields en sus vistas de lista'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            action='append',
+            dest='models',
+            help='Modelo a indexar (app_label.Model, se puede repetir). Por defecto todos los registrados'
+        )
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='Solo mostrar los modelos y campos registrados'
+        )
+
+    def handle(self, *args, **options):
+        # Cargar las URLs importa las vistas, que registran sus search_fields
+        get_resolver().url_patterns
+
+        search_models = get_search_models()
+        if options['models']:
+            try:
+                selected = [apps.get_model(label) for label in options['models']]
+            except (LookupError, ValueError) as e:
+                raise CommandError(str(e))
+            missing = [model._meta.label for model in selected if model not in search_models]
+            if missing:
+                raise CommandError(f"Modelos sin search_fields registrados: {', '.join(missing)}")
+            search_models = {model: search_models[model] for model in selected}
+
+        for model, fields in search_models.items():
+            backend = get_search_backend(router.db_for_write(model))
+            if backend is None:
+                raise CommandError('No hay un motor de búsqueda disponible para esta base de datos')
+
+            text_fields = backend.get_text_fields(model, fields)
+            allowed = backend.is_index_allowed(model)
+            if options['list']:
+                note = '' if allowed else " (no está en SEARCH_INDEX['MODELS'])"
+                self.stdout.write(f"{model._meta.label}: {', '.join(text_fields) or '(sin campos de texto)'}{note}")
+                continue
+            if not allowed:
+                # Sin receptores conectados el índice quedaría desactualizado
+                message = f"{model._meta.label}: no está en SEARCH_INDEX['MODELS'], no se indexa"
+                if options['models']:
+                    raise CommandError(message)
+                self.stdout.write(self.style.WARNING(message))
+                continue
+
+            start = time.monotonic()
+            try:
+                with transaction.atomic(using=backend.using):
+                    count = backend.rebuild(model, fields)
+            except ValueError as e:
+                self.stdout.write(self.style.WARNING(str(e)))
+                continue
+            self.stdout.write(self.style.SUCCESS(
+                f"{model._meta.label}: {count} registros indexados en {', '.join(text_fields)} "
+                f"({time.monotonic() - start:.2f}s)"
+            ))
@@ -0,0 +1,80 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import get_resolver
+
+from apps.base.services.pdfcache import get_pdf_cache, get_report_views
+
+
+class Command(BaseCommand):
+    help = 'Precalienta la caché de PDFs generando los reportes de los objetos más consultados'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=50,
+            help='Número de objetos más consultados a generar por vista (por defecto 50)'
+        )
+        parser.add_argument(
+            '--view',
+            action='append',
+            dest='views',
+            help='Ruta de la vista a precalentar (se puede repetir). Por defecto todas las registradas'
+        )
+        parser.add_argument(
+            '--async',
+            action='store_true',
+            dest='use_celery',
+            help='Encolar la generación en Celery en lugar de hacerla en este proceso'
+        )
+
+    def handle(self, *args, **options):
+        # Cargar las URLs importa los módulos de vistas, que se registran al definirse
+        get_resolver().url_patterns
+
+        views = get_report_views()
+        if options['views']:
+            missing = set(options['views']) - set(views)
+            if missing:
+                raise CommandError(f"Vistas no registradas: {', '.join(sorted(missing))}")
+            views = {path: views[path] for path in options['views']}
+
+        cache = get_pdf_cache()
+        for view_path, view_class in views.items():
+            if not view_class.use_cache:
+                continue
+            label = view_class.model._meta.label
+            pks = cache.top_viewed(label, options['top'])
+            if not pks:
+                self.stdout.write(f'{view_path}: sin consultas registradas')
+                continue
+
+            if options['use_celery']:
+                from apps.base.tasks.pdf_tasks import prerender_pdf_task
+
+                for pk in pks:
+                    prerender_pdf_task.delay(view_path, pk)
+                self.stdout.write(self.style.SUCCESS(f'{view_path}: {len(pks)} PDFs encolados'))
+                continue
+
+            from apps.base.tasks.pdf_tasks import build_report_view
+
+            view = build_report_view(view_path)
+            rendered = cached = 0
+            start = time.monotonic()
+            for pk in pks:
+                obj = view.get_object(pk)
+                if obj is None:
+                    continue
+                try:
+                    if view.prerender(obj):
+                        rendered += 1
+                    else:
+                        cached += 1
+                except Exception as e:
+                    self.stderr.write(self.style.ERROR(f'{view_path} {pk}: {e}'))
+            self.stdout.write(self.style.SUCCESS(
+                f'{view_path}: {rendered} generados, {cached} ya en caché '
+                f'({time.monotonic() - start:.2f}s)'
+            ))
@@ -1,21 +1,30 @@
 # apps/base/models/middleware.py
-from threading import local
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Usuario de la solicitud (o tarea) en curso. Un ContextVar, a diferencia de un
+# threading.local, no se comparte entre solicitudes atendidas por el mismo hilo
+# (ASGI) y se propaga a sync_to_async/async_to_sync.
+_current_user = ContextVar('current_user', default=None)
+
+
+@contextmanager
+def current_user(user):
+    """Publica el usuario para BaseModel.save mientras dure el bloque"""
+    token = _current_user.set(user)
+    try:
+        yield
+    finally:
+        _current_user.reset(token)
 
-# Definir _thread_locals a nivel de módulo
-_thread_locals = local()
 
 class CurrentUserMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
-        # Limpiar el storage al inicio de cada solicitud
-        if hasattr(_thread_locals, 'user'):
-            del _thread_locals.user
-            
-        # Almacenar el usuario actual
-        if hasattr(request, 'user') and request.user.is_authenticated:
-            _thread_locals.user = request.user
-            
-        response = self.get_response(request)
-        return response
\ No newline at end of file
+        # Almacenar el usuario actual solo durante esta solicitud
+        user = request.user if hasattr(request, 'user') and request.user.is_authenticated else None
+        with current_user(user):
+            response = self.get_response(request)
+        return response
@@ -1,5 +1,5 @@
 # apps/base/models/utils.py
-from .middleware import _thread_locals
+from .middleware import _current_user
 
 def get_current_user():
-    return getattr(_thread_locals, 'user', None)
\ No newline at end of file
+    return _current_user.get()
@@ -0,0 +1,114 @@
+# apps/base/services/csvstaging.py
+import csv
+import json
+import os
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from apps.base.services.jobstore import FileJobStore
+
+
+def get_staging_dir():
+    """Directorio raíz donde se guardan las importaciones preparadas"""
+    return CSVStagingStore.get_root()
+
+
+class CSVStagingStore(FileJobStore):
+    """
+    Almacén temporal en disco para importaciones CSV.
+
+    Cada importación se identifica por un ``import_id`` y ocupa un directorio con:
+    - rows.jsonl: una fila del CSV por línea (JSON), escrita y leída en streaming
+    - meta.json: encabezados, total de filas, estado y progreso de la importación
+    - errors.csv: reporte descargable con los errores de la importación
+
+    Permite que la vista previa, la validación y la importación lean los datos
+    con memoria acotada en lugar de guardar el archivo completo en la sesión.
+    """
+    ROWS_FILE = 'rows.jsonl'
+    ERRORS_FILE = 'errors.csv'
+    root_setting = 'CSV_IMPORT_STAGING_DIR'
+    default_dirname = 'csv_imports'
+
+    @property
+    def import_id(self):
+        return self.job_id
+
+    @classmethod
+    def create(cls, fieldnames, **meta):
+        """Crea una nueva importación vacía con los encabezados indicados"""
+        return super().create(
+            fieldnames=list(fieldnames),
+            total_rows=0,
+            **meta
+        )
+
+    @property
+    def fieldnames(self):
+        return self.read_meta().get('fieldnames', [])
+
+    @property
+    def total_rows(self):
+        return self.read_meta().get('total_rows', 0)
+
+    # --- Filas ---
+
+    def write_rows(self, rows):
+        """Escribe las filas de un iterable (p.ej. csv.DictReader) sin materializarlas"""
+        total = 0
+        with open(self.file_path(self.ROWS_FILE), 'w', encoding='utf-8') as rows_file:
+            for row in rows:
+                rows_file.write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False))
+                rows_file.write('\n')
+                total += 1
+        self.update_meta(total_rows=total)
+        return total
+
+    def iter_rows(self):
+        """Itera las filas preparadas una a una"""
+        rows_path = self.file_path(self.ROWS_FILE)
+        if not os.path.exists(rows_path):
+            return
+        with open(rows_path, encoding='utf-8') as rows_file:
+            for line in rows_file:
+                if line.strip():
+                    yield json.loads(line)
+
+    def iter_chunks(self, size):
+        """Itera las filas en bloques de como máximo `size` elementos"""
+        rows = self.iter_rows()
+        while True:
+            chunk = list(islice(rows, size))
+            if not chunk:
+                break
+            yield chunk
+
+    def head(self, count):
+        """Devuelve las primeras `count` filas"""
+        return list(islice(self.iter_rows(), count))
+
+    def discard_rows(self):
+        """Elimina las filas preparadas conservando metadatos y reporte de errores"""
+        try:
+            os.remove(self.file_path(self.ROWS_FILE))
+        except FileNotFoundError:
+            pass
+
+    # --- Reporte de errores ---
+
+    @property
+    def error_report_path(self):
+        return self.file_path(self.ERRORS_FILE)
+
+    def append_errors(self, errors):
+        """Agrega mensajes de error al reporte descargable de la importación"""
+        if not errors:
+            return
+        is_new = not os.path.exists(self.error_report_path)
+        with open(self.error_report_path, 'a', encoding='utf-8', newline='') as report:
+            writer = csv.writer(report)
+            if is_new:
+                writer.writerow(['error'])
+            for error in errors:
+                writer.writerow([error])
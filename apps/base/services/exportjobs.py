@@ -0,0 +1,63 @@
+# apps/base/services/exportjobs.py
+import hashlib
+import json
+import os
+import time
+import uuid
+
+from apps.base.services.jobstore import FileJobStore
+
+
+class ExportJobStore(FileJobStore):
+    """
+    Trabajo de exportación en segundo plano.
+
+    El ``job_id`` se deriva de los parámetros de la exportación (vista, formato,
+    filtros y usuario), de modo que dos solicitudes idénticas del mismo usuario
+    comparten el mismo trabajo y su archivo generado mientras no haya vencido. El directorio contiene:
+    - meta.json: estado, parámetros, nombre de archivo y tipo de contenido
+    - artifact: el archivo exportado
+    """
+    ARTIFACT_FILE = 'artifact'
+    root_setting = 'EXPORT_JOBS_DIR'
+    default_dirname = 'exports'
+
+    @staticmethod
+    def make_job_id(**params):
+        """Identificador estable para un conjunto de parámetros de exportación"""
+        payload = json.dumps(params, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+    @property
+    def artifact_path(self):
+        return self.file_path(self.ARTIFACT_FILE)
+
+    def has_artifact(self):
+        return os.path.exists(self.artifact_path)
+
+    def write_artifact(self, chunks):
+        """Escribe el archivo exportado a partir de un iterable de bytes"""
+        tmp_path = self.file_path(f'{self.ARTIFACT_FILE}.{uuid.uuid4().hex}.tmp')
+        size = 0
+        with open(tmp_path, 'wb') as artifact:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                artifact.write(chunk)
+                size += len(chunk)
+        os.replace(tmp_path, self.artifact_path)
+        return size
+
+    def is_reusable(self, ttl):
+        """
+        Indica si el trabajo puede atender una solicitud idéntica: en curso o
+        terminado con su archivo, y creado hace menos de `ttl` segundos
+        """
+        if not self.exists():
+            return False
+        meta = self.read_meta()
+        if time.time() - meta.get('created_at', 0) > ttl:
+            return False
+        if meta.get('status') in ('queued', 'running'):
+            return True
+        return meta.get('status') == 'done' and self.has_artifact()
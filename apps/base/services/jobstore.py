@@ -0,0 +1,101 @@
+# apps/base/services/jobstore.py
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+logger = logging.getLogger(__name__)
+
+# Tiempo máximo (segundos) que un trabajo permanece en disco
+DEFAULT_JOB_MAX_AGE = 60 * 60 * 24
+
+
+class FileJobStore:
+    """
+    Directorio en disco para un trabajo en segundo plano (importación, exportación...).
+
+    Cada trabajo se identifica por un ``job_id`` y ocupa un directorio con un
+    meta.json (estado, progreso, parámetros) más los archivos propios del trabajo.
+    Las subclases indican el setting y el directorio por defecto de la raíz.
+    """
+    META_FILE = 'meta.json'
+    root_setting = None  # Nombre del setting con el directorio raíz
+    default_dirname = 'jobs'  # Directorio dentro de tempdir si el setting no existe
+
+    def __init__(self, job_id):
+        # El job_id llega desde la sesión o la URL: evitar rutas fuera del directorio
+        if not job_id or os.path.basename(job_id) != job_id:
+            raise ValueError(f'Identificador de trabajo inválido: {job_id}')
+        self.job_id = job_id
+        self.path = os.path.join(self.get_root(), job_id)
+
+    @classmethod
+    def get_root(cls):
+        """Directorio raíz donde se guardan los trabajos"""
+        root = getattr(
+            settings,
+            cls.root_setting or '',
+            None
+        ) or os.path.join(tempfile.gettempdir(), cls.default_dirname)
+        os.makedirs(root, exist_ok=True)
+        return str(root)
+
+    @classmethod
+    def create(cls, job_id=None, **meta):
+        """Crea un trabajo vacío con los metadatos indicados"""
+        store = cls(job_id or uuid.uuid4().hex)
+        os.makedirs(store.path, exist_ok=True)
+        store.write_meta({
+            'created_at': time.time(),
+            **meta,
+        })
+        return store
+
+    @classmethod
+    def purge_stale(cls, max_age=DEFAULT_JOB_MAX_AGE):
+        """Elimina trabajos más antiguos que max_age segundos"""
+        root = cls.get_root()
+        limit = time.time() - max_age
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            try:
+                if os.path.isdir(path) and os.path.getmtime(path) < limit:
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError as e:
+                logger.warning(f"No se pudo purgar el trabajo {name}: {e}")
+
+    # --- Archivos ---
+
+    def file_path(self, name):
+        return os.path.join(self.path, name)
+
+    def exists(self):
+        return os.path.exists(self.file_path(self.META_FILE))
+
+    def delete(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    # --- Metadatos ---
+
+    def read_meta(self):
+        with open(self.file_path(self.META_FILE), encoding='utf-8') as meta_file:
+            return json.load(meta_file)
+
+    def write_meta(self, meta):
+        # Escritura atómica para que los lectores nunca vean un archivo a medias
+        tmp_path = self.file_path(f'{self.META_FILE}.{uuid.uuid4().hex}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as meta_file:
+            json.dump(meta, meta_file, cls=DjangoJSONEncoder)
+        os.replace(tmp_path, self.file_path(self.META_FILE))
+
+    def update_meta(self, **values):
+        meta = self.read_meta()
+        meta.update(values)
+        self.write_meta(meta)
+        return meta
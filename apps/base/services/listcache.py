@@ -0,0 +1,202 @@
+# apps/base/services/listcache.py
+import hashlib
+import logging
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.paginator import Paginator
+from django.db.models import Count
+from django.utils.functional import cached_property
+
+logger = logging.getLogger(__name__)
+
+# Segundos que se conserva un conteo si ningún cambio lo invalida antes
+DEFAULT_LIST_COUNT_TIMEOUT = 120
+
+
+class ListCountCache:
+    """
+    Caché de conteos y agrupaciones (facetas) de los listados.
+
+    La clave se deriva del SQL del queryset sin ordenamiento, que ya incluye la
+    búsqueda, los filtros y las restricciones por usuario, más la versión de cada
+    tabla que participa en la consulta. Guardar o eliminar un registro incrementa
+    la versión de su modelo (signals/listcache.py), de modo que los conteos
+    afectados dejan de usarse sin tener que localizarlos. Los receptores se
+    conectan en BaseConfig.ready para los modelos de
+    settings.LIST_COUNT_CACHE['MODELS']; una consulta que une otras tablas no
+    se guarda en caché.
+
+    Las versiones deben verse desde todos los procesos que guardan (web y
+    Celery): con una caché local del proceso (LocMemCache) los conteos quedarían
+    desactualizados hasta el TIMEOUT, así que en ese caso no se usa la caché.
+
+    Configuración: settings.LIST_COUNT_CACHE = {'ALIAS': 'default', 'TIMEOUT': 120, 'MODELS': [...]}
+    """
+
+    def __init__(self, alias='default', timeout=DEFAULT_LIST_COUNT_TIMEOUT, prefix='listcount'):
+        self.alias = alias
+        self.timeout = timeout
+        self.prefix = prefix
+        # Modelos no declarados ya advertidos en este proceso
+        self._warned = set()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @cached_property
+    def enabled(self):
+        """False si el alias no es una caché compartida entre procesos"""
+        try:
+            cache = self.cache
+        except Exception as e:
+            logger.warning(f"Caché de conteos desactivada: alias '{self.alias}' no válido ({e})")
+            return False
+        if isinstance(cache, (LocMemCache, DummyCache)):
+            logger.warning(
+                f"Caché de conteos desactivada: el alias '{self.alias}' usa {type(cache).__name__}, "
+                "que no se comparte entre procesos (ver LIST_COUNT_CACHE en settings)"
+            )
+            return False
+        return True
+
+    # --- Versiones por modelo ---
+
+    def version_key(self, label):
+        return f'{self.prefix}:version:{label}'
+
+    def get_versions(self, labels):
+        keys = {label: self.version_key(label) for label in labels}
+        stored = self.cache.get_many(list(keys.values()))
+        return {label: stored.get(key, 0) for label, key in keys.items()}
+
+    def bump_version(self, label):
+        if not self.enabled:
+            return
+        key = self.version_key(label)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            # Primera invalidación: cualquier valor distinto de 0 sirve
+            self.cache.set(key, time.time_ns(), None)
+
+    # --- Claves ---
+
+    @staticmethod
+    def get_query_models(queryset):
+        """Etiquetas de los modelos cuyas tablas participan en la consulta"""
+        tables = {join.table_name for join in queryset.query.alias_map.values()}
+        tables.add(queryset.model._meta.db_table)
+        return sorted(
+            model._meta.label for model in apps.get_models()
+            if model._meta.db_table in tables
+        )
+
+    def make_key(self, kind, queryset, *extra):
+        """Clave del conteo, o None si la consulta une modelos no declarados"""
+        queryset = queryset.order_by()
+        sql, params = queryset.query.sql_with_params()
+        labels = self.get_query_models(queryset)
+        missing = set(labels) - get_list_count_cache_labels()
+        if missing:
+            # Sin receptores sus cambios no invalidarían el conteo: no usar la caché
+            if missing - self._warned:
+                logger.warning(
+                    f"Conteo de {queryset.model._meta.label} sin caché, faltan en "
+                    f"LIST_COUNT_CACHE['MODELS']: {', '.join(sorted(missing))}"
+                )
+                self._warned.update(missing)
+            return None
+        versions = self.get_versions(labels)
+        payload = repr((kind, queryset.db, sql, params, sorted(versions.items()), extra))
+        digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+        return f'{self.prefix}:{kind}:{queryset.model._meta.label}:{digest}'
+
+    # --- Conteos ---
+
+    def get_or_compute(self, key, compute):
+        try:
+            value = self.cache.get(key)
+        except Exception as e:
+            logger.warning(f"No se pudo leer la caché de conteos: {e}")
+            return compute()
+        if value is None:
+            value = compute()
+            try:
+                self.cache.set(key, value, self.timeout)
+            except Exception as e:
+                logger.warning(f"No se pudo guardar en la caché de conteos: {e}")
+        return value
+
+    def count(self, queryset):
+        """COUNT(*) del queryset, memorizado"""
+        if not self.enabled:
+            return queryset.count()
+        try:
+            key = self.make_key('count', queryset)
+        except Exception as e:
+            # Consultas que no se pueden compilar a SQL (p.ej. resultados vacíos)
+            logger.debug(f"Conteo sin caché: {e}")
+            return queryset.count()
+        if key is None:
+            return queryset.count()
+        return self.get_or_compute(key, queryset.count)
+
+    def facet(self, queryset, field):
+        """[(valor, total)] agrupando el queryset por el campo, memorizado"""
+        def compute():
+            rows = queryset.order_by().values_list(field).annotate(total=Count('pk')).order_by(field)
+            return list(rows)
+
+        if not self.enabled:
+            return compute()
+        try:
+            key = self.make_key('facet', queryset, field)
+        except Exception as e:
+            logger.debug(f"Faceta sin caché: {e}")
+            return compute()
+        if key is None:
+            return compute()
+        return self.get_or_compute(key, compute)
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator cuyo total se obtiene de ListCountCache"""
+
+    def __init__(self, object_list, per_page, count_cache=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_cache = count_cache or get_list_count_cache()
+
+    @cached_property
+    def count(self):
+        if hasattr(self.object_list, 'query'):
+            return self.count_cache.count(self.object_list)
+        return len(self.object_list)
+
+
+def get_list_count_cache_labels():
+    """
+    Modelos de settings.LIST_COUNT_CACHE['MODELS']: BaseConfig.ready() conecta
+    su invalidación en todos los procesos y solo sus consultas usan la caché
+    """
+    return set(getattr(settings, 'LIST_COUNT_CACHE', {}).get('MODELS', []))
+
+
+_list_count_cache = None
+
+
+def get_list_count_cache():
+    """Instancia compartida configurada con settings.LIST_COUNT_CACHE"""
+    global _list_count_cache
+    if _list_count_cache is None:
+        config = getattr(settings, 'LIST_COUNT_CACHE', {})
+        _list_count_cache = ListCountCache(
+            alias=config.get('ALIAS', 'default'),
+            timeout=config.get('TIMEOUT', DEFAULT_LIST_COUNT_TIMEOUT),
+        )
+    return _list_count_cache
@@ -0,0 +1,211 @@
+# apps/base/services/listfilters.py
+import datetime
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import models
+from django.db.models import Q
+from django.db.models.constants import LOOKUP_SEP
+from django.utils import timezone
+
+# Vistas de lista con modelo, registradas al definirse (OptimizedListView)
+_list_views = {}
+
+
+def register_list_view(view_class):
+    view_path = f"{view_class.__module__}.{view_class.__qualname__}"
+    _list_views[view_path] = view_class
+
+
+def get_list_views():
+    return dict(_list_views)
+
+
+# Búsquedas de texto que un índice B-tree no puede resolver
+TEXT_SEARCH_LOOKUPS = {'contains', 'icontains', 'iexact', 'endswith', 'iendswith', 'regex', 'iregex'}
+TRUE_VALUES = {'1', 'true', 't', 'on', 'yes', 'si', 'sí'}
+FALSE_VALUES = {'0', 'false', 'f', 'off', 'no'}
+
+
+def resolve_lookup(model, lookup):
+    """
+    Separa 'relacion__campo__lookup' en (campos recorridos, lookup).
+    Lanza ValueError si la ruta no corresponde a campos del modelo.
+    """
+    parts = lookup.split(LOOKUP_SEP)
+    fields = []
+    current = model
+    for index, part in enumerate(parts):
+        if part == 'pk':
+            part = current._meta.pk.name
+        try:
+            field = current._meta.get_field(part)
+        except FieldDoesNotExist:
+            if not fields:
+                raise ValueError(f'{model._meta.label} no tiene el campo {part}')
+            return fields, LOOKUP_SEP.join(parts[index:])
+        fields.append(field)
+        if field.is_relation:
+            current = field.related_model
+    return fields, 'exact'
+
+
+def get_indexed_fields(model):
+    """Nombres de campos que encabezan algún índice del modelo"""
+    indexed = set()
+    for field in model._meta.concrete_fields:
+        if field.primary_key or field.unique or field.db_index:
+            indexed.add(field.name)
+    for index in model._meta.indexes:
+        if index.fields:
+            indexed.add(index.fields[0].lstrip('-'))
+    for fields in model._meta.unique_together:
+        indexed.add(fields[0])
+    for constraint in model._meta.constraints:
+        if isinstance(constraint, models.UniqueConstraint) and constraint.fields:
+            indexed.add(constraint.fields[0])
+    return indexed
+
+
+def get_index_problem(fields, lookup='exact'):
+    """
+    Motivo por el que la ruta de campos no tiene un índice que la soporte,
+    o None si lo tiene. Los saltos por relación usan la clave foránea (indexada
+    por defecto); se comprueba el campo final en su modelo.
+    """
+    for field in fields[:-1]:
+        if field.concrete and not (field.db_index or field.unique or field.primary_key):
+            return f'la relación {field.name} no tiene índice'
+    field = fields[-1]
+    if field.many_to_many or field.one_to_many:
+        return None  # Se filtra por la tabla intermedia / la FK inversa
+    if lookup.split(LOOKUP_SEP)[-1] in TEXT_SEARCH_LOOKUPS:
+        return f'{lookup} sobre {field.name} necesita un índice de texto (trigram/FTS)'
+    if field.name not in get_indexed_fields(field.model):
+        return f'{field.model._meta.label}.{field.name} no tiene índice'
+    return None
+
+
+class ListFilter:
+    """
+    Filtro declarado para el parámetro GET filter_<name>.
+
+    El lookup se valida contra el modelo al compilar y el valor se convierte al
+    tipo del campo una sola vez. Los filtros de fecha sobre campos DateTimeField
+    (__date, __range con fechas) se traducen a rangos [inicio, fin) que pueden
+    usar el índice del campo, en lugar de aplicar una función a la columna.
+    """
+
+    def __init__(self, model, name, lookup):
+        self.name = name
+        self.fields, self.lookup = resolve_lookup(model, lookup)
+        self.path = LOOKUP_SEP.join(field.name for field in self.fields)
+        field = self.fields[-1]
+        # Convertir los valores de las relaciones al tipo de su clave
+        self.field = field.target_field if field.is_relation and not field.many_to_many and field.concrete else field
+
+    def __repr__(self):
+        return f'<ListFilter {self.name}: {self.path}__{self.lookup}>'
+
+    @property
+    def index_problem(self):
+        return get_index_problem(self.fields, self.lookup)
+
+    def coerce(self, value):
+        value = value.strip()
+        if isinstance(self.field, models.BooleanField):
+            if value.lower() in TRUE_VALUES:
+                return True
+            if value.lower() in FALSE_VALUES:
+                return False
+            raise ValidationError(f'Valor booleano inválido: {value}')
+        return self.field.to_python(value)
+
+    def coerce_date(self, value):
+        return models.DateField().to_python(value.strip())
+
+    def is_datetime(self):
+        return isinstance(self.field, models.DateTimeField)
+
+    @staticmethod
+    def start_of_day(date):
+        moment = datetime.datetime.combine(date, datetime.time.min)
+        return timezone.make_aware(moment) if settings.USE_TZ else moment
+
+    def is_day_bound(self, value):
+        """Fecha sin hora sobre un DateTimeField: el límite abarca el día completo"""
+        return self.is_datetime() and len(value.strip()) == 10
+
+    def build(self, value):
+        """Q para el valor del parámetro. Lanza ValidationError si no es válido"""
+        path = self.path
+        if self.lookup == 'date' and self.is_datetime():
+            start = self.start_of_day(self.coerce_date(value))
+            return Q(**{f'{path}__gte': start, f'{path}__lt': start + datetime.timedelta(days=1)})
+        if self.lookup == 'date':
+            return Q(**{path: self.coerce_date(value)})
+
+        if self.lookup == 'range':
+            # Formato esperado: inicio,fin (cualquiera de los dos puede omitirse)
+            try:
+                start, end = value.split(',')
+            except ValueError:
+                raise ValidationError(f'Rango inválido: {value}')
+            filters = Q()
+            if start.strip():
+                if self.is_day_bound(start):
+                    filters &= Q(**{f'{path}__gte': self.start_of_day(self.coerce_date(start))})
+                else:
+                    filters &= Q(**{f'{path}__gte': self.coerce(start)})
+            if end.strip():
+                if self.is_day_bound(end):
+                    # Incluir todo el día final
+                    end_day = self.start_of_day(self.coerce_date(end)) + datetime.timedelta(days=1)
+                    filters &= Q(**{f'{path}__lt': end_day})
+                else:
+                    filters &= Q(**{f'{path}__lte': self.coerce(end)})
+            return filters
+
+        if self.lookup == 'in':
+            return Q(**{f'{path}__in': [self.coerce(item) for item in value.split(',') if item.strip()]})
+
+        if self.lookup == 'isnull':
+            if value.strip().lower() in TRUE_VALUES:
+                return Q(**{f'{path}__isnull': True})
+            if value.strip().lower() in FALSE_VALUES:
+                return Q(**{f'{path}__isnull': False})
+            raise ValidationError(f'Valor booleano inválido: {value}')
+
+        if self.lookup.split(LOOKUP_SEP)[-1] in TEXT_SEARCH_LOOKUPS | {'startswith', 'istartswith'}:
+            return Q(**{f'{path}__{self.lookup}': value})
+
+        return Q(**{f'{path}__{self.lookup}': self.coerce(value)})
+
+
+def compile_filters(model, spec):
+    """
+    {parámetro: ListFilter} a partir de la declaración de la vista:
+    - lista de nombres: cada nombre es a la vez el parámetro y el campo
+    - dict {nombre: lookup}: p.ej. {'tipo': 'third_party_type__code', 'alta': 'created_at__range'}
+    """
+    if isinstance(spec, dict):
+        items = spec.items()
+    else:
+        items = ((name, name) for name in spec)
+    return {name: ListFilter(model, name, lookup) for name, lookup in items}
+
+
+def compile_ordering(model, spec):
+    """{nombre: ruta de campo} de los ordenamientos permitidos (lista o dict)"""
+    if isinstance(spec, dict):
+        items = spec.items()
+    else:
+        items = ((name, name) for name in spec)
+
+    ordering = {}
+    for name, path in items:
+        fields, lookup = resolve_lookup(model, path)
+        if lookup != 'exact':
+            raise ValueError(f'Ordenamiento inválido para {model._meta.label}: {path}')
+        ordering[name] = (path, fields)
+    return ordering
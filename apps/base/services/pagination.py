@@ -0,0 +1,281 @@
+# apps/base/services/pagination.py
+import base64
+import binascii
+import datetime
+import hashlib
+import json
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import F, Q
+from django.db.models.constants import LOOKUP_SEP
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """Conserva los microsegundos (DjangoJSONEncoder los trunca a milisegundos)"""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+class InvalidCursor(Exception):
+    """El token de paginación no se puede decodificar"""
+
+
+class CursorPage:
+    """
+    Página obtenida por cursor. Expone la misma interfaz básica que
+    django.core.paginator.Page (has_next, has_previous, object_list...) más los
+    tokens opacos para la página siguiente y la anterior.
+    """
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.number = None  # Sin número de página: no hay OFFSET
+
+    def __repr__(self):
+        return f'<CursorPage {len(self.object_list)} objetos>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Paginación por conjunto de claves (keyset) sobre el ordenamiento del queryset.
+
+    En lugar de ``COUNT(*)`` + ``OFFSET n``, cada página filtra las filas que van
+    después (o antes) de la última fila vista según el ordenamiento, completado con
+    la clave primaria para que sea total. El coste de una página no depende de su
+    profundidad si existe un índice sobre los campos de ordenamiento.
+
+    Los tokens son opacos (base64 de los valores de la fila límite) e incluyen una
+    huella del ordenamiento: si este cambia, el token deja de aplicar.
+
+    count_mode:
+    - None: no contar
+    - 'estimate': estimación del planificador (solo PostgreSQL, None en otros motores)
+    - 'exact': COUNT(*) exacto
+    """
+    NEXT = 'n'
+    PREVIOUS = 'p'
+
+    def __init__(self, queryset, per_page, count_mode='estimate'):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.count_mode = count_mode
+        self.ordering = self.get_ordering(queryset)
+        # Incluye la dirección y la anulabilidad: un token de order_by=name no
+        # aplica con -name (el filtro de la fila límite sería el inverso)
+        self.fingerprint = hashlib.sha256(
+            ','.join(
+                f"{'-' if descending else ''}{name}{'?' if nullable else ''}"
+                for name, descending, nullable in self.ordering
+            ).encode('utf-8')
+        ).hexdigest()[:8]
+
+    @classmethod
+    def get_ordering(cls, queryset):
+        """
+        Lista de (campo, descendente, anulable) del ordenamiento del queryset,
+        terminada siempre en la clave primaria.
+        Lanza ValueError si el ordenamiento no admite paginación por cursor
+        (expresiones, campos de relación o campos inexistentes).
+        """
+        model = queryset.model
+        pk_name = model._meta.pk.name
+        ordering = []
+        for item in queryset.query.order_by or model._meta.ordering or []:
+            if not isinstance(item, str) or item == '?':
+                raise ValueError(f'Ordenamiento no admitido para cursor: {item!r}')
+            descending = item.startswith('-')
+            name = item.lstrip('-+')
+            if name == 'pk':
+                name = pk_name
+            field, nullable = cls.resolve_field(model, name)
+            ordering.append((name, descending, nullable))
+            if name == pk_name:
+                # La clave primaria ya hace el ordenamiento total
+                return ordering
+
+        ordering.append((pk_name, ordering[-1][1] if ordering else False, False))
+        return ordering
+
+    @staticmethod
+    def resolve_field(model, name):
+        """
+        (campo, anulable) para una ruta 'relacion__campo' que termina en un campo
+        concreto. Es anulable si lo es el campo o alguna relación del camino.
+        """
+        parts = name.split(LOOKUP_SEP)
+        field = None
+        nullable = False
+        for index, part in enumerate(parts):
+            try:
+                field = model._meta.get_field(part)
+            except FieldDoesNotExist:
+                raise ValueError(f'Campo de ordenamiento desconocido: {name}')
+            nullable = nullable or field.null
+            if field.is_relation:
+                if index == len(parts) - 1 or field.many_to_many or field.one_to_many:
+                    raise ValueError(f'Ordenamiento por relación no admitido para cursor: {name}')
+                model = field.related_model
+        return field, nullable
+
+    # --- Tokens ---
+
+    def encode_cursor(self, obj, direction):
+        payload = {
+            'o': self.fingerprint,
+            'd': direction,
+            'v': [self.get_value(obj, name) for name, _, _ in self.ordering],
+        }
+        data = json.dumps(payload, cls=CursorEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, token):
+        """
+        (dirección, valores) del token, o None si fue generado para otro
+        ordenamiento. Lanza InvalidCursor si el token está corrupto.
+        """
+        try:
+            data = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+            payload = json.loads(data)
+            direction, values = payload['d'], payload['v']
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise InvalidCursor(token)
+
+        if payload.get('o') != self.fingerprint:
+            return None
+        if direction not in (self.NEXT, self.PREVIOUS) or len(values) != len(self.ordering):
+            raise InvalidCursor(token)
+
+        try:
+            values = [
+                None if value is None else self.resolve_field(self.queryset.model, name)[0].to_python(value)
+                for (name, _, _), value in zip(self.ordering, values)
+            ]
+        except Exception:
+            raise InvalidCursor(token)
+        return direction, values
+
+    @staticmethod
+    def get_value(obj, name):
+        value = obj
+        for part in name.split(LOOKUP_SEP):
+            if value is None:
+                return None
+            value = getattr(value, part)
+        return value
+
+    # --- Consultas ---
+
+    def get_order_by(self, reverse=False):
+        order_by = []
+        for name, descending, nullable in self.ordering:
+            descending = descending != reverse
+            if nullable:
+                # NULL siempre como el mayor valor, igual en todos los motores
+                expression = F(name).desc(nulls_first=True) if descending else F(name).asc(nulls_last=True)
+            else:
+                expression = f'-{name}' if descending else name
+            order_by.append(expression)
+        return order_by
+
+    def get_keyset_filter(self, values, reverse=False):
+        """
+        Filas estrictamente posteriores a ``values`` en el ordenamiento (o
+        anteriores si reverse): (a > va) OR (a = va AND b > vb) OR ...
+        """
+        keyset = Q(pk__in=[])
+        equal = Q()
+        for (name, descending, nullable), value in zip(self.ordering, values):
+            descending = descending != reverse
+            if value is None:
+                # NULL es el mayor valor: después de él no hay nada en ascendente
+                after = Q(**{f'{name}__isnull': False}) if descending else Q(pk__in=[])
+                same = Q(**{f'{name}__isnull': True})
+            else:
+                after = Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+                if nullable and not descending:
+                    after |= Q(**{f'{name}__isnull': True})
+                same = Q(**{name: value})
+            keyset |= equal & after
+            equal &= same
+        return keyset
+
+    def get_page(self, token=None):
+        """Página que sigue (o precede) al token; la primera si no hay token"""
+        cursor = self.decode_cursor(token) if token else None
+        direction, values = cursor or (self.NEXT, None)
+        reverse = direction == self.PREVIOUS
+
+        queryset = self.queryset.order_by(*self.get_order_by(reverse))
+        if values is not None:
+            queryset = queryset.filter(self.get_keyset_filter(values, reverse))
+
+        # Una fila extra indica si hay más en la dirección de avance
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+
+        if reverse:
+            has_next, has_previous = values is not None, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        return CursorPage(
+            rows,
+            self,
+            next_cursor=self.encode_cursor(rows[-1], self.NEXT) if rows and has_next else None,
+            previous_cursor=self.encode_cursor(rows[0], self.PREVIOUS) if rows and has_previous else None,
+        )
+
+    # --- Conteo ---
+
+    @property
+    def count(self):
+        if not hasattr(self, '_count'):
+            if self.count_mode == 'exact':
+                self._count = self.queryset.count()
+            elif self.count_mode == 'estimate':
+                self._count = self.estimate_count()
+            else:
+                self._count = None
+        return self._count
+
+    def estimate_count(self):
+        """Filas estimadas por el planificador de PostgreSQL (None en otros motores)"""
+        connection = connections[self.queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        sql, params = self.queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
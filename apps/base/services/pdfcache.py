@@ -0,0 +1,454 @@
+# apps/base/services/pdfcache.py
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: contadores sin bloqueo (aproximados)
+    fcntl = None
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PDF_CACHE_MAX_SIZE = 512 * 1024 * 1024  # 512 MB
+
+
+def make_cache_key(*parts):
+    """Clave direccionada por contenido: hash de todo lo que determina el PDF"""
+    payload = '\x1f'.join(str(part) for part in parts)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class BasePDFCache:
+    """
+    Caché compartida de PDFs generados.
+
+    Además de los archivos, guarda un contador de versión por modelo que las
+    señales incrementan al guardar o eliminar registros; las vistas lo incluyen
+    en la clave, de modo que un cambio de datos invalida los PDFs sin borrarlos.
+    Los archivos se expulsan por antigüedad de uso (LRU) al superar max_size bytes.
+    """
+
+    def __init__(self, max_size=DEFAULT_PDF_CACHE_MAX_SIZE):
+        self.max_size = max_size
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, content, timeout=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def get_version(self, label):
+        raise NotImplementedError
+
+    def bump_version(self, label):
+        raise NotImplementedError
+
+    # --- Métricas ---
+
+    def record_view(self, label, pk):
+        """Cuenta una consulta del PDF de un objeto (para precalentar los más vistos)"""
+        raise NotImplementedError
+
+    def top_viewed(self, label, limit):
+        """pks de los objetos del modelo con más consultas, de mayor a menor"""
+        raise NotImplementedError
+
+    def incr_stats(self, label, **values):
+        """Acumula contadores del modelo: hits, misses, renders, render_time"""
+        raise NotImplementedError
+
+    def get_stats(self):
+        """{label: {contador: valor}} para todos los modelos"""
+        raise NotImplementedError
+
+    def reset_stats(self):
+        raise NotImplementedError
+
+
+class FileSystemPDFCache(BasePDFCache):
+    """
+    Caché en un directorio (compartido entre procesos o por un volumen común).
+
+    - objects/<xx>/<clave>.pdf: un archivo por PDF. El mtime guarda el vencimiento
+      y el atime el último uso, que se actualiza explícitamente en cada acierto.
+    - versions/<app_label.Model>: contador de versión del modelo. Solo existe para
+      los modelos que tienen PDFs en caché, así el resto de modelos no escribe
+      nada al guardarse.
+    - views/<app_label.Model>/<pk>: número de consultas del PDF del objeto.
+    - stats.json: contadores de aciertos, fallos y tiempo de generación.
+    Los contadores se actualizan bajo un bloqueo de archivo (fcntl) cuando está disponible.
+    """
+
+    def __init__(self, location, max_size=DEFAULT_PDF_CACHE_MAX_SIZE):
+        super().__init__(max_size)
+        self.location = str(location)
+        self.objects_dir = os.path.join(self.location, 'objects')
+        self.versions_dir = os.path.join(self.location, 'versions')
+        self.views_dir = os.path.join(self.location, 'views')
+        self.stats_path = os.path.join(self.location, 'stats.json')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.versions_dir, exist_ok=True)
+        os.makedirs(self.views_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.objects_dir, key[:2], f'{key}.pdf')
+
+    def _write(self, path, content):
+        # Escritura atómica: los lectores nunca ven un archivo a medias
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'wb') as tmp_file:
+            tmp_file.write(content)
+        os.replace(tmp_path, path)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as cached:
+                content = cached.read()
+            expires = os.stat(path).st_mtime
+        except OSError:
+            return None
+
+        now = time.time()
+        if expires < now:
+            self.delete(key)
+            return None
+
+        # Registrar el uso para la expulsión LRU, conservando el vencimiento
+        try:
+            os.utime(path, (now, expires))
+        except OSError:
+            pass
+        return content
+
+    def set(self, key, content, timeout=None):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._write(path, content)
+
+        now = time.time()
+        expires = now + timeout if timeout else now + 10 * 365 * 24 * 3600
+        os.utime(path, (now, expires))
+        self.evict()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        """Elimina vencidos y, si se supera max_size, los de uso más antiguo"""
+        now = time.time()
+        entries = []
+        total = 0
+        for root, _dirs, files in os.walk(self.objects_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if stat.st_mtime < now and name.endswith('.pdf'):
+                    self._remove(path)
+                    continue
+                entries.append((stat.st_atime, stat.st_size, path))
+                total += stat.st_size
+
+        if total <= self.max_size:
+            return
+
+        # Liberar hasta el 90% del límite para no expulsar en cada escritura
+        target = self.max_size * 0.9
+        for _atime, size, path in sorted(entries):
+            if total <= target:
+                break
+            self._remove(path)
+            total -= size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _version_path(self, label):
+        return os.path.join(self.versions_dir, label)
+
+    def _read_version(self, path):
+        with open(path, encoding='utf-8') as version_file:
+            return int(version_file.read() or 0)
+
+    def get_version(self, label):
+        path = self._version_path(label)
+        try:
+            # Sin bloqueo: las escrituras reemplazan el archivo de forma atómica
+            return self._read_version(path)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError):
+            return 0
+
+        # Empezar a seguir el modelo desde ahora, bajo el mismo bloqueo que los
+        # incrementos para no pisar uno que llegue entre la lectura y la creación
+        with self._counters_lock():
+            try:
+                return self._read_version(path)
+            except FileNotFoundError:
+                self._write(path, b'0')
+                return 0
+            except (OSError, ValueError):
+                return 0
+
+    def bump_version(self, label):
+        path = self._version_path(label)
+        # Leer e incrementar bajo el bloqueo: dos incrementos simultáneos no se pierden
+        with self._counters_lock():
+            try:
+                version = self._read_version(path)
+            except FileNotFoundError:
+                return
+            except (OSError, ValueError):
+                version = 0
+            self._write(path, str(version + 1).encode('utf-8'))
+
+    # --- Métricas ---
+
+    @contextmanager
+    def _counters_lock(self):
+        with open(os.path.join(self.location, 'counters.lock'), 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def record_view(self, label, pk):
+        label_dir = os.path.join(self.views_dir, label)
+        os.makedirs(label_dir, exist_ok=True)
+        path = os.path.join(label_dir, str(pk))
+        with self._counters_lock():
+            try:
+                with open(path, encoding='utf-8') as views_file:
+                    count = int(views_file.read() or 0)
+            except (OSError, ValueError):
+                count = 0
+            self._write(path, str(count + 1).encode('utf-8'))
+
+    def top_viewed(self, label, limit):
+        label_dir = os.path.join(self.views_dir, label)
+        if not os.path.isdir(label_dir):
+            return []
+        counts = []
+        for name in os.listdir(label_dir):
+            if name.endswith('.tmp'):
+                continue
+            try:
+                with open(os.path.join(label_dir, name), encoding='utf-8') as views_file:
+                    counts.append((int(views_file.read() or 0), name))
+            except (OSError, ValueError):
+                continue
+        counts.sort(reverse=True)
+        return [pk for _count, pk in counts[:limit]]
+
+    def _read_stats(self):
+        try:
+            with open(self.stats_path, encoding='utf-8') as stats_file:
+                return json.load(stats_file)
+        except (OSError, ValueError):
+            return {}
+
+    def incr_stats(self, label, **values):
+        with self._counters_lock():
+            stats = self._read_stats()
+            label_stats = stats.setdefault(label, {})
+            for name, value in values.items():
+                label_stats[name] = label_stats.get(name, 0) + value
+            self._write(self.stats_path, json.dumps(stats).encode('utf-8'))
+
+    def get_stats(self):
+        return self._read_stats()
+
+    def reset_stats(self):
+        with self._counters_lock():
+            self._write(self.stats_path, b'{}')
+
+
+class RedisPDFCache(BasePDFCache):
+    """
+    Caché en Redis o en cualquier servidor compatible (Valkey, KeyDB, Dragonfly...).
+
+    Los PDFs se guardan como claves con vencimiento. Un conjunto ordenado con la
+    hora de último uso y un hash con los tamaños permiten expulsar por LRU al
+    superar max_size, independientemente de la política de memoria del servidor.
+    Acepta cualquier cliente con la API de redis-py (p.ej. fakeredis en desarrollo).
+    """
+
+    def __init__(self, client, max_size=DEFAULT_PDF_CACHE_MAX_SIZE, prefix='pdfcache'):
+        super().__init__(max_size)
+        self.client = client
+        self.prefix = prefix
+        self.lru_key = f'{prefix}:lru'
+        self.sizes_key = f'{prefix}:sizes'
+        self.total_key = f'{prefix}:total'
+
+    def _key(self, key):
+        return f'{self.prefix}:obj:{key}'
+
+    def get(self, key):
+        content = self.client.get(self._key(key))
+        if content is None:
+            return None
+        self.client.zadd(self.lru_key, {key: time.time()})
+        return content
+
+    def set(self, key, content, timeout=None):
+        previous_size = int(self.client.hget(self.sizes_key, key) or 0)
+        pipe = self.client.pipeline()
+        pipe.set(self._key(key), content, ex=timeout or None)
+        pipe.hset(self.sizes_key, key, len(content))
+        pipe.zadd(self.lru_key, {key: time.time()})
+        pipe.incrby(self.total_key, len(content) - previous_size)
+        pipe.execute()
+        self.evict()
+
+    def delete(self, key):
+        size = int(self.client.hget(self.sizes_key, key) or 0)
+        pipe = self.client.pipeline()
+        pipe.delete(self._key(key))
+        pipe.hdel(self.sizes_key, key)
+        pipe.zrem(self.lru_key, key)
+        pipe.decrby(self.total_key, size)
+        pipe.execute()
+
+    def evict(self):
+        """Expulsa los PDFs de uso más antiguo hasta quedar bajo el 90% de max_size"""
+        total = int(self.client.get(self.total_key) or 0)
+        if total <= self.max_size:
+            return
+
+        target = self.max_size * 0.9
+        while total > target:
+            oldest = self.client.zrange(self.lru_key, 0, 9)
+            if not oldest:
+                # Contadores desfasados (p.ej. tras vaciar el servidor): reiniciar
+                self.client.set(self.total_key, 0)
+                break
+            for key in oldest:
+                self.delete(key.decode() if isinstance(key, bytes) else key)
+                total = int(self.client.get(self.total_key) or 0)
+                if total <= target:
+                    break
+
+    def get_version(self, label):
+        return int(self.client.get(f'{self.prefix}:version:{label}') or 0)
+
+    def bump_version(self, label):
+        self.client.incr(f'{self.prefix}:version:{label}')
+
+    # --- Métricas ---
+
+    def record_view(self, label, pk):
+        self.client.zincrby(f'{self.prefix}:views:{label}', 1, str(pk))
+
+    def top_viewed(self, label, limit):
+        pks = self.client.zrevrange(f'{self.prefix}:views:{label}', 0, limit - 1)
+        return [pk.decode() if isinstance(pk, bytes) else pk for pk in pks]
+
+    def incr_stats(self, label, **values):
+        pipe = self.client.pipeline()
+        for name, value in values.items():
+            if isinstance(value, float):
+                pipe.hincrbyfloat(f'{self.prefix}:stats:{label}', name, value)
+            else:
+                pipe.hincrby(f'{self.prefix}:stats:{label}', name, value)
+        pipe.sadd(f'{self.prefix}:stats', label)
+        pipe.execute()
+
+    def get_stats(self):
+        stats = {}
+        for label in self.client.smembers(f'{self.prefix}:stats'):
+            label = label.decode() if isinstance(label, bytes) else label
+            values = self.client.hgetall(f'{self.prefix}:stats:{label}')
+            stats[label] = {
+                (name.decode() if isinstance(name, bytes) else name): float(value)
+                for name, value in values.items()
+            }
+        return stats
+
+    def reset_stats(self):
+        for label in self.client.smembers(f'{self.prefix}:stats'):
+            label = label.decode() if isinstance(label, bytes) else label
+            self.client.delete(f'{self.prefix}:stats:{label}')
+        self.client.delete(f'{self.prefix}:stats')
+
+
+def get_pdf_cache_labels():
+    """
+    Modelos de settings.PDF_CACHE['MODELS']: BaseConfig.ready() conecta su
+    invalidación en todos los procesos y solo sus vistas usan la caché
+    """
+    return set(getattr(settings, 'PDF_CACHE', {}).get('MODELS', []))
+
+
+# Vistas de reportes PDF con modelo, registradas al definirse (GenericPDFReportView)
+_report_views = {}
+
+
+def register_report_view(view_class):
+    view_path = f"{view_class.__module__}.{view_class.__qualname__}"
+    _report_views[view_path] = view_class
+
+
+def get_report_views(label=None):
+    """{ruta: clase} de las vistas registradas, opcionalmente solo las de un modelo"""
+    return {
+        path: view_class for path, view_class in _report_views.items()
+        if label is None or view_class.model._meta.label == label
+    }
+
+
+_pdf_cache = None
+
+
+def get_pdf_cache():
+    """
+    Devuelve la caché de PDFs configurada en settings.PDF_CACHE:
+    {'BACKEND': 'filesystem' | 'redis', 'LOCATION': directorio o URL, 'MAX_SIZE': bytes}
+    """
+    global _pdf_cache
+    if _pdf_cache is not None:
+        return _pdf_cache
+
+    config = getattr(settings, 'PDF_CACHE', {})
+    backend = config.get('BACKEND', 'filesystem')
+    max_size = config.get('MAX_SIZE', DEFAULT_PDF_CACHE_MAX_SIZE)
+    location = config.get('LOCATION')
+
+    if backend == 'redis':
+        try:
+            import redis
+            _pdf_cache = RedisPDFCache(redis.Redis.from_url(location), max_size=max_size)
+            return _pdf_cache
+        except ImportError:
+            logger.warning("redis no está instalado: se usa la caché de PDFs en disco")
+            location = None
+
+    _pdf_cache = FileSystemPDFCache(
+        location or os.path.join(tempfile.gettempdir(), 'pdf_cache'),
+        max_size=max_size
+    )
+    return _pdf_cache
@@ -0,0 +1,331 @@
+# apps/base/services/search.py
+import logging
+import sqlite3
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import DatabaseError, connections, models
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+logger = logging.getLogger(__name__)
+
+# Campos de búsqueda declarados por las vistas de lista, por modelo
+# (OptimizedListView.__init_subclass__)
+_search_fields = {}
+
+
+def register_search_fields(model, fields):
+    registered = _search_fields.setdefault(model, [])
+    for field in fields:
+        if field not in registered:
+            registered.append(field)
+
+
+def get_search_models():
+    """{modelo: campos de búsqueda} de las vistas registradas"""
+    return dict(_search_fields)
+
+
+def get_search_index_labels():
+    return set(getattr(settings, 'SEARCH_INDEX', {}).get('MODELS', []))
+
+
+def get_search_index_models():
+    """
+    Modelos de settings.SEARCH_INDEX['MODELS']: los únicos cuyo índice se
+    mantiene con señales en todos los procesos (BaseConfig.ready)
+    """
+    labels = get_search_index_labels()
+    return [model for model in apps.get_models() if model._meta.label in labels]
+
+
+class BaseSearchBackend:
+    """
+    Índice de búsqueda para los campos de texto de un modelo.
+
+    search() devuelve el queryset filtrado usando el índice, o None si no hay
+    índice aplicable y la vista debe usar __icontains. Solo se indexan campos de
+    texto propios del modelo; los demás campos de search_fields (relaciones,
+    números...) se siguen buscando con __icontains dentro del mismo OR.
+    """
+    # Tiempo (segundos) que las búsquedas recuerdan que un modelo no tiene
+    # índice, para detectar sin reiniciar los creados por rebuild_search_index
+    missing_index_ttl = 60
+    text_fields = (models.CharField, models.TextField)
+    # True si el índice es una estructura aparte que se actualiza con señales:
+    # solo se usa para los modelos de settings.SEARCH_INDEX['MODELS']
+    needs_sync = False
+
+    def __init__(self, using='default'):
+        self.using = using
+        self._columns = {}
+
+    @property
+    def connection(self):
+        return connections[self.using]
+
+    @classmethod
+    def is_text_field(cls, model, name):
+        if '__' in name:
+            return False
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return False
+        return isinstance(field, cls.text_fields) and not field.is_relation
+
+    def get_text_fields(self, model, fields):
+        return [name for name in fields if self.is_text_field(model, name)]
+
+    def is_index_allowed(self, model):
+        return not self.needs_sync or model._meta.label in get_search_index_labels()
+
+    def get_indexed_columns(self, model, recheck_missing=False):
+        """
+        Campos con índice del modelo (caché por proceso). Las escrituras
+        (recheck_missing) vuelven a comprobar un índice ausente en lugar de
+        esperar missing_index_ttl: otro proceso puede haberlo creado y las filas
+        que se guarden mientras tanto no se volverían a indexar.
+        """
+        columns, checked_at = self._columns.get(model, (None, 0))
+        expired = recheck_missing or time.monotonic() - checked_at > self.missing_index_ttl
+        if columns is None or (not columns and expired):
+            try:
+                columns = self.read_indexed_columns(model)
+            except Exception as e:
+                logger.warning(f"No se pudo consultar el índice de búsqueda de {model._meta.label}: {e}")
+                columns = []
+            self._columns[model] = (columns, time.monotonic())
+        return columns
+
+    def forget(self, model):
+        self._columns.pop(model, None)
+
+    def search(self, queryset, fields, term):
+        model = queryset.model
+        if not self.is_index_allowed(model):
+            # Sin receptores en todos los procesos el índice no estaría al día
+            return None
+        columns = self.get_indexed_columns(model)
+        indexed = [name for name in fields if name in columns]
+        if not indexed or not self.accepts_term(term):
+            return None
+
+        filters = self.get_index_filter(model, indexed, term)
+        for name in fields:
+            if name not in indexed:
+                filters |= Q(**{f'{name}__icontains': term})
+        return queryset.filter(filters)
+
+    def accepts_term(self, term):
+        return bool(term.strip())
+
+    # --- A implementar por cada motor ---
+
+    def read_indexed_columns(self, model):
+        raise NotImplementedError
+
+    def get_index_filter(self, model, fields, term):
+        raise NotImplementedError
+
+    def rebuild(self, model, fields):
+        """Crea (o recrea) el índice del modelo para los campos indicados"""
+        raise NotImplementedError
+
+    def index_instances(self, model, instances):
+        """Actualiza el índice tras guardar (los índices sobre la tabla no lo necesitan)"""
+
+    def remove_instances(self, model, pks):
+        """Actualiza el índice tras eliminar"""
+
+
+class SQLiteFTS5Backend(BaseSearchBackend):
+    """
+    Tabla FTS5 paralela por modelo (search_<tabla>) con tokenizador trigram:
+    las coincidencias equivalen a __icontains (subcadena, sin distinguir
+    mayúsculas) pero se resuelven con el índice. El rowid es la pk del modelo y
+    la tabla se mantiene con las señales post_save/post_delete.
+
+    El tokenizador trigram requiere SQLite 3.34+, pks enteras y términos de al
+    menos 3 caracteres; en otro caso se usa __icontains.
+    """
+    min_term_length = 3
+    batch_size = 2000
+    needs_sync = True
+
+    @staticmethod
+    def is_supported():
+        return sqlite3.sqlite_version_info >= (3, 34, 0)
+
+    @staticmethod
+    def get_table_name(model):
+        return f'search_{model._meta.db_table}'
+
+    def accepts_term(self, term):
+        return len(term.strip()) >= self.min_term_length
+
+    def read_indexed_columns(self, model):
+        table = self.get_table_name(model)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [table]
+            )
+            if cursor.fetchone() is None:
+                return []
+            cursor.execute(f'PRAGMA table_info("{table}")')
+            return [row[1] for row in cursor.fetchall()]
+
+    def get_index_filter(self, model, fields, term):
+        table = self.get_table_name(model)
+        # Frase entre comillas (las comillas internas se duplican) limitada a las columnas
+        phrase = '"{}"'.format(term.strip().replace('"', '""'))
+        query = f"{{{' '.join(fields)}}} : {phrase}"
+        return Q(pk__in=RawSQL(f'SELECT rowid FROM "{table}" WHERE "{table}" MATCH %s', [query]))
+
+    def rebuild(self, model, fields):
+        if not isinstance(model._meta.pk, (models.AutoField, models.IntegerField)):
+            raise ValueError(f'{model._meta.label}: el índice FTS5 requiere una clave primaria entera')
+        fields = self.get_text_fields(model, fields)
+        if not fields:
+            raise ValueError(f'{model._meta.label}: no hay campos de texto para indexar')
+
+        table = self.get_table_name(model)
+        columns = ', '.join(f'"{name}"' for name in fields)
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS "{table}"')
+            cursor.execute(f"CREATE VIRTUAL TABLE \"{table}\" USING fts5({columns}, tokenize='trigram')")
+        self.forget(model)
+
+        rows = model._base_manager.using(self.using).values_list('pk', *fields)
+        batch = []
+        count = 0
+        for row in rows.iterator(chunk_size=self.batch_size):
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                count += self.write_rows(table, fields, batch)
+                batch = []
+        count += self.write_rows(table, fields, batch)
+        return count
+
+    def write_rows(self, table, fields, rows):
+        if not rows:
+            return 0
+        placeholders = ', '.join(['%s'] * (len(fields) + 1))
+        columns = ', '.join(f'"{name}"' for name in fields)
+        values = [
+            [row[0], *('' if value is None else str(value) for value in row[1:])]
+            for row in rows
+        ]
+        with self.connection.cursor() as cursor:
+            # FTS5 no admite UPSERT: borrar e insertar por rowid
+            cursor.executemany(f'DELETE FROM "{table}" WHERE rowid = %s', [[row[0]] for row in values])
+            cursor.executemany(
+                f'INSERT INTO "{table}" (rowid, {columns}) VALUES ({placeholders})', values
+            )
+        return len(rows)
+
+    def index_instances(self, model, instances):
+        instances = [instance for instance in instances if instance.pk is not None]
+
+        def write(columns):
+            rows = [(instance.pk, *(getattr(instance, name, None) for name in columns)) for instance in instances]
+            self.write_rows(self.get_table_name(model), columns, rows)
+
+        self.with_index(model, write)
+
+    def remove_instances(self, model, pks):
+        table = self.get_table_name(model)
+
+        def remove(columns):
+            with self.connection.cursor() as cursor:
+                cursor.executemany(f'DELETE FROM "{table}" WHERE rowid = %s', [[pk] for pk in pks])
+
+        self.with_index(model, remove)
+
+    def with_index(self, model, write):
+        """
+        Ejecuta write(columnas) si el modelo tiene índice. Si falla con las
+        columnas en caché (índice recreado o eliminado por otro proceso), se
+        vuelven a leer y se reintenta una vez.
+        """
+        columns = self.get_indexed_columns(model, recheck_missing=True)
+        if not columns:
+            return
+        try:
+            write(columns)
+        except DatabaseError:
+            self.forget(model)
+            columns = self.get_indexed_columns(model)
+            if not columns:
+                return
+            write(columns)
+
+
+class PostgreSQLTrigramBackend(BaseSearchBackend):
+    """
+    Índices GIN pg_trgm sobre UPPER(campo::text), la misma expresión que genera
+    __icontains en PostgreSQL: la consulta no cambia pero deja de recorrer la
+    tabla completa. Al estar sobre la propia tabla no necesitan sincronización.
+    """
+    min_term_length = 3
+
+    @staticmethod
+    def get_index_name(model, name):
+        # Los identificadores de PostgreSQL se truncan a 63 caracteres
+        return f'search_trgm_{model._meta.db_table}_{name}'[:63]
+
+    def accepts_term(self, term):
+        return len(term.strip()) >= self.min_term_length
+
+    def read_indexed_columns(self, model):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT indexname FROM pg_indexes WHERE tablename = %s', [model._meta.db_table]
+            )
+            names = {row[0] for row in cursor.fetchall()}
+        return [
+            field.name for field in model._meta.concrete_fields
+            if self.get_index_name(model, field.name) in names
+        ]
+
+    def get_index_filter(self, model, fields, term):
+        filters = Q()
+        for name in fields:
+            filters |= Q(**{f'{name}__icontains': term})
+        return filters
+
+    def rebuild(self, model, fields):
+        fields = self.get_text_fields(model, fields)
+        if not fields:
+            raise ValueError(f'{model._meta.label}: no hay campos de texto para indexar')
+
+        table = model._meta.db_table
+        with self.connection.cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            for name in fields:
+                column = model._meta.get_field(name).column
+                cursor.execute(
+                    f'CREATE INDEX IF NOT EXISTS "{self.get_index_name(model, name)}" '
+                    f'ON "{table}" USING gin (UPPER("{column}"::text) gin_trgm_ops)'
+                )
+        self.forget(model)
+        return model._base_manager.using(self.using).count()
+
+
+_backends = {}
+
+
+def get_search_backend(using='default'):
+    """Motor de búsqueda para la conexión, o None si no hay uno disponible"""
+    if using not in _backends:
+        vendor = connections[using].vendor
+        if vendor == 'sqlite' and SQLiteFTS5Backend.is_supported():
+            _backends[using] = SQLiteFTS5Backend(using)
+        elif vendor == 'postgresql':
+            _backends[using] = PostgreSQLTrigramBackend(using)
+        else:
+            _backends[using] = None
+    return _backends[using]
@@ -0,0 +1,49 @@
+# apps/base/signals/listcache.py
+import logging
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from apps.base.services.listcache import get_list_count_cache, get_list_count_cache_labels
+
+logger = logging.getLogger(__name__)
+
+
+def bump_list_count_version(model):
+    """Invalida los conteos en caché del modelo cuando la transacción se confirma"""
+    label = model._meta.label
+
+    def bump():
+        try:
+            get_list_count_cache().bump_version(label)
+        except Exception as e:
+            # La caché nunca debe interrumpir el guardado
+            logger.warning(f"No se pudieron invalidar los conteos de {label}: {e}")
+
+    transaction.on_commit(bump)
+
+
+def list_count_post_save(sender, raw=False, **kwargs):
+    if not raw:
+        bump_list_count_version(sender)
+
+
+def list_count_post_delete(sender, **kwargs):
+    bump_list_count_version(sender)
+
+
+def connect_list_count_signals():
+    """
+    Conecta la invalidación de conteos para los modelos de
+    settings.LIST_COUNT_CACHE['MODELS'] (desde BaseConfig.ready), en todos los
+    procesos: los cambios hechos desde comandos, el shell o tareas también
+    invalidan los conteos. Sin receptores, el resto de los modelos no paga nada
+    al guardarse y conserva el borrado rápido de Django en las cascadas.
+    """
+    labels = get_list_count_cache_labels()
+    for model in apps.get_models():
+        label = model._meta.label
+        if label in labels:
+            post_save.connect(list_count_post_save, sender=model, dispatch_uid=f'list_count_post_save_{label}')
+            post_delete.connect(list_count_post_delete, sender=model, dispatch_uid=f'list_count_post_delete_{label}')
@@ -0,0 +1,78 @@
+# apps/base/signals/pdfcache.py
+import logging
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from apps.base.services.pdfcache import get_pdf_cache, get_pdf_cache_labels, get_report_views
+
+logger = logging.getLogger(__name__)
+
+
+def bump_pdf_cache_version(model):
+    """
+    Incrementa la versión del modelo en la caché de PDFs cuando la transacción
+    se confirma, para que ningún PDF se genere con los datos anteriores bajo la
+    versión nueva
+    """
+    label = model._meta.label
+
+    def bump():
+        try:
+            get_pdf_cache().bump_version(label)
+        except Exception as e:
+            # La caché nunca debe interrumpir el guardado
+            logger.warning(f"No se pudo invalidar la caché de PDFs de {label}: {e}")
+
+    transaction.on_commit(bump)
+
+
+def schedule_pdf_prerender(model, pk):
+    """
+    Encola la generación del PDF del objeto en las vistas con prerender_on_save,
+    una vez confirmada la transacción (y tras incrementar la versión)
+    """
+    view_paths = [
+        path for path, view_class in get_report_views(model._meta.label).items()
+        if view_class.prerender_on_save and view_class.use_cache
+    ]
+    if not view_paths:
+        return
+
+    def enqueue():
+        from apps.base.tasks.pdf_tasks import prerender_pdf_task
+
+        for view_path in view_paths:
+            try:
+                prerender_pdf_task.delay(view_path, pk)
+            except Exception as e:
+                logger.warning(f"No se pudo encolar la pregeneración del PDF {view_path} {pk}: {e}")
+
+    transaction.on_commit(enqueue)
+
+
+def pdf_cache_post_save(sender, instance, raw=False, **kwargs):
+    # Las cargas de fixtures (raw) no invalidan
+    if not raw:
+        bump_pdf_cache_version(sender)
+        schedule_pdf_prerender(sender, instance.pk)
+
+
+def pdf_cache_post_delete(sender, **kwargs):
+    bump_pdf_cache_version(sender)
+
+
+def connect_pdf_cache_signals():
+    """
+    Conecta la invalidación para los modelos de settings.PDF_CACHE['MODELS']
+    (desde BaseConfig.ready), en todos los procesos: los cambios hechos desde
+    comandos, el shell o tareas también invalidan los PDFs. El resto de los
+    modelos no tiene ningún costo al guardarse.
+    """
+    labels = get_pdf_cache_labels()
+    for model in apps.get_models():
+        label = model._meta.label
+        if label in labels:
+            post_save.connect(pdf_cache_post_save, sender=model, dispatch_uid=f'pdf_cache_post_save_{label}')
+            post_delete.connect(pdf_cache_post_delete, sender=model, dispatch_uid=f'pdf_cache_post_delete_{label}')
@@ -0,0 +1,57 @@
+# apps/base/signals/search.py
+import logging
+
+from django.db import router
+from django.db.models.signals import post_delete, post_save
+
+from apps.base.services.search import get_search_backend, get_search_index_models
+
+logger = logging.getLogger(__name__)
+
+
+def index_search_instances(model, instances):
+    """
+    Actualiza el índice de búsqueda del modelo (si existe) con las instancias.
+    Se ejecuta en la misma transacción que el guardado, así un rollback deshace
+    también el índice. Usar tras bulk_create/bulk_update, que no disparan señales.
+    """
+    backend = get_search_backend(router.db_for_write(model))
+    if backend is None:
+        return
+    try:
+        backend.index_instances(model, instances)
+    except Exception as e:
+        # El índice nunca debe interrumpir el guardado; rebuild_search_index lo repara
+        logger.warning(f"No se pudo actualizar el índice de búsqueda de {model._meta.label}: {e}")
+
+
+def search_index_post_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_search_instances(sender, [instance])
+
+
+def search_index_post_delete(sender, instance, **kwargs):
+    backend = get_search_backend(router.db_for_write(sender))
+    if backend is None:
+        return
+    try:
+        backend.remove_instances(sender, [instance.pk])
+    except Exception as e:
+        logger.warning(f"No se pudo actualizar el índice de búsqueda de {sender._meta.label}: {e}")
+
+
+def connect_search_signals():
+    """
+    Conecta la sincronización del índice para los modelos de
+    settings.SEARCH_INDEX['MODELS'] (desde BaseConfig.ready, en todos los
+    procesos: web, Celery, comandos, shell). Solo los motores con un índice
+    aparte (needs_sync) la necesitan; sin receptores, el resto de los modelos
+    conserva el borrado rápido de Django en las cascadas.
+    """
+    for model in get_search_index_models():
+        backend = get_search_backend(router.db_for_write(model))
+        if backend is None or not backend.needs_sync:
+            continue
+        label = model._meta.label
+        post_save.connect(search_index_post_save, sender=model, dispatch_uid=f'search_index_post_save_{label}')
+        post_delete.connect(search_index_post_delete, sender=model, dispatch_uid=f'search_index_post_delete_{label}')
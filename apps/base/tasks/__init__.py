@@ -0,0 +1,4 @@
+# Importar las tareas para que Celery las registre con autodiscover_tasks()
+from .import_tasks import run_csv_import_task
+from .export_tasks import run_export_task
+from .pdf_tasks import prerender_pdf_task
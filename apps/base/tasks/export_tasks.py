@@ -0,0 +1,68 @@
+# apps/base/tasks/export_tasks.py
+import logging
+import time
+
+from celery import shared_task
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpRequest, QueryDict
+from django.utils.module_loading import import_string
+
+from apps.base.services.exportjobs import ExportJobStore
+from apps.base.tasks.import_tasks import acting_user
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True)
+def run_export_task(self, view_path, job_id, params, user_id=None):
+    """
+    Genera en segundo plano el archivo de una exportación y lo deja en el trabajo.
+
+    Args:
+        view_path: Ruta de la subclase de GenericExportView que define la exportación
+        job_id: Identificador del trabajo (ExportJobStore)
+        params: Parámetros GET de la solicitud original ({clave: [valores]})
+        user_id: Usuario que solicitó la exportación
+    """
+    store = ExportJobStore(job_id)
+    if not store.exists():
+        logger.error(f"Export job {job_id} not found. Task aborted.")
+        return None
+
+    user = get_user_model().objects.filter(pk=user_id).first() if user_id else None
+
+    # Reconstruir la solicitud para que la vista aplique los mismos filtros
+    request = HttpRequest()
+    request.method = 'GET'
+    request.GET = QueryDict(mutable=True)
+    for key, values in params.items():
+        request.GET.setlist(key, values)
+    request.user = user or AnonymousUser()
+
+    view = import_string(view_path)()
+    view.setup(request)
+
+    store.update_meta(status='running', started_at=time.time())
+    logger.info(f"Starting export job {job_id} for {view.model._meta.label}")
+    try:
+        with acting_user(user):
+            response = view.render_export(request.GET.get('format', 'csv').lower())
+            content = response.streaming_content if response.streaming else [response.content]
+            try:
+                size = store.write_artifact(content)
+            finally:
+                response.close()
+    except Exception as e:
+        logger.exception(f"Export job {job_id} failed")
+        store.update_meta(status='failed', error=str(e), finished_at=time.time())
+        raise
+
+    store.update_meta(
+        status='done',
+        size=size,
+        content_type=response['Content-Type'],
+        finished_at=time.time()
+    )
+    logger.info(f"Export job {job_id} finished: {size} bytes")
+    return {'job_id': job_id, 'size': size}
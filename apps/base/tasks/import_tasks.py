@@ -0,0 +1,56 @@
+# apps/base/tasks/import_tasks.py
+import logging
+from contextlib import contextmanager
+
+from celery import shared_task
+from django.contrib.auth import get_user_model
+from django.utils.module_loading import import_string
+
+from apps.base.services.csvstaging import CSVStagingStore
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def acting_user(user):
+    """
+    Publica el usuario que lanzó la importación en el contexto que usan
+    BaseModel.save y la auditoría, como lo harían los middlewares en una petición.
+    """
+    from apps.audit.signals import audit_context
+    from apps.base.models.middleware import current_user
+
+    with current_user(user), audit_context(user=user):
+        yield
+
+
+@shared_task(bind=True)
+def run_csv_import_task(self, view_path, import_id, user_id=None):
+    """
+    Ejecuta en segundo plano una importación CSV preparada.
+
+    Args:
+        view_path: Ruta de la subclase de GenericCSVImportView que define la importación
+        import_id: Identificador de la importación preparada (CSVStagingStore)
+        user_id: Usuario que confirmó la importación
+    """
+    store = CSVStagingStore(import_id)
+    if not store.exists():
+        logger.error(f"Staged import {import_id} not found. Task aborted.")
+        return None
+
+    view = import_string(view_path)()
+    view.setup(None)
+
+    user = get_user_model().objects.filter(pk=user_id).first() if user_id else None
+
+    logger.info(f"Starting background import {import_id} for {view.model._meta.label}")
+    with acting_user(user):
+        # run_import registra progreso, errores y estado final en la importación
+        stats = view.run_import(store)
+
+    logger.info(
+        f"Background import {import_id} finished: created={stats['created']}, "
+        f"updated={stats['updated']}, skipped={stats['skipped']}"
+    )
+    return {key: stats[key] for key in ('processed', 'created', 'updated', 'skipped', 'errors_count')}
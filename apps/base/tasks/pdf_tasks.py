@@ -0,0 +1,39 @@
+# apps/base/tasks/pdf_tasks.py
+import logging
+
+from celery import shared_task
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpRequest
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+def build_report_view(view_path):
+    """Instancia una GenericPDFReportView fuera de una solicitud HTTP"""
+    request = HttpRequest()
+    request.method = 'GET'
+    request.user = AnonymousUser()
+    view = import_string(view_path)()
+    view.setup(request)
+    return view
+
+
+@shared_task(bind=True)
+def prerender_pdf_task(self, view_path, pk):
+    """
+    Genera y deja en la caché compartida el PDF de un objeto.
+
+    Args:
+        view_path: Ruta de la subclase de GenericPDFReportView
+        pk: Clave primaria del objeto
+    """
+    view = build_report_view(view_path)
+    obj = view.get_object(pk)
+    if obj is None:
+        logger.info(f"PDF prerender skipped: {view.model._meta.label} {pk} not found")
+        return False
+
+    rendered = view.prerender(obj)
+    logger.info(f"PDF prerender {view.model._meta.label} {pk}: {'rendered' if rendered else 'already cached'}")
+    return rendered
@@ -1,3 +1,787 @@
-from django.test import TestCase
+import codecs
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models.functions import Lower
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from reportlab.lib.pagesizes import landscape, letter
+from reportlab.platypus import Paragraph, SimpleDocTemplate
+
+from apps.base.models import Country, DocType, PermitType, State, User
+from apps.base.services import listcache, pdfcache
+from apps.base.services.csvstaging import CSVStagingStore
+from apps.base.services.exportjobs import ExportJobStore
+from apps.base.services.listfilters import compile_filters
+from apps.base.services.pagination import CursorPaginator, InvalidCursor
+from apps.base.services.pdfcache import FileSystemPDFCache, get_pdf_cache
+from apps.base.services.search import SQLiteFTS5Backend, get_search_backend
+from apps.base.signals.listcache import connect_list_count_signals
+from apps.base.signals.pdfcache import connect_pdf_cache_signals
+from apps.base.signals.search import connect_search_signals
+from apps.base.tasks.export_tasks import run_export_task
+from apps.base.tasks.import_tasks import run_csv_import_task
+from apps.base.tasks.pdf_tasks import build_report_view, prerender_pdf_task
+from apps.base.views.genericexportview import GenericExportView
+from apps.base.views.genericcsvimportview import ForeignKeyLookupCache, GenericCSVImportView
+from apps.base.views.genericlistview import OptimizedListView, OptimizedSecureListView
+from apps.base.views.genericpdfprint import GenericPDFReportView
+
+
+def create_country(name, code='001'):
+    return Country.objects.create(name=name, iso_name=name, alfa2='PA', alfa3='PAI', code=code)
+
+
+@skipUnless(connection.vendor == 'sqlite' and SQLiteFTS5Backend.is_supported(), 'Requiere SQLite 3.34+ (FTS5 trigram)')
+@override_settings(SEARCH_INDEX={'MODELS': ['base.Country']})
+class SearchIndexSyncTests(TestCase):
+
+    def setUp(self):
+        # Lo mismo que hace BaseConfig.ready con los modelos declarados
+        connect_search_signals()
+
+    def indexed_names(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT name FROM "search_base_country" ORDER BY rowid')
+            return [row[0] for row in cursor.fetchall()]
+
+    def search(self, term):
+        queryset = get_search_backend().search(Country.objects.all(), ['name'], term)
+        return None if queryset is None else list(queryset.values_list('name', flat=True))
+
+    def tearDown(self):
+        get_search_backend().forget(Country)
+
+    def test_index_created_by_another_process_receives_writes(self):
+        # Este proceso buscó antes de que existiera el índice: lo recuerda como ausente
+        self.assertIsNone(self.search('Colombia'))
+
+        # Otro proceso (rebuild_search_index) crea el índice
+        SQLiteFTS5Backend().rebuild(Country, ['name'])
+
+        # Country no tiene vista de lista: los receptores vienen de BaseConfig.ready
+        country = create_country('Colombia')
+        self.assertEqual(self.indexed_names(), ['Colombia'])
+        self.assertEqual(self.search('olomb'), ['Colombia'])
+
+        country.delete()
+        self.assertEqual(self.indexed_names(), [])
+
+    def test_recreated_index_is_reread_on_write(self):
+        get_search_backend().rebuild(Country, ['name'])
+        create_country('Chile')
+        # Otro proceso recrea el índice con otras columnas
+        SQLiteFTS5Backend().rebuild(Country, ['name', 'iso_name'])
+        create_country('Perú', code='002')
+        self.assertEqual(self.indexed_names(), ['Chile', 'Perú'])
+
+    def test_undeclared_model_is_not_searched_with_the_index(self):
+        get_search_backend().rebuild(Country, ['name'])
+        create_country('Colombia')
+        with override_settings(SEARCH_INDEX={'MODELS': []}):
+            self.assertIsNone(self.search('olomb'))
+        self.assertEqual(self.search('olomb'), ['Colombia'])
+
+
+class FileSystemPDFCacheVersionTests(TestCase):
+
+    def setUp(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        self.cache = FileSystemPDFCache(location)
+
+    def test_concurrent_bumps_are_not_lost(self):
+        self.cache.get_version('base.Country')
+
+        def bump():
+            for _ in range(50):
+                self.cache.bump_version('base.Country')
+
+        threads = [threading.Thread(target=bump) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.cache.get_version('base.Country'), 400)
+
+    def test_first_read_does_not_overwrite_a_bump(self):
+        # Otro proceso crea el contador e incrementa mientras este no encontraba el archivo
+        other = FileSystemPDFCache(self.cache.location)
+        read_version = self.cache._read_version
+
+        def read_after_bump(path):
+            if not read_after_bump.raced:
+                read_after_bump.raced = True
+                other.get_version('base.Country')
+                other.bump_version('base.Country')
+                raise FileNotFoundError(path)
+            return read_version(path)
+
+        read_after_bump.raced = False
+        with mock.patch.object(self.cache, '_read_version', read_after_bump):
+            self.assertEqual(self.cache.get_version('base.Country'), 1)
+        self.assertEqual(other.get_version('base.Country'), 1)
+
+    def test_untracked_models_are_not_bumped(self):
+        self.cache.bump_version('base.Country')
+        self.assertEqual(self.cache.get_version('base.Country'), 0)
+
+
+@override_settings(PDF_CACHE={'MODELS': ['base.Country']})
+class PDFCacheInvalidationTests(TestCase):
+
+    def setUp(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        patcher = mock.patch.object(pdfcache, '_pdf_cache', FileSystemPDFCache(location))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        connect_pdf_cache_signals()
+
+    def test_save_outside_the_views_bumps_the_version(self):
+        cache = get_pdf_cache()
+        self.assertEqual(cache.get_version('base.Country'), 0)
+        # Ninguna vista de reporte de Country se ha definido en este proceso
+        with self.captureOnCommitCallbacks(execute=True):
+            country = create_country('Colombia')
+        self.assertEqual(cache.get_version('base.Country'), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            country.delete()
+        self.assertEqual(cache.get_version('base.Country'), 2)
+
+    def test_view_with_undeclared_models_does_not_cache(self):
+        class CountryReport(GenericPDFReportView):
+            model = Country
+
+        class CountryCityReport(GenericPDFReportView):
+            model = Country
+            cache_dependencies = ['base.City']
+
+        self.assertTrue(CountryReport.use_cache)
+        self.assertFalse(CountryCityReport.use_cache)
+
+
+class CountryPrerenderReport(GenericPDFReportView):
+    model = Country
+    prerender_on_save = True
+
+    def generate_pdf_report(self, obj):
+        return HttpResponse(f'PDF {obj.name}'.encode(), content_type='application/pdf')
+
+
+@override_settings(PDF_CACHE={'MODELS': ['base.Country']})
+class PDFPrerenderTests(TestCase):
+    view_path = 'apps.base.tests.CountryPrerenderReport'
+
+    def setUp(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        for patcher in (
+            mock.patch.object(pdfcache, '_pdf_cache', FileSystemPDFCache(location)),
+            # La vista se definió al importar el módulo, antes de declarar Country
+            mock.patch.object(CountryPrerenderReport, 'use_cache', True),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        connect_pdf_cache_signals()
+
+    def test_save_enqueues_the_prerender_after_commit(self):
+        with mock.patch.object(prerender_pdf_task, 'delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                country = create_country('Colombia')
+        delay.assert_called_once_with(self.view_path, country.pk)
+
+    def test_prerender_caches_the_pdf_once(self):
+        with mock.patch.object(prerender_pdf_task, 'delay'):
+            country = create_country('Colombia')
+
+        self.assertTrue(prerender_pdf_task(self.view_path, country.pk))
+        self.assertFalse(prerender_pdf_task(self.view_path, country.pk))
+
+        view = build_report_view(self.view_path)
+        self.assertEqual(get_pdf_cache().get(view.get_cache_key(country)), b'PDF Colombia')
+
+    def test_prerender_of_missing_object_is_skipped(self):
+        self.assertFalse(prerender_pdf_task(self.view_path, 999))
+
+
+@override_settings(LIST_COUNT_CACHE={'MODELS': ['base.Country']})
+class ListCountCacheInvalidationTests(TestCase):
+
+    def setUp(self):
+        # Una caché compartida entre procesos: con LocMemCache no se usa
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        caches_override = override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location},
+        })
+        caches_override.enable()
+        self.addCleanup(caches_override.disable)
+        patcher = mock.patch.object(listcache, '_list_count_cache', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        connect_list_count_signals()
+
+    def count(self):
+        return listcache.get_list_count_cache().count(Country.objects.all())
+
+    def test_save_outside_the_views_invalidates_the_count(self):
+        create_country('Colombia')
+        self.assertEqual(self.count(), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.count(), 1)
+
+        # Ninguna vista de lista de Country se ha definido en este proceso
+        with self.captureOnCommitCallbacks(execute=True):
+            country = create_country('Chile', code='002')
+        self.assertEqual(self.count(), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            country.delete()
+        self.assertEqual(self.count(), 1)
+
+    def test_save_before_any_count_bumps_the_version(self):
+        cache = listcache.get_list_count_cache()
+        with self.captureOnCommitCallbacks(execute=True):
+            create_country('Colombia')
+        self.assertNotEqual(cache.get_versions(['base.Country'])['base.Country'], 0)
+
+    def test_undeclared_models_are_not_cached(self):
+        create_country('Colombia')
+        with override_settings(LIST_COUNT_CACHE={'MODELS': []}):
+            self.assertEqual(self.count(), 1)
+            with self.assertNumQueries(1):
+                self.assertEqual(self.count(), 1)
+
+    def test_view_with_undeclared_models_does_not_cache(self):
+        class CountryList(OptimizedSecureListView):
+            model = Country
+
+        class CountryCityList(OptimizedSecureListView):
+            model = Country
+            count_cache_dependencies = ['base.City']
+
+        self.assertTrue(CountryList.use_count_cache)
+        self.assertFalse(CountryCityList.use_count_cache)
+
+
+def use_temp_dir(test, setting):
+    """Apunta el setting a un directorio temporal durante la prueba"""
+    location = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, location, ignore_errors=True)
+    settings_override = override_settings(**{setting: location})
+    settings_override.enable()
+    test.addCleanup(settings_override.disable)
+    return location
+
+
+def new_import_stats():
+    return {'created': 0, 'updated': 0, 'skipped': 0, 'errors': []}
+
+
+class CountryImportView(GenericCSVImportView):
+    model = Country
+    unique_field = 'id'
+
+
+class DocTypeImportView(GenericCSVImportView):
+    model = DocType
+
+
+class CSVStagingTests(TestCase):
+
+    def setUp(self):
+        use_temp_dir(self, 'CSV_IMPORT_STAGING_DIR')
+
+    def test_rows_are_staged_on_disk_and_read_in_chunks(self):
+        content = 'name;iso_name;code\n"Perú; República";PE;604\nChile;CL;152\nMéxico;MX;484\n'
+        upload = SimpleUploadedFile('paises.csv', content.encode('utf-8'))
+        store, fieldnames = CountryImportView().stage_csv(upload, 'utf-8', ';', user_id=7)
+
+        self.assertEqual(fieldnames, ['name', 'iso_name', 'code'])
+        self.assertEqual(store.total_rows, 3)
+        self.assertEqual(store.read_meta()['user_id'], 7)
+        chunks = [[row['name'] for row in chunk] for chunk in store.iter_chunks(2)]
+        self.assertEqual(chunks, [['Perú; República', 'Chile'], ['México']])
+
+        # Otra instancia (otro proceso) lee la misma importación por su id
+        self.assertEqual(CSVStagingStore(store.import_id).head(1)[0]['code'], '604')
+        store.delete()
+        self.assertFalse(CSVStagingStore(store.import_id).exists())
+
+    def test_import_id_cannot_leave_the_staging_dir(self):
+        with self.assertRaises(ValueError):
+            CSVStagingStore('../meta')
+
+
+class CSVFormatDetectionTests(TestCase):
+
+    def setUp(self):
+        self.view = CountryImportView()
+
+    def test_encoding(self):
+        text = 'name;code\nPerú;604\nEspaña;724\n'
+        self.assertEqual(self.view.detect_encoding(codecs.BOM_UTF8 + text.encode('utf-8')), 'utf-8-sig')
+        self.assertEqual(self.view.detect_encoding(text.encode('utf-16')), 'utf-16')
+        self.assertEqual(self.view.detect_encoding(text.encode('utf-8')), 'utf-8')
+        self.assertEqual(self.view.detect_encoding(text.encode('cp1252')), 'cp1252')
+        # Muestra cortada en medio de un carácter multibyte
+        self.assertEqual(self.view.detect_encoding('name\nPerú'.encode('utf-8')[:-1]), 'utf-8')
+
+    def test_delimiter(self):
+        for delimiter in ';,\t':
+            with self.subTest(delimiter=delimiter):
+                sample = delimiter.join(['name', 'iso_name', 'code']) + '\n'
+                sample += delimiter.join(['Perú', 'PE', '604']) + '\n'
+                sample += delimiter.join(['Chile', 'CL', '152']) + '\nMéx'
+                self.assertEqual(self.view.detect_delimiter(sample.encode('utf-8'), 'utf-8'), delimiter)
+        self.assertEqual(self.view.detect_delimiter(b'name\n', 'utf-8'), self.view.csv_delimiter)
+
+
+class CSVImportBatchTests(TestCase):
+
+    def country_rows(self, count, start=0):
+        return [
+            {'name': f'Pais {i}', 'iso_name': f'P{i}', 'alfa2': 'PA', 'alfa3': 'PAI', 'code': f'{i:03}'}
+            for i in range(start, start + count)
+        ]
+
+    def import_queries(self, rows):
+        stats = new_import_stats()
+        with CaptureQueriesContext(connection) as queries:
+            CountryImportView().process_batch(rows, 2, stats)
+        return stats, len(queries)
+
+    def test_batch_queries_do_not_grow_with_the_rows(self):
+        existing = [create_country(f'Pais {i}', code=f'{i:03}') for i in range(3)]
+        rows = [dict(row, id=str(country.pk)) for row, country in zip(self.country_rows(3), existing)]
+
+        small_stats, small_queries = self.import_queries(rows[:1] + self.country_rows(2, start=10))
+        large_stats, large_queries = self.import_queries(rows + self.country_rows(40, start=20))
+        self.assertEqual((small_stats['created'], small_stats['updated']), (2, 1))
+        self.assertEqual((large_stats['created'], large_stats['updated']), (40, 3))
+        self.assertEqual(small_queries, large_queries)
+        self.assertEqual(Country.objects.count(), 45)
+
+    def test_repeated_key_in_a_batch_updates_the_pending_row(self):
+        country = create_country('Colombia')
+        rows = [
+            {'id': str(country.pk), 'name': 'Uno', 'iso_name': 'U', 'alfa2': 'UN', 'alfa3': 'UNO', 'code': '001'},
+            {'id': str(country.pk), 'name': 'Dos', 'iso_name': 'D', 'alfa2': 'DO', 'alfa3': 'DOS', 'code': '001'},
+        ]
+        stats = new_import_stats()
+        CountryImportView().process_batch(rows, 2, stats)
+        country.refresh_from_db()
+        self.assertEqual((stats['updated'], country.name), (2, 'Dos'))
+
+    def test_failed_batch_is_retried_row_by_row(self):
+        DocType.objects.create(name='CC')
+        # El nombre repetido hace fallar el bulk_create de todo el lote
+        rows = [{'name': 'TI'}, {'name': 'CC'}, {'name': 'CE'}]
+        stats = new_import_stats()
+        DocTypeImportView().process_batch(rows, 2, stats)
+        self.assertEqual((stats['created'], stats['skipped']), (2, 1))
+        self.assertEqual(len(stats['errors']), 1)
+        self.assertTrue(stats['errors'][0].startswith('Fila 3:'))
+        self.assertEqual(sorted(DocType.objects.values_list('name', flat=True)), ['CC', 'CE', 'TI'])
+
+
+class BackgroundImportTests(TestCase):
+
+    def setUp(self):
+        use_temp_dir(self, 'CSV_IMPORT_STAGING_DIR')
+        self.owner = User.objects.create(username='owner', identification_number='1')
+        self.other = User.objects.create(username='other', identification_number='2')
+        self.admin = User.objects.create(username='root', identification_number='3', is_superuser=True)
+
+    def stage(self, rows, **meta):
+        store = CSVStagingStore.create(['name', 'iso_name', 'alfa2', 'alfa3', 'code'], model='base.Country', **meta)
+        store.write_rows(rows)
+        return store
+
+    def visible_to(self, store):
+        view = CountryImportView()
+        visible = []
+        for user in (self.owner, self.other, self.admin):
+            request = RequestFactory().get('/import/')
+            request.user = user
+            if view.get_import_job(request, store.import_id):
+                visible.append(user.username)
+        return visible
+
+    def test_task_imports_and_publishes_progress(self):
+        rows = [
+            {'name': f'Pais {i}', 'iso_name': 'P', 'alfa2': 'PA', 'alfa3': 'PAI', 'code': f'{i:03}'}
+            for i in range(5)
+        ] + [{'name': '', 'iso_name': 'P', 'alfa2': 'PA', 'alfa3': 'PAI', 'code': '999'}]
+        store = self.stage(rows, user_id=self.owner.pk)
+
+        result = run_csv_import_task('apps.base.tests.CountryImportView', store.import_id, self.owner.pk)
+        self.assertEqual(result, {'processed': 6, 'created': 5, 'updated': 0, 'skipped': 1, 'errors_count': 1})
+        meta = store.read_meta()
+        self.assertEqual(meta['status'], 'done')
+        self.assertEqual(meta['progress']['processed'], 6)
+        self.assertTrue(os.path.exists(store.error_report_path))
+        self.assertEqual(Country.objects.count(), 5)
+
+    def test_only_the_owner_sees_the_import(self):
+        self.assertEqual(self.visible_to(self.stage([], user_id=self.owner.pk)), ['owner', 'root'])
+        # Sin dueño registrado no se expone por id, ni siquiera a superusuarios
+        self.assertEqual(self.visible_to(self.stage([])), [])
+
+    def test_large_imports_go_to_the_background(self):
+        store = self.stage([{'name': 'A'}] * 3)
+        view = CountryImportView()
+        self.assertFalse(view.should_run_in_background(store))
+        view.background_import_threshold = 3
+        self.assertTrue(view.should_run_in_background(store))
+
+
+class ForeignKeyLookupCacheTests(TestCase):
+
+    def setUp(self):
+        self.colombia = create_country('Colombia')
+        self.chile = create_country('Chile', code='002')
+        # Nombre repetido: ambiguo
+        create_country('Georgia', code='003')
+        create_country('Georgia', code='004')
+
+    def test_values_are_resolved_in_bulk_by_pk_and_name(self):
+        rows = [{'country': value} for value in [str(self.colombia.pk), ' Chile ', 'Georgia', 'Atlántida', 'Chile']]
+        cache = ForeignKeyLookupCache(State)
+        # Una consulta por pk y otra por nombre para todo el grupo de filas
+        with self.assertNumQueries(2):
+            cache.prime(rows)
+        with self.assertNumQueries(0):
+            resolved = [cache.resolve('country', row['country']) for row in rows]
+        self.assertEqual(resolved, [self.colombia, self.chile, None, None, self.chile])
+        self.assertEqual(cache.unresolved, {'country': {'Georgia': 1, 'Atlántida': 1}})
+        self.assertEqual(cache.get_unresolved_messages(), ["country: 'Georgia' (1 filas), 'Atlántida' (1 filas)"])
+
+    def test_values_outside_the_primed_rows_are_loaded_on_demand(self):
+        cache = ForeignKeyLookupCache(State)
+        with self.assertNumQueries(1):
+            self.assertEqual(cache.resolve('country', str(self.chile.pk)), self.chile)
+            self.assertEqual(cache.resolve('country', str(self.chile.pk)), self.chile)
+
+
+class CSVImportUniqueKeyTests(TestCase):
+
+    def setUp(self):
+        self.country = create_country('Colombia')
+        self.view = CountryImportView()
+
+    def row(self, pk, name='Chile'):
+        return {'id': pk, 'name': name, 'iso_name': name, 'alfa2': 'CL', 'alfa3': 'CHL', 'code': '002'}
+
+    def test_keys_are_compared_as_the_field_type(self):
+        statuses = [result['status'] for result in self.view.validate_rows([
+            self.row(f'00{self.country.pk}'), self.row(f' {self.country.pk} '), self.row(''),
+        ])]
+        self.assertEqual(statuses, ['update', 'update', 'new'])
+
+    def test_invalid_key_is_an_error(self):
+        results = self.view.validate_rows([self.row('abc')])
+        self.assertEqual(results[0]['status'], 'error')
+        self.assertEqual(self.view.validate_row(self.row('abc'))['status'], 'error')
+
+        stats = new_import_stats()
+        self.view.process_batch([self.row('abc'), self.row(str(self.country.pk), 'Perú')], 2, stats)
+        self.assertEqual((stats['created'], stats['updated'], stats['skipped']), (0, 1, 1))
+        self.assertTrue(stats['errors'][0].startswith('Fila 2:'))
+        self.assertEqual(Country.objects.count(), 1)
+
+
+class CursorPaginationTests(TestCase):
+
+    def setUp(self):
+        # Valores repetidos y nulos en el campo de ordenamiento
+        for i, demonym in enumerate(['b', None, 'a', 'b', None, 'c', 'a']):
+            Country.objects.create(
+                name=f'Pais {i}', iso_name='P', alfa2='PA', alfa3='PAI', code=f'{i:03}', demonym=demonym
+            )
+
+    def walk(self, queryset):
+        paginator = CursorPaginator(queryset, 2)
+        page = paginator.get_page()
+        pages = [[country.pk for country in page]]
+        while page.has_next():
+            page = paginator.get_page(page.next_cursor)
+            pages.append([country.pk for country in page])
+        # De vuelta al inicio con los cursores anteriores
+        backwards = [pages[-1]]
+        while page.has_previous():
+            page = paginator.get_page(page.previous_cursor)
+            backwards.insert(0, [country.pk for country in page])
+        return pages, backwards
+
+    def test_pages_follow_the_ordering_in_both_directions(self):
+        for ordering in ('demonym', '-demonym', 'name'):
+            with self.subTest(ordering=ordering):
+                queryset = Country.objects.order_by(ordering)
+                pages, backwards = self.walk(queryset)
+                # El mismo ordenamiento completo (con la pk) sin OFFSET ni cursores
+                order_by = CursorPaginator(queryset, 2).get_order_by()
+                expected = list(queryset.order_by(*order_by).values_list('pk', flat=True))
+                self.assertEqual([pk for page in pages for pk in page], expected)
+                self.assertEqual(backwards, pages)
+
+    def test_nulls_sort_as_the_largest_value(self):
+        pages, _ = self.walk(Country.objects.order_by('demonym'))
+        demonyms = dict(Country.objects.values_list('pk', 'demonym'))
+        ordered = [demonyms[pk] for page in pages for pk in page]
+        self.assertEqual(ordered, ['a', 'a', 'b', 'b', 'c', None, None])
+
+    def test_cursor_from_another_ordering_restarts(self):
+        ascending = CursorPaginator(Country.objects.order_by('demonym'), 2)
+        descending = CursorPaginator(Country.objects.order_by('-demonym'), 2)
+        token = ascending.get_page().next_cursor
+        self.assertIsNone(descending.decode_cursor(token))
+        first = [country.pk for country in descending.get_page()]
+        self.assertEqual([country.pk for country in descending.get_page(token)], first)
+
+    def test_invalid_cursor_and_ordering(self):
+        paginator = CursorPaginator(Country.objects.order_by('name'), 2)
+        with self.assertRaises(InvalidCursor):
+            paginator.get_page('no-es-un-cursor')
+        with self.assertRaises(ValueError):
+            CursorPaginator(Country.objects.order_by(Lower('name')), 2)
+
+
+class StateListView(OptimizedListView):
+    model = State
+    filter_fields = {'pais': 'country', 'activo': 'is_active', 'codigos': 'code__in', 'nombre': 'name__icontains'}
+    order_fields = ['name']
+
+
+class ListFilterCompilationTests(TestCase):
+
+    def setUp(self):
+        self.colombia = create_country('Colombia')
+        self.chile = create_country('Chile', code='002')
+        State.objects.create(country=self.colombia, name='Antioquia', code='05')
+        State.objects.create(country=self.colombia, name='Boyacá', code='15', is_active=False)
+        State.objects.create(country=self.chile, name='Biobío', code='08')
+
+    def list_names(self, **params):
+        view = StateListView()
+        view.setup(RequestFactory().get('/states/', params))
+        names = sorted(view.get_queryset().values_list('name', flat=True))
+        return names, view.filter_errors
+
+    def test_declared_filters_convert_the_values(self):
+        self.assertEqual(self.list_names(filter_pais=f' {self.colombia.pk} '), (['Antioquia', 'Boyacá'], []))
+        self.assertEqual(self.list_names(filter_activo='no'), (['Boyacá'], []))
+        self.assertEqual(self.list_names(filter_codigos='05,08'), (['Antioquia', 'Biobío'], []))
+        self.assertEqual(self.list_names(filter_nombre='B'), (['Biobío', 'Boyacá'], []))
+
+    def test_invalid_and_undeclared_filters_are_ignored(self):
+        names, errors = self.list_names(filter_pais='abc')
+        self.assertEqual((len(names), len(errors)), (3, 1))
+        names, errors = self.list_names(filter_country__name='Chile')
+        self.assertEqual((len(names), len(errors)), (3, 1))
+
+    def test_undeclared_ordering_is_ignored(self):
+        view = StateListView()
+        view.setup(RequestFactory().get('/states/', {'order_by': '-name,code'}))
+        self.assertEqual(view.get_order_fields(), ['-name'])
+
+    def test_unknown_lookup_fails_at_compile_time(self):
+        with self.assertRaises(ValueError):
+            compile_filters(State, ['pais'])
+
+    def test_date_on_datetime_field_is_a_day_range(self):
+        permit_type = PermitType.objects.create(name='Vacaciones', code='VAC')
+        list_filter = compile_filters(PermitType, {'alta': 'created_at__date'})['alta']
+        condition = list_filter.build(timezone.localdate(permit_type.created_at).isoformat())
+        self.assertEqual(sorted(lookup for lookup, _ in condition.children), ['created_at__gte', 'created_at__lt'])
+        self.assertTrue(PermitType.objects.filter(condition).exists())
+        with self.assertRaises(ValidationError):
+            list_filter.build('ayer')
+
+
+class StateExportView(GenericExportView):
+    model = State
+    fields_to_export = ['name', 'code', 'country.name']
+
+
+class CSVExportStreamingTests(TestCase):
+
+    def test_rows_are_written_as_they_are_read(self):
+        read = []
+
+        def data():
+            for name in ['Antioquia', 'Bogotá, D.C.', 'Valle "del Cauca"']:
+                read.append(name)
+                yield {'name': name, 'code': '05', 'country.name': 'Colombia'}
+
+        response = StateExportView().export_csv(data())
+        self.assertTrue(response.streaming)
+        self.assertEqual(read, [])
+
+        chunks = iter(response.streaming_content)
+        self.assertEqual(next(chunks).decode('utf-8'), 'Name,Code,Country.name\r\n')
+        self.assertEqual(read, [])
+        self.assertEqual(next(chunks).decode('utf-8'), 'Antioquia,05,Colombia\r\n')
+        self.assertEqual(read, ['Antioquia'])
+        rest = b''.join(chunks).decode('utf-8')
+        self.assertEqual(rest, '"Bogotá, D.C.",05,Colombia\r\n"Valle ""del Cauca""",05,Colombia\r\n')
+
+
+class ExportQueryPlanTests(TestCase):
+
+    def setUp(self):
+        colombia = create_country('Colombia')
+        for i in range(5):
+            State.objects.create(country=colombia, name=f'Estado {i}', code=f'{i:02}')
+
+    def export(self, fields):
+        class View(StateExportView):
+            fields_to_export = fields
+        return View()
+
+    def test_columns_are_read_with_values(self):
+        view = self.export(['name', 'country.name', 'country_id'])
+        plan = view.get_query_plan(view.get_fields())
+        self.assertEqual(plan['lookups'], {'name': 'name', 'country.name': 'country__name', 'country_id': 'country_id'})
+        self.assertFalse(plan['needs_objects'])
+        with self.assertNumQueries(1):
+            rows = list(view.iter_data())
+        self.assertEqual(rows[0], {'name': 'Estado 0', 'country.name': 'Colombia', 'country_id': rows[0]['country_id']})
+
+    def test_related_objects_and_methods_do_not_query_per_row(self):
+        view = self.export(['name', 'country', 'country.__str__'])
+        plan = view.get_query_plan(view.get_fields())
+        self.assertTrue(plan['needs_objects'])
+        self.assertEqual(plan['select_related'], {'country'})
+        with self.assertNumQueries(1):
+            rows = list(view.iter_data())
+        self.assertEqual(len(rows), 5)
+        self.assertEqual((str(rows[0]['country']), rows[0]['country.__str__']), ('Colombia', 'Colombia'))
+
+
+class ExcelExportTests(TestCase):
+
+    def read_sheets(self, response):
+        content = b''.join(response.streaming_content)
+        with zipfile.ZipFile(io.BytesIO(content)) as workbook:
+            names = sorted(name for name in workbook.namelist() if name.startswith('xl/worksheets/sheet'))
+            return [workbook.read(name).decode('utf-8') for name in names]
+
+    def test_rows_continue_on_a_new_sheet_past_the_limit(self):
+        view = StateExportView()
+        view.excel_max_rows = 4  # Encabezado + 3 filas por hoja
+        data = ({'name': f'Estado {i}', 'code': i, 'country.name': None} for i in range(7))
+        sheets = self.read_sheets(view.export_excel(data))
+        self.assertEqual([sheet.count('<row ') for sheet in sheets], [4, 4, 2])
+        # Cada hoja repite los encabezados; constant_memory escribe el texto en línea
+        self.assertTrue(all('<t>Name</t>' in sheet for sheet in sheets))
+        self.assertIn('<t>Estado 6</t>', sheets[2])
+
+
+class BackgroundExportTests(TestCase):
+
+    def setUp(self):
+        use_temp_dir(self, 'EXPORT_JOBS_DIR')
+        self.owner = User.objects.create(username='owner', identification_number='1')
+        self.other = User.objects.create(username='other', identification_number='2')
+        colombia = create_country('Colombia')
+        for i in range(3):
+            State.objects.create(country=colombia, name=f'Estado {i}', code=f'{i:02}')
+
+    def get(self, user, **params):
+        request = RequestFactory().get('/export/', params)
+        request.user = user
+        view = StateExportView()
+        view.setup(request)
+        return view.get(request)
+
+    def create_job(self, user, params):
+        # Lo mismo que enqueue_export antes de encolar la tarea
+        job_id = ExportJobStore.make_job_id(view='apps.base.tests.StateExportView', params=params, user=user.pk)
+        return ExportJobStore.create(
+            job_id, status='queued', model='base.State', format='csv', params=params,
+            user_id=user.pk, filename='state.csv',
+        )
+
+    def test_task_writes_the_file_for_its_owner(self):
+        params = {'format': ['csv']}
+        store = self.create_job(self.owner, params)
+        self.assertTrue(store.is_reusable(60))
+        self.assertEqual(self.get(self.owner, export_job=store.job_id, download='1').status_code, 409)
+
+        result = run_export_task('apps.base.tests.StateExportView', store.job_id, params, self.owner.pk)
+        self.assertEqual(result['size'], os.path.getsize(store.artifact_path))
+        status = json.loads(self.get(self.owner, export_job=store.job_id).content)
+        self.assertEqual(status['status'], 'done')
+        self.assertIn('download_url', status)
+
+        download = self.get(self.owner, export_job=store.job_id, download='1')
+        content = b''.join(download.streaming_content).decode('utf-8')
+        self.assertEqual(content.splitlines(), [
+            'Name,Code,Country.name', 'Estado 0,00,Colombia', 'Estado 1,01,Colombia', 'Estado 2,02,Colombia',
+        ])
+
+        # Otro usuario no ve ni descarga el trabajo
+        self.assertEqual(self.get(self.other, export_job=store.job_id).status_code, 404)
+        self.assertEqual(self.get(self.other, export_job=store.job_id, download='1').status_code, 404)
+
+    def test_jobs_are_shared_only_by_identical_requests_of_a_user(self):
+        params = {'format': ['csv']}
+        job_id = self.create_job(self.owner, params).job_id
+        self.assertEqual(self.create_job(self.owner, params).job_id, job_id)
+        self.assertNotEqual(self.create_job(self.other, params).job_id, job_id)
+        self.assertNotEqual(self.create_job(self.owner, {'format': ['pdf']}).job_id, job_id)
+
+    def test_small_exports_are_downloaded_directly(self):
+        response = json.loads(self.get(self.owner, format='csv', background='1').content)
+        self.assertEqual(response['status'], 'sync')
+        self.assertEqual(response['download_url'], '/export/?format=csv')
+        self.assertEqual(self.get(self.owner, export_job='../meta').status_code, 404)
+
+
+class PDFExportTableTests(TestCase):
+
+    def flowables(self, data, **options):
+        view = StateExportView()
+        for name, value in options.items():
+            setattr(view, name, value)
+        doc = SimpleDocTemplate(io.BytesIO(), pagesize=landscape(letter))
+        fields = view.get_fields()
+        title = Paragraph('Estados')
+        return doc, list(view.iter_pdf_flowables(doc, title, view.get_headers(fields), fields, iter(data)))
+
+    def rows(self, count, name='Estado'):
+        return [{'name': f'{name} {i}', 'code': f'{i:02}', 'country.name': 'Colombia'} for i in range(count)]
+
+    def test_table_is_split_in_blocks_with_headers(self):
+        _, flowables = self.flowables(self.rows(25), pdf_rows_per_table=10)
+        tables = flowables[1:]
+        self.assertEqual([len(table._cellvalues) for table in tables], [11, 11, 6])
+        self.assertTrue(all(table._cellvalues[0][0] == 'Name' for table in tables))
+        self.assertEqual(tables[2]._cellvalues[-1][0], 'Estado 24')
+
+    def test_long_values_wrap_within_the_sampled_widths(self):
+        data = self.rows(5) + self.rows(1, name='Nombre muy largo ' * 30)
+        doc, flowables = self.flowables(data, pdf_width_sample_rows=5)
+        widths = [table._colWidths for table in flowables[1:]]
+        self.assertLessEqual(sum(widths[0]), doc.width + 0.01)
+        self.assertEqual(len({tuple(width) for width in widths}), 1)
+        cells = [cell for table in flowables[1:] for row in table._cellvalues[1:] for cell in row]
+        self.assertEqual([isinstance(cell, Paragraph) for cell in cells].count(True), 1)
+
+    def test_export_builds_a_pdf(self):
+        response = StateExportView().export_pdf(iter(self.rows(120)))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(response.content.startswith(b'%PDF'))
+        self.assertGreater(response.content.count(b'/Type /Page\n'), 1)
@@ -1,11 +1,13 @@
+import codecs
 import csv
 import json
+import os
 from django.apps import apps
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
 from django.db import models
 from django.forms import modelform_factory
-from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, HttpResponse, JsonResponse
 from django.shortcuts import render, redirect
 from django.urls import reverse_lazy
 from django.utils.translation import gettext as _
@@ -13,9 +15,17 @@ from django.views.generic import View, FormView
 from django import forms
 from io import StringIO, TextIOWrapper
 from decimal import Decimal, InvalidOperation
-from django.core.exceptions import FieldDoesNotExist
+from django.core.exceptions import FieldDoesNotExist, ValidationError
 from django.core.serializers.json import DjangoJSONEncoder
 from django.db import transaction
+from django.utils import timezone
+
+from apps.audit.signals import audit_bulk_save, get_serialized_data, should_audit_model
+from apps.base.models.utils import get_current_user
+from apps.base.services.csvstaging import CSVStagingStore
+from apps.base.signals.listcache import bump_list_count_version
+from apps.base.signals.pdfcache import bump_pdf_cache_version
+from apps.base.signals.search import index_search_instances
 
 
 class GenericCSVImportForm(forms.Form):
@@ -25,6 +35,94 @@ class GenericCSVImportForm(forms.Form):
     )
 
 
+class ForeignKeyLookupCache:
+    """
+    Caché por importación para resolver valores de llaves foráneas.
+
+    Los valores se resuelven en bloque (consultas IN) la primera vez que aparecen,
+    primero por pk y luego por `name` si el modelo relacionado lo tiene, igual que
+    la búsqueda fila a fila. Los valores no encontrados se acumulan para
+    reportarlos al final de la importación.
+    """
+    lookup_batch_size = 500  # Valores por consulta IN
+
+    def __init__(self, model):
+        self.fields = {
+            field.name: field
+            for field in model._meta.get_fields()
+            if isinstance(field, models.ForeignKey)
+        }
+        self.resolved = {name: {} for name in self.fields}  # campo -> {valor: objeto o None}
+        self.unresolved = {}  # campo -> {valor: número de filas}
+
+    def prime(self, rows):
+        """Resuelve en bloque los valores de llaves foráneas de un grupo de filas"""
+        for field_name in self.fields:
+            values = {
+                row[field_name].strip() for row in rows
+                if row.get(field_name) and row[field_name].strip()
+            }
+            self.load(field_name, values)
+
+    def load(self, field_name, values):
+        resolved = self.resolved[field_name]
+        values = [value for value in values if value not in resolved]
+        if not values:
+            return
+        
+        related_model = self.fields[field_name].related_model
+        
+        # Primero por pk (solo valores numéricos)
+        pks = {}
+        for value in values:
+            try:
+                pks[int(value)] = value
+            except ValueError:
+                continue
+        pk_list = list(pks)
+        for start in range(0, len(pk_list), self.lookup_batch_size):
+            batch = pk_list[start:start + self.lookup_batch_size]
+            for obj in related_model.objects.filter(pk__in=batch):
+                resolved[pks[obj.pk]] = obj
+        
+        # Luego por nombre para los valores restantes
+        pending = [value for value in values if value not in resolved]
+        if pending and hasattr(related_model, 'name'):
+            for start in range(0, len(pending), self.lookup_batch_size):
+                batch = pending[start:start + self.lookup_batch_size]
+                for obj in related_model.objects.filter(name__in=batch):
+                    # Un nombre repetido es ambiguo: no se resuelve
+                    resolved[obj.name] = None if obj.name in resolved else obj
+        
+        for value in values:
+            resolved.setdefault(value, None)
+
+    def resolve(self, field_name, value):
+        """Devuelve el objeto relacionado para el valor o None si no existe"""
+        value = value.strip()
+        if value not in self.resolved[field_name]:
+            self.load(field_name, [value])
+        
+        obj = self.resolved[field_name][value]
+        if obj is None:
+            field_unresolved = self.unresolved.setdefault(field_name, {})
+            field_unresolved[value] = field_unresolved.get(value, 0) + 1
+        return obj
+
+    def get_unresolved_messages(self, limit=10):
+        """Resumen de los valores sin referencia encontrada, agrupados por campo"""
+        messages_list = []
+        for field_name, values in self.unresolved.items():
+            shown = ", ".join(
+                f"'{value}' ({count} filas)"
+                for value, count in list(values.items())[:limit]
+            )
+            if len(values) > limit:
+                shown += f" y {len(values) - limit} valores más"
+            messages_list.append(f"{field_name}: {shown}")
+        return messages_list
+
+
 class GenericCSVImportView(LoginRequiredMixin, PermissionRequiredMixin, View):
     model = None  # Debe ser definido en la clase hija o al instanciar
     template_name = 'import/csvimport_template.html'
@@ -39,6 +137,13 @@ class GenericCSVImportView(LoginRequiredMixin, PermissionRequiredMixin, View):
     preview_rows = 5  # Número de filas a mostrar en la vista previa
     csv_delimiter = ';'  # Delimitador para el CSV
     csv_quotechar = '"'  # Carácter para entrecomillar campos
+    csv_delimiters = ';,\t'  # Delimitadores candidatos al detectar el formato del archivo
+    csv_sample_size = 16 * 1024  # Bytes leídos para detectar codificación y delimitador
+    csv_fallback_encoding = 'cp1252'  # Codificación si la detectada falla al decodificar
+    import_batch_size = 500  # Filas por lote en la importación (bulk_create/bulk_update)
+    background_import_threshold = None  # Filas a partir de las cuales se importa en Celery (None = siempre síncrono)
+    lookup_batch_size = 500  # Valores por consulta IN al buscar registros existentes
+    error_sample_size = 100  # Errores que se muestran en pantalla; el resto va al reporte
 
     def setup(self, request, *args, **kwargs):
         super().setup(request, *args, **kwargs)
@@ -60,14 +165,22 @@ class GenericCSVImportView(LoginRequiredMixin, PermissionRequiredMixin, View):
             print("Downloading template")
             return self.download_template()
         
+        # Estado de una importación en segundo plano
+        if 'import_job' in request.GET:
+            return self.import_job_status(request, request.GET['import_job'])
+        
+        # Reporte de errores de una importación
+        if 'download_errors' in request.GET:
+            return self.download_error_report(request, request.GET['download_errors'])
+        
         # If preview requested
         if 'preview' in request.GET:
-            print("Preview requested, session keys:", request.session.keys())
-            if 'csv_data' in request.session:
-                print("CSV data found in session")
+            store = self.get_staging_store(request)
+            if store:
+                print(f"Staged import found: {store.import_id}")
                 return self.preview_import(request)
             else:
-                print("CSV data NOT found in session")
+                print("Staged import NOT found in session")
                 messages.error(request, "No CSV data found in session. Please upload a file first.")
         
         # Main upload view
@@ -78,7 +191,7 @@ class GenericCSVImportView(LoginRequiredMixin, PermissionRequiredMixin, View):
     def post(self, request, *args, **kwargs):
         
         # Confirm import after preview
-        if 'confirm_import' in request.POST and 'csv_data' in request.session:
+        if 'confirm_import' in request.POST and self.get_staging_store(request):
             print("Confirming import")
             return self.process_import(request)
         
@@ -95,65 +208,39 @@ class GenericCSVImportView(LoginRequiredMixin, PermissionRequiredMixin, View):
             messages.error(request, _('El archivo debe ser un CSV'))
             return self.render_response(request, {'form': form})
         
-        # Read the CSV file with different encodings
         print("Reading CSV file:", csv_file.name)
         
-        # Lista de codificaciones para intentar
-        encodings = ['latin-1', 'iso-8859-1', 'cp1252', 'utf-8']
+        # Eliminar importaciones abandonadas antes de preparar una nueva
+        CSVStagingStore.purge_stale()
+        
+        # Detectar codificación y delimitador a partir de una muestra del inicio
+        csv_file.file.seek(0)
+        sample = csv_file.file.read(self.csv_sample_size)
+        encoding = self.detect_encoding(sample)
+        delimiter = self.detect_delimiter(sample, encoding)
+        print(f"Detected encoding: {encoding}, delimiter: {delimiter!r}")
         
-        # Intentar diferentes codificaciones
-        csv_data = None
+        store = None
         fieldnames = None
         error_message = None
         
-        for encoding in encodings:
+        # Una sola pasada de decodificación; si la muestra engañó a la detección
+        # de UTF-8 (p.ej. acentos en cp1252 después de la muestra) se reintenta una vez
+        for encoding in dict.fromkeys([encoding, self.csv_fallback_encoding]):
             try:
-                # Reiniciar el puntero del archivo
-                csv_file.file.seek(0)
-                
-                # Leer el contenido completo del archivo primero
-                content = csv_file.file.read()
-                # Decodificar el contenido con la codificación actual
-                decoded_content = content.decode(encoding)
-                
-                # Crear un StringIO para usar csv.DictReader
-                from io import StringIO
-                csv_io = StringIO(decoded_content)
-                
-                # Usar el DictReader con configuración para manejar comillas
-                reader = csv.DictReader(
-                    csv_io, 
-                    delimiter=self.csv_delimiter,
-                    quotechar=self.csv_quotechar
-                )
-                
-                # Forzar la lectura de fieldnames
-                if not reader.fieldnames:
-                    error_message = "No se pudieron leer los encabezados del archivo"
-                    continue
-                
-                # Guardar los nombres de campo - Ya deben estar bien manejados con las comillas
-                fieldnames = reader.fieldnames
-                
-                # Imprimir nombres de campos para depuración
-                print(f"Detected fieldnames: {fieldnames}")
-                
-                # Leer todos los datos
-                csv_data = list(reader)
-                
-                # Si hay datos, mostrar primera fila para depuración
-                if csv_data:
-                    print(f"First row: {csv_data[0]}")
-                
-                # Si llegamos aquí, la decodificación fue exitosa
-                print(f"Successfully decoded with {encoding}")
+                store, fieldnames = self.stage_csv(csv_file, encoding, delimiter, user_id=request.user.pk)
+                print(f"Successfully decoded with {encoding}: {store.total_rows} rows staged in {store.import_id}")
                 break
-            except Exception as e:
+            except UnicodeDecodeError as e:
                 error_message = f"Error con codificación {encoding}: {str(e)}"
                 print(error_message)
+            except Exception as e:
+                error_message = str(e)
+                print(f"Error al leer el archivo CSV: {error_message}")
+                break
         
-        # Si no se pudo decodificar con ninguna codificación
-        if csv_data is None or not fieldnames:
+        # Si no se pudo decodificar el archivo
+        if store is None or not fieldnames:
             messages.error(request, _(f'No se pudo procesar el archivo CSV. {error_message}'))
             return self.render_response(request, {'form': form})
         
@@ -166,14 +253,14 @@ class GenericCSVImportView(LoginRequiredMixin, PermissionRequiredMixin, View):
                 missing_fields.append(field)
         
         if missing_fields:
+            store.delete()
             fields_str = ", ".join(missing_fields)
             messages.error(request, _(f'El archivo no contiene los campos obligatorios: {fields_str}'))
             return self.render_response(request, {'form': form})
         
-        # Save data in session for preview
-        print(f"Storing {len(csv_data)} rows in session")
-        request.session['csv_data'] = json.dumps(csv_data, cls=DjangoJSONEncoder)
-        request.session['csv_fieldnames'] = fieldnames
+        # Guardar solo la referencia a la importación preparada en la sesión
+        self.clear_staging_store(request)
+        request.session['csv_import_id'] = store.import_id
         request.session.modified = True  # Explicitly mark the session as modified
         
         # Redirect to preview
@@ -181,46 +268,116 @@ class GenericCSVImportView(LoginRequiredMixin, PermissionRequiredMixin, View):
         print(f"Redirecting to preview: {preview_url}")
         return redirect(preview_url)
 
+    def detect_encoding(self, sample):
+        """
+        Determina la codificación del archivo a partir de una muestra de bytes:
+        BOM si existe, UTF-8 si la muestra es válida y, en otro caso, cp1252
+        (o latin-1 si aparecen bytes que cp1252 no define).
+        """
+        if sample.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+        if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            return 'utf-16'
+        
+        try:
+            # Decodificador incremental: tolera un carácter multibyte cortado al final
+            codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+            return 'utf-8'
+        except UnicodeDecodeError:
+            pass
+        
+        if any(byte in sample for byte in (0x81, 0x8d, 0x8f, 0x90, 0x9d)):
+            return 'latin-1'
+        return 'cp1252'
+
+    def detect_delimiter(self, sample, encoding):
+        """Detecta el delimitador con csv.Sniffer sobre las líneas completas de la muestra"""
+        text = sample.decode(encoding, errors='replace')
+        # Descartar la última línea, que puede estar incompleta
+        if '\n' in text:
+            text = text[:text.rindex('\n')]
+        try:
+            dialect = csv.Sniffer().sniff(text, delimiters=self.csv_delimiters)
+            return dialect.delimiter
+        except csv.Error:
+            return self.csv_delimiter
+
+    def stage_csv(self, csv_file, encoding, delimiter, user_id=None):
+        """
+        Decodifica el archivo en streaming y vuelca sus filas a un almacén
+        temporal. user_id es el dueño: solo él puede consultar la importación y
+        descargar su reporte de errores.
+        """
+        csv_file.file.seek(0)
+        store = None
+        text_stream = TextIOWrapper(csv_file.file, encoding=encoding, newline='')
+        try:
+            reader = csv.DictReader(
+                text_stream,
+                delimiter=delimiter,
+                quotechar=self.csv_quotechar
+            )
+            
+            # Forzar la lectura de fieldnames
+            fieldnames = reader.fieldnames
+            if not fieldnames:
+                raise ValueError("No se pudieron leer los encabezados del archivo")
+            print(f"Detected fieldnames: {fieldnames}")
+            
+            store = CSVStagingStore.create(
+                fieldnames,
+                model=self.model._meta.label,
+                encoding=encoding,
+                delimiter=delimiter,
+                user_id=user_id
+            )
+            store.write_rows(reader)
+            return store, fieldnames
+        except Exception:
+            if store:
+                store.delete()
+            raise
+        finally:
+            # Liberar el wrapper sin cerrar el archivo subido
+            text_stream.detach()
+
     def preview_import(self, request):
         """Versión con depuración mejorada para identificar problemas de previsualización"""
         print("Starting preview_import method")
         try:
-            # Verificar que los datos existen en la sesión
-            if 'csv_data' not in request.session:
+            # Verificar que la importación preparada existe
+            store = self.get_staging_store(request)
+            if not store:
                 messages.error(request, _('No se encontraron datos CSV en la sesión. Por favor, cargue el archivo nuevamente.'))
                 return redirect(request.path)
                 
-            # Intentar cargar los datos
-            csv_data = json.loads(request.session['csv_data'])
-            fieldnames = request.session.get('csv_fieldnames', [])
+            meta = store.read_meta()
+            fieldnames = meta.get('fieldnames', [])
             
-            # Registrar para depuración
+            # Leer solo las primeras filas para la vista previa
+            preview_data = store.head(self.preview_rows)
+            total_rows = meta.get('total_rows', 0)
             print(f"CSV fieldnames: {fieldnames}")
-            print(f"CSV data (primeras 2 filas): {csv_data[:2] if csv_data else 'No hay datos'}")
-            
-            # Limitar a primeras filas para vista previa
-            preview_data = csv_data[:self.preview_rows]
-            total_rows = len(csv_data)
             
-            # Analizar estado de cada fila
+            # Analizar estado de las filas de muestra (una sola consulta)
             validated_rows = []
-            for i, row in enumerate(preview_data):
-                try:
-                    row_status = self.validate_row(row)
+            try:
+                for row, row_status in zip(preview_data, self.validate_rows(preview_data)):
                     validated_rows.append({
                         'data': row,
                         'status': row_status['status'],
                         'message': row_status['message']
                     })
-                    print(f"Fila {i+1} validada: {row_status}")
-                except Exception as e:
-                    print(f"Error validando fila {i+1}: {str(e)}")
-                    messages.error(request, _(f"Error procesando fila {i+1}: {str(e)}"))
+            except Exception as e:
+                print(f"Error validando filas de muestra: {str(e)}")
+                messages.error(request, _(f"Error procesando filas de muestra: {str(e)}"))
             
-            # Estadísticas
+            # Estadísticas del archivo completo: se calculan una vez por importación
+            # preparada y se guardan con ella, de modo que recargar la vista previa no consulta la BD
             try:
-                total_valid = sum(1 for row in csv_data if self.validate_row(row)['status'] in ['new', 'update'])
-                total_invalid = total_rows - total_valid
+                validation = meta.get('validation') or self.validate_store(store)
+                total_valid = validation['new'] + validation['update']
+                total_invalid = validation['error']
             except Exception as e:
                 print(f"Error calculando estadísticas: {str(e)}")
                 total_valid = 0
@@ -251,8 +408,8 @@ class GenericCSVImportView(LoginRequiredMixin, PermissionRequiredMixin, View):
             }
             
             return self.render_response(request, context)
-        except json.JSONDecodeError as e:
-            print(f"Error decodificando JSON: {str(e)}")
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"Error leyendo la importación preparada: {str(e)}")
             messages.error(request, _('Error al cargar los datos JSON. Por favor, inténtelo de nuevo.'))
         except Exception as e:
             print(f"Error general en preview_import: {str(e)}")
@@ -262,62 +419,34 @@ class GenericCSVImportView(LoginRequiredMixin, PermissionRequiredMixin, View):
     
     def process_import(self, request):
         try:
-            # Verificar que los datos existen en la sesión
-            if 'csv_data' not in request.session:
-                print("No CSV data found in session")
+            # Verificar que la importación preparada existe
+            store = self.get_staging_store(request)
+            if not store:
+                print("No staged import found in session")
                 messages.error(request, _('No se encontraron datos CSV en la sesión. Por favor, cargue el archivo nuevamente.'))
                 return redirect(request.path)
             
-            # Cargar datos de la sesión    
-            try:
-                csv_data = json.loads(request.session['csv_data'])
-                print(f"Loaded {len(csv_data)} rows from session")
-            except json.JSONDecodeError as e:
-                print(f"JSON decode error: {str(e)}")
-                messages.error(request, _('Error al decodificar los datos JSON de la sesión.'))
-                return redirect(request.path)
+            # Importaciones grandes: delegar a Celery y mostrar el progreso
+            if self.should_run_in_background(store):
+                if self.enqueue_import(request, store):
+                    request.session.pop('csv_import_id', None)
+                    request.session.modified = True
+                    return redirect(f"{request.path}?import_job={store.import_id}")
+                messages.warning(request, _('No fue posible programar la importación en segundo plano; se ejecutará ahora.'))
             
-            # Procesar todas las filas para importación real
-            stats = {
-                'created': 0,
-                'updated': 0,
-                'skipped': 0,
-                'errors': []
-            }
+            stats = self.run_import(store)
             
-            # Procesar cada fila en su propia transacción
-            for row_num, row in enumerate(csv_data, start=2):  # start=2 porque la fila 1 son los encabezados
-                try:
-                    print(f"Processing row {row_num}: {row}")
-                    
-                    # Usar transacción individual para cada fila
-                    with transaction.atomic():
-                        result = self.process_row(row)
-                        
-                        if result['status'] == 'new':
-                            stats['created'] += 1
-                            print(f"Row {row_num}: Created new record")
-                        elif result['status'] == 'update':
-                            stats['updated'] += 1
-                            print(f"Row {row_num}: Updated existing record")
-                        elif result['status'] == 'error':
-                            stats['skipped'] += 1
-                            error_msg = f"Fila {row_num}: {result['message']}"
-                            stats['errors'].append(error_msg)
-                            print(f"Row {row_num}: Error - {result['message']}")
-                except Exception as e:
-                    stats['skipped'] += 1
-                    error_msg = f"Fila {row_num}: Error inesperado - {str(e)}"
-                    stats['errors'].append(error_msg)
-                    print(f"Row {row_num}: Unexpected error - {str(e)}")
+            # La importación ya no se necesita en la sesión; si hubo errores se
+            # conserva el reporte hasta la purga de importaciones antiguas
+            request.session.pop('csv_import_id', None)
+            if not stats['errors_count']:
+                store.delete()
             
-            # Limpiar datos de sesión
-            if 'csv_data' in request.session:
-                del request.session['csv_data']
-            if 'csv_fieldnames' in request.session:
-                del request.session['csv_fieldnames']
+            # Valores de llaves foráneas que no se pudieron resolver (reporte agrupado)
+            for warning in stats['warnings']:
+                messages.warning(request, _(warning))
             
-            print(f"Import stats: created={stats['created']}, updated={stats['updated']}, skipped={stats['skipped']}, errors={len(stats['errors'])}")
+            print(f"Import stats: created={stats['created']}, updated={stats['updated']}, skipped={stats['skipped']}, errors={stats['errors_count']}")
             
             # Preparar mensaje detallado para mostrar en modal/alert
             message_details = []
@@ -328,11 +457,12 @@ class GenericCSVImportView(LoginRequiredMixin, PermissionRequiredMixin, View):
             if stats['skipped'] > 0:
                 message_details.append(f"Se han omitido {stats['skipped']} registros por errores")
             
-            # Almacenar detalles completos en la sesión para modal
-            if stats['errors']:
-                message_details.append(f"Se encontraron {len(stats['errors'])} errores")
-                request.session['import_errors'] = stats['errors'][:100]  # Limitamos a 100 errores para no sobrecargar
-                request.session['import_has_more_errors'] = len(stats['errors']) > 100
+            # Almacenar una muestra de errores en la sesión para el modal;
+            # el detalle completo queda en el reporte descargable
+            if stats['errors_count']:
+                message_details.append(f"Se encontraron {stats['errors_count']} errores")
+                request.session['import_errors'] = stats['error_sample']
+                request.session['import_has_more_errors'] = stats['errors_count'] > len(stats['error_sample'])
                 request.session.modified = True
             
             # Mensaje simple para flash
@@ -340,7 +470,7 @@ class GenericCSVImportView(LoginRequiredMixin, PermissionRequiredMixin, View):
             if stats['created'] > 0 or stats['updated'] > 0:
                 messages.success(request, _(f'Importación completada: {summary_message}'))
                 # Mensaje para indicar que hay detalles disponibles
-                if stats['errors']:
+                if stats['errors_count']:
                     messages.warning(request, _('Haga clic en "Ver detalles" para información sobre los errores.'))
             else:
                 messages.error(request, _(f'Importación fallida: {summary_message}'))
@@ -350,7 +480,10 @@ class GenericCSVImportView(LoginRequiredMixin, PermissionRequiredMixin, View):
                 'created': stats['created'],
                 'updated': stats['updated'],
                 'skipped': stats['skipped'],
-                'errors_count': len(stats['errors'])
+                'errors_count': stats['errors_count'],
+                'errors_report_url': (
+                    f"{request.path}?download_errors={store.import_id}" if stats['errors_count'] else None
+                ),
             }
             request.session.modified = True
             
@@ -365,6 +498,392 @@ class GenericCSVImportView(LoginRequiredMixin, PermissionRequiredMixin, View):
             messages.error(request, _(f'Error inesperado durante la importación: {str(e)}'))
             return redirect(request.path)
 
+    def run_import(self, store):
+        """
+        Importa todas las filas de una importación preparada, por lotes.
+        No depende de la petición: se usa tanto en la vista como en la tarea de Celery.
+        El progreso se registra en los metadatos de la importación y los errores
+        en su reporte descargable.
+        """
+        stats = {
+            'processed': 0,
+            'created': 0,
+            'updated': 0,
+            'skipped': 0,
+            'errors_count': 0,
+            'errors': [],  # Errores del lote en curso
+            'error_sample': [],  # Primeros errores para mostrar en pantalla
+            'warnings': [],
+        }
+        total_rows = store.total_rows
+        store.update_meta(status='running', progress=self.get_progress(stats, total_rows))
+        
+        try:
+            # Procesar las filas por lotes: una consulta de existentes y un
+            # bulk_create/bulk_update por lote en lugar de varias consultas por fila
+            row_num = 2  # La fila 1 son los encabezados
+            for chunk in store.iter_chunks(self.import_batch_size):
+                self.process_batch(chunk, row_num, stats)
+                row_num += len(chunk)
+                stats['processed'] += len(chunk)
+                
+                # Volcar los errores del lote al reporte
+                store.append_errors(stats['errors'])
+                stats['errors_count'] += len(stats['errors'])
+                free_slots = self.error_sample_size - len(stats['error_sample'])
+                stats['error_sample'].extend(stats['errors'][:max(free_slots, 0)])
+                stats['errors'] = []
+                
+                store.update_meta(progress=self.get_progress(stats, total_rows))
+        except Exception as e:
+            store.update_meta(status='failed', error=str(e), progress=self.get_progress(stats, total_rows))
+            raise
+        finally:
+            # bulk_create/bulk_update no disparan señales: invalidar los PDFs y los conteos del modelo
+            if stats['created'] or stats['updated']:
+                bump_pdf_cache_version(self.model)
+                bump_list_count_version(self.model)
+        
+        unresolved = self.get_fk_cache().get_unresolved_messages()
+        if unresolved:
+            print(f"Unresolved foreign keys: {unresolved}")
+            stats['warnings'].append(
+                f'No se encontraron referencias para algunos valores (campo omitido): {"; ".join(unresolved)}'
+            )
+        
+        store.discard_rows()
+        store.update_meta(
+            status='done',
+            progress=self.get_progress(stats, total_rows),
+            error_sample=stats['error_sample'],
+            warnings=stats['warnings'],
+        )
+        return stats
+
+    def get_progress(self, stats, total_rows):
+        """Contadores de progreso que se publican para la consulta periódica"""
+        return {
+            'total': total_rows,
+            'processed': stats['processed'],
+            'created': stats['created'],
+            'updated': stats['updated'],
+            'skipped': stats['skipped'],
+            'errors': stats['errors_count'],
+        }
+
+    def should_run_in_background(self, store):
+        """Indica si la importación debe ejecutarse en Celery"""
+        if self.background_import_threshold is None:
+            return False
+        return store.total_rows >= self.background_import_threshold
+
+    def enqueue_import(self, request, store):
+        """Programa la importación en Celery. Devuelve False si no fue posible"""
+        from apps.base.tasks.import_tasks import run_csv_import_task
+        
+        view_path = f'{self.__class__.__module__}.{self.__class__.__qualname__}'
+        user_id = request.user.pk if request.user.is_authenticated else None
+        store.update_meta(status='queued', user_id=user_id, progress=self.get_progress({
+            'processed': 0, 'created': 0, 'updated': 0, 'skipped': 0, 'errors_count': 0,
+        }, store.total_rows))
+        try:
+            result = run_csv_import_task.delay(view_path, store.import_id, user_id)
+        except Exception as e:
+            # Broker no disponible u otro error de Celery
+            print(f"Could not enqueue import {store.import_id}: {str(e)}")
+            store.update_meta(status='pending')
+            return False
+        store.update_meta(task_id=result.id)
+        return True
+
+    def get_import_job(self, request, import_id):
+        """Obtiene una importación (en curso o terminada) del usuario actual para este modelo"""
+        try:
+            store = CSVStagingStore(import_id)
+            if not store.exists():
+                return None
+            meta = store.read_meta()
+        except (ValueError, OSError, json.JSONDecodeError):
+            return None
+        if meta.get('model') != self.model._meta.label:
+            return None
+        # Las importaciones sin dueño registrado no se exponen por id
+        if meta.get('user_id') is None or (
+            meta['user_id'] != request.user.pk and not request.user.is_superuser
+        ):
+            return None
+        return store
+
+    def import_job_status(self, request, import_id):
+        """Página de progreso de una importación en segundo plano (JSON para la consulta periódica)"""
+        store = self.get_import_job(request, import_id)
+        if not store:
+            if request.GET.get('format') == 'json':
+                return JsonResponse({'error': _('Importación no encontrada')}, status=404)
+            messages.error(request, _('Importación no encontrada.'))
+            return redirect(request.path)
+        
+        meta = store.read_meta()
+        status = {
+            'import_id': store.import_id,
+            'status': meta.get('status', 'pending'),
+            'progress': meta.get('progress', {}),
+            'error': meta.get('error'),
+            'warnings': meta.get('warnings', []),
+            'errors_report_url': (
+                f"{request.path}?download_errors={store.import_id}"
+                if os.path.exists(store.error_report_path) else None
+            ),
+        }
+        if request.GET.get('format') == 'json':
+            return JsonResponse(status)
+        
+        return self.render_response(request, {
+            'import_job': status,
+            'status_url': f"{request.path}?import_job={store.import_id}&format=json",
+        })
+
+    def download_error_report(self, request, import_id):
+        """Descarga el reporte completo de errores de una importación"""
+        store = self.get_import_job(request, import_id)
+        if not store or not os.path.exists(store.error_report_path):
+            messages.error(request, _('No hay reporte de errores disponible para esta importación.'))
+            return redirect(request.path)
+        
+        return FileResponse(
+            open(store.error_report_path, 'rb'),
+            as_attachment=True,
+            filename=f"{self.model._meta.model_name}_errores_importacion.csv",
+            content_type='text/csv',
+        )
+
+    def get_staging_store(self, request):
+        """Obtiene la importación preparada de la sesión, si existe y pertenece a este modelo"""
+        import_id = request.session.get('csv_import_id')
+        if not import_id:
+            return None
+        try:
+            store = CSVStagingStore(import_id)
+            if store.exists() and store.read_meta().get('model') == self.model._meta.label:
+                return store
+        except (ValueError, OSError, json.JSONDecodeError) as e:
+            print(f"Error abriendo la importación preparada {import_id}: {str(e)}")
+        return None
+
+    def clear_staging_store(self, request):
+        """Elimina la importación preparada de la sesión y del disco"""
+        import_id = request.session.pop('csv_import_id', None)
+        if import_id:
+            try:
+                CSVStagingStore(import_id).delete()
+            except ValueError:
+                pass
+            request.session.modified = True
+
+    def process_batch(self, rows, first_row_num, stats):
+        """
+        Importa un lote de filas con bulk_create/bulk_update dentro de un savepoint.
+        Si el lote falla se revierte y se reprocesa fila a fila para aislar los errores.
+        """
+        required_fields = self.get_required_fields()
+        errors = []
+        
+        # Resolver en bloque las llaves foráneas del lote
+        fk_cache = self.get_fk_cache()
+        fk_cache.prime(rows)
+        unresolved_before = {field: dict(values) for field, values in fk_cache.unresolved.items()}
+        
+        # Limpiar las filas del lote
+        prepared = []
+        for row_num, row in enumerate(rows, start=first_row_num):
+            missing = [field for field in required_fields if not row.get(field)]
+            if missing:
+                errors.append(f"Fila {row_num}: Falta el campo requerido: {missing[0]}")
+                continue
+            try:
+                cleaned_data = self.clean_row_data(row)
+            except Exception as e:
+                errors.append(f"Fila {row_num}: Error inesperado: {str(e)}")
+                continue
+            if not cleaned_data:
+                errors.append(f"Fila {row_num}: No se pudieron procesar datos válidos de esta fila")
+                continue
+            prepared.append((row_num, row, cleaned_data))
+        
+        # Registros existentes del lote en una sola consulta
+        existing = self.get_existing_objects(
+            row.get(self.unique_field) for _, row, _ in prepared
+        ) if self.unique_field else {}
+        
+        audit_enabled = should_audit_model(self.model)
+        user = get_current_user()
+        
+        new_instances = []
+        pending = {}  # Valor único -> instancia nueva de este lote
+        update_instances = {}  # pk -> instancia existente modificada
+        update_fields = set()
+        previous_data = {}  # pk -> datos antes de la modificación (auditoría)
+        created = updated = 0
+        
+        for row_num, row, cleaned_data in prepared:
+            value = row.get(self.unique_field) if self.unique_field else None
+            error = self.get_unique_key_error(value) if self.unique_field else None
+            if error:
+                errors.append(f"Fila {row_num}: Error al actualizar registro existente: {error}")
+                continue
+            key = self.get_unique_key(value) if self.unique_field else None
+            
+            if key is not None and key in existing:
+                instance = existing[key]
+                if instance is None:
+                    errors.append(
+                        f"Fila {row_num}: Error al actualizar registro existente: "
+                        f"Múltiples registros encontrados con {self.unique_field}={key}"
+                    )
+                    continue
+                if audit_enabled and instance.pk not in previous_data:
+                    previous_data[instance.pk] = get_serialized_data(instance)
+                for field, value in cleaned_data.items():
+                    setattr(instance, field, value)
+                update_instances[instance.pk] = instance
+                update_fields.update(cleaned_data)
+                updated += 1
+            elif key is not None and key in pending:
+                # Fila repetida dentro del lote: actualiza la instancia pendiente de crear
+                for field, value in cleaned_data.items():
+                    setattr(pending[key], field, value)
+                updated += 1
+            else:
+                try:
+                    instance = self.model(**cleaned_data)
+                except Exception as e:
+                    errors.append(f"Fila {row_num}: Error al crear nuevo registro: {str(e)}")
+                    continue
+                if user and hasattr(instance, 'created_by'):
+                    instance.created_by = user
+                new_instances.append(instance)
+                if key is not None:
+                    pending[key] = instance
+                created += 1
+        
+        # bulk_update no ejecuta save(): replicar auto_now y el usuario modificador
+        if update_instances:
+            now = timezone.now()
+            for field in self.model._meta.concrete_fields:
+                if getattr(field, 'auto_now', False):
+                    update_fields.add(field.name)
+                    for instance in update_instances.values():
+                        setattr(instance, field.attname, now)
+            if user and hasattr(self.model, 'modified_by'):
+                update_fields.add('modified_by')
+        if user and hasattr(self.model, 'modified_by'):
+            for instance in [*new_instances, *update_instances.values()]:
+                instance.modified_by = user
+        
+        try:
+            with transaction.atomic():
+                if new_instances:
+                    self.model.objects.bulk_create(new_instances, batch_size=self.import_batch_size)
+                if update_instances:
+                    self.model.objects.bulk_update(
+                        list(update_instances.values()),
+                        sorted(update_fields),
+                        batch_size=self.import_batch_size
+                    )
+                # bulk_create/bulk_update no disparan señales: actualizar el índice de búsqueda
+                index_search_instances(self.model, [*new_instances, *update_instances.values()])
+                if audit_enabled:
+                    audit_bulk_save(
+                        self.model,
+                        created=new_instances,
+                        updated=update_instances.values(),
+                        previous_data=previous_data
+                    )
+        except Exception as e:
+            print(f"Batch starting at row {first_row_num} failed, retrying row by row: {str(e)}")
+            # Las filas se limpiarán de nuevo: no contar dos veces los valores sin resolver
+            fk_cache.unresolved = unresolved_before
+            self.process_rows_individually(rows, first_row_num, stats)
+            return
+        
+        stats['created'] += created
+        stats['updated'] += updated
+        stats['skipped'] += len(errors)
+        stats['errors'].extend(errors)
+
+    def process_rows_individually(self, rows, first_row_num, stats):
+        """Procesa cada fila en su propia transacción (respaldo para lotes fallidos)"""
+        for row_num, row in enumerate(rows, start=first_row_num):
+            try:
+                # Usar transacción individual para cada fila
+                with transaction.atomic():
+                    result = self.process_row(row)
+            except Exception as e:
+                stats['skipped'] += 1
+                error_msg = f"Fila {row_num}: Error inesperado - {str(e)}"
+                stats['errors'].append(error_msg)
+                print(f"Row {row_num}: Unexpected error - {str(e)}")
+                continue
+            
+            # Contabilizar solo cuando la transacción de la fila se confirmó
+            if result['status'] == 'new':
+                stats['created'] += 1
+            elif result['status'] == 'update':
+                stats['updated'] += 1
+            elif result['status'] == 'error':
+                stats['skipped'] += 1
+                error_msg = f"Fila {row_num}: {result['message']}"
+                stats['errors'].append(error_msg)
+                print(f"Row {row_num}: Error - {result['message']}")
+
+    def validate_store(self, store):
+        """
+        Valida todas las filas de una importación preparada por lotes y guarda
+        el resumen (nuevos/actualizaciones/errores) en sus metadatos.
+        """
+        validation = {'new': 0, 'update': 0, 'error': 0}
+        for chunk in store.iter_chunks(self.import_batch_size):
+            for row_status in self.validate_rows(chunk):
+                validation[row_status['status']] += 1
+        store.update_meta(validation=validation)
+        return validation
+
+    def validate_rows(self, rows):
+        """
+        Equivalente por lotes de validate_row: resuelve los registros existentes
+        de todas las filas con consultas IN en lugar de una consulta por fila.
+        """
+        required_fields = self.get_required_fields()
+        existing = self.get_existing_pks(
+            row.get(self.unique_field) for row in rows
+        ) if self.unique_field else {}
+        
+        results = []
+        for row in rows:
+            value = row.get(self.unique_field) if self.unique_field else None
+            key = self.get_unique_key(value, strict=True) if self.unique_field else None
+            error = self.get_unique_key_error(value) if self.unique_field else None
+            if error:
+                # Como en validate_row: la búsqueda del registro falla con ese valor
+                results.append({'status': 'error', 'message': error})
+            elif key is None:
+                # Sin campo único, se creará nuevo registro si tiene los campos requeridos
+                missing = [field for field in required_fields if not row.get(field)]
+                if missing:
+                    results.append({'status': 'error', 'message': f'Falta el campo requerido: {missing[0]}'})
+                else:
+                    results.append({'status': 'new', 'message': 'Nuevo registro'})
+            elif key not in existing:
+                results.append({'status': 'new', 'message': 'Nuevo registro'})
+            elif existing[key] is None:
+                results.append({
+                    'status': 'error',
+                    'message': f'Múltiples registros encontrados con {self.unique_field}={key}'
+                })
+            else:
+                results.append({'status': 'update', 'message': f'Actualizar registro existente #{existing[key]}'})
+        return results
+
     def validate_row(self, row):
         """Valida una fila y determina si se creará o actualizará un registro"""
         if not self.unique_field or not row.get(self.unique_field):
@@ -387,8 +906,6 @@ class GenericCSVImportView(LoginRequiredMixin, PermissionRequiredMixin, View):
 
     def process_row(self, row):
         """Procesa una fila para crear o actualizar un registro"""
-        print(f"Processing row data: {row}")
-        
         # Verificar campos requeridos
         for field in self.get_required_fields():
             if not row.get(field):
@@ -397,7 +914,6 @@ class GenericCSVImportView(LoginRequiredMixin, PermissionRequiredMixin, View):
         # Preparar datos
         try:
             cleaned_data = self.clean_row_data(row)
-            print(f"Cleaned data: {cleaned_data}")
             
             if not cleaned_data:
                 return {'status': 'error', 'message': 'No se pudieron procesar datos válidos de esta fila'}
@@ -407,7 +923,6 @@ class GenericCSVImportView(LoginRequiredMixin, PermissionRequiredMixin, View):
                 try:
                     instance = self.get_existing_object(row)
                     if instance:
-                        print(f"Found existing instance with {self.unique_field}={row[self.unique_field]}")
                         # Actualizar existente
                         for field, value in cleaned_data.items():
                             setattr(instance, field, value)
@@ -419,7 +934,6 @@ class GenericCSVImportView(LoginRequiredMixin, PermissionRequiredMixin, View):
             
             # Crear nuevo
             try:
-                print(f"Creating new record with data: {cleaned_data}")
                 self.model.objects.create(**cleaned_data)
                 return {'status': 'new', 'message': 'Registro creado'}
             except Exception as e:
@@ -432,23 +946,17 @@ class GenericCSVImportView(LoginRequiredMixin, PermissionRequiredMixin, View):
     def clean_row_data(self, row):
         """Limpia y convierte los datos de la fila según los tipos de campo"""
         cleaned_data = {}
-        print(f"Cleaning row data: {row}")
         
         # Obtener una lista de campos válidos del modelo
         valid_fields = self.get_model_fields()
-        print(f"Valid model fields: {valid_fields}")
         
         for field_name, value in row.items():
-            print(f"Processing field '{field_name}' with value '{value}'")
-            
             # Saltar campos vacíos o en la lista de exclusión
             if not value or field_name in self.exclude_fields:
-                print(f"Skipping field '{field_name}': empty or excluded")
                 continue
             
             # Verificar si el campo existe en el modelo
             if field_name not in valid_fields:
-                print(f"Skipping field '{field_name}': not in model fields")
                 continue
                 
             try:
@@ -458,7 +966,6 @@ class GenericCSVImportView(LoginRequiredMixin, PermissionRequiredMixin, View):
                 if isinstance(field, models.IntegerField):
                     try:
                         cleaned_data[field_name] = int(value) if value.strip() else None
-                        print(f"Converted '{field_name}' to integer: {cleaned_data[field_name]}")
                     except ValueError as e:
                         print(f"Error converting '{field_name}' to integer: {str(e)}")
                         continue
@@ -468,7 +975,6 @@ class GenericCSVImportView(LoginRequiredMixin, PermissionRequiredMixin, View):
                         # Reemplazar coma por punto para decimales
                         decimal_value = value.replace(',', '.').strip()
                         cleaned_data[field_name] = Decimal(decimal_value) if decimal_value else None
-                        print(f"Converted '{field_name}' to decimal: {cleaned_data[field_name]}")
                     except InvalidOperation as e:
                         print(f"Error converting '{field_name}' to decimal: {str(e)}")
                         continue
@@ -476,26 +982,13 @@ class GenericCSVImportView(LoginRequiredMixin, PermissionRequiredMixin, View):
                 elif isinstance(field, models.BooleanField):
                     bool_value = value.lower() in ('true', 'yes', 'si', 's', '1', 'verdadero')
                     cleaned_data[field_name] = bool_value
-                    print(f"Converted '{field_name}' to boolean: {cleaned_data[field_name]}")
                     
                 elif isinstance(field, models.ForeignKey):
                     if value.strip():
-                        try:
-                            # Intentar obtener objeto por ID
-                            related_obj = field.related_model.objects.get(pk=int(value))
+                        # Resolver por ID o nombre usando la caché de la importación
+                        related_obj = self.get_fk_cache().resolve(field_name, value)
+                        if related_obj is not None:
                             cleaned_data[field_name] = related_obj
-                            print(f"Found related object for '{field_name}': {related_obj}")
-                        except (field.related_model.DoesNotExist, ValueError) as e:
-                            print(f"Error finding related object for '{field_name}': {str(e)}")
-                            # Intentar buscar por nombre o código si es apropiado
-                            # Este código es un ejemplo y puede necesitar adaptarse según tus modelos
-                            if hasattr(field.related_model, 'name'):
-                                try:
-                                    related_obj = field.related_model.objects.get(name=value.strip())
-                                    cleaned_data[field_name] = related_obj
-                                    print(f"Found related object by name for '{field_name}': {related_obj}")
-                                except (field.related_model.DoesNotExist, field.related_model.MultipleObjectsReturned) as e:
-                                    print(f"Error finding related object by name for '{field_name}': {str(e)}")
                 elif isinstance(field, models.DateField):
                     try:
                         # Intentar varios formatos de fecha
@@ -511,7 +1004,6 @@ class GenericCSVImportView(LoginRequiredMixin, PermissionRequiredMixin, View):
                         
                         if date_value:
                             cleaned_data[field_name] = date_value
-                            print(f"Converted '{field_name}' to date: {cleaned_data[field_name]}")
                         else:
                             print(f"Could not parse date format for '{field_name}'")
                     except Exception as e:
@@ -519,13 +1011,11 @@ class GenericCSVImportView(LoginRequiredMixin, PermissionRequiredMixin, View):
                 else:
                     # Para campos de texto y otros tipos
                     cleaned_data[field_name] = value.strip()
-                    print(f"Set '{field_name}' as string: {cleaned_data[field_name]}")
             except Exception as e:
                 print(f"Unexpected error processing field '{field_name}': {str(e)}")
                 # Continuar con el siguiente campo en lugar de fallar
                 continue
         
-        print(f"Final cleaned data: {cleaned_data}")
         return cleaned_data
 
     def get_existing_object(self, row):
@@ -533,7 +1023,7 @@ class GenericCSVImportView(LoginRequiredMixin, PermissionRequiredMixin, View):
         if not self.unique_field or not row.get(self.unique_field):
             return None
             
-        filters = {self.unique_field: row[self.unique_field]}
+        filters = {self.unique_field: self.get_unique_key(row[self.unique_field])}
         try:
             return self.model.objects.get(**filters)
         except self.model.DoesNotExist:
@@ -541,6 +1031,79 @@ class GenericCSVImportView(LoginRequiredMixin, PermissionRequiredMixin, View):
         except self.model.MultipleObjectsReturned:
             raise Exception(f'Múltiples registros encontrados con {self.unique_field}={row[self.unique_field]}')
 
+    def get_fk_cache(self):
+        """Caché de llaves foráneas para la importación en curso"""
+        if getattr(self, 'fk_cache', None) is None:
+            self.fk_cache = ForeignKeyLookupCache(self.model)
+        return self.fk_cache
+
+    def get_unique_key(self, value, strict=False):
+        """
+        Valor del campo único convertido al tipo del campo ('007' y ' 7' son el
+        mismo registro que 7 en un campo entero). None si la fila no lo tiene.
+        Los valores no válidos se devuelven sin convertir (no coinciden con
+        ningún registro), o None con strict=True.
+        """
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == '':
+            return None
+        try:
+            return self.model._meta.get_field(self.unique_field).to_python(value)
+        except ValidationError:
+            return None if strict else value
+
+    def get_unique_key_error(self, value):
+        """Mensaje de error si el valor del campo único no es válido para su tipo"""
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == '':
+            return None
+        try:
+            self.model._meta.get_field(self.unique_field).to_python(value)
+        except ValidationError as e:
+            return f"Valor no válido para {self.unique_field} ({value}): {' '.join(e.messages)}"
+        return None
+
+    def get_unique_keys(self, values):
+        """Claves distintas y válidas del campo único, para consultas IN"""
+        return list({self.get_unique_key(value, strict=True) for value in values} - {None})
+
+    def get_existing_objects(self, values):
+        """
+        Obtiene en bloque los registros existentes según el campo único.
+        Devuelve {clave (get_unique_key): objeto}; las claves con varios
+        registros se asocian a None.
+        """
+        values = self.get_unique_keys(values)
+        field = self.model._meta.get_field(self.unique_field)
+        existing = {}
+        for start in range(0, len(values), self.lookup_batch_size):
+            batch = values[start:start + self.lookup_batch_size]
+            for obj in self.model.objects.filter(**{f'{self.unique_field}__in': batch}):
+                key = field.to_python(getattr(obj, field.attname))
+                existing[key] = None if key in existing else obj
+        return existing
+
+    def get_existing_pks(self, values):
+        """
+        Como get_existing_objects pero solo con las claves primarias.
+        Devuelve {clave (get_unique_key): pk}; las claves con varios registros
+        se asocian a None.
+        """
+        values = self.get_unique_keys(values)
+        field = self.model._meta.get_field(self.unique_field)
+        existing = {}
+        for start in range(0, len(values), self.lookup_batch_size):
+            batch = values[start:start + self.lookup_batch_size]
+            queryset = self.model.objects.filter(
+                **{f'{self.unique_field}__in': batch}
+            ).values_list('pk', self.unique_field)
+            for pk, value in queryset:
+                key = field.to_python(value)
+                existing[key] = None if key in existing else pk
+        return existing
+
     def get_model_fields(self):
         """Obtiene los campos del modelo excluyendo los campos en exclude_fields"""
         return [
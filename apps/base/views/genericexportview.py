@@ -1,19 +1,61 @@
 import csv
 import json
+import tempfile
 from datetime import datetime
-from io import BytesIO, StringIO
+from io import BytesIO
+from itertools import chain, islice
+from xml.sax.saxutils import escape
 
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
-from django.http import HttpResponse, JsonResponse
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.utils.translation import gettext as _
 from django.views.generic import View
 
 # Add reportlab for PDF generation
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter, landscape
-from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
 
+from apps.base.services.exportjobs import ExportJobStore
+
+
+class EchoBuffer:
+    """Pseudo-buffer para csv.writer: devuelve cada línea en lugar de acumularla"""
+    def write(self, value):
+        return value
+
+
+class StreamingDocTemplate(SimpleDocTemplate):
+    """
+    SimpleDocTemplate que toma los flowables de un iterador a medida que se
+    maquetan, en lugar de requerir la lista completa en memoria.
+    """
+    lookahead = 3  # Flowables pendientes en la lista (keepWithNext mira hacia adelante)
+    
+    def build_stream(self, flowables, **kwargs):
+        self._pending_flowables = iter(flowables)
+        self._story = []
+        self.fill_story()
+        self.build(self._story, **kwargs)
+    
+    def filterFlowables(self, flowables):
+        # Se llama antes de maquetar cada flowable: reponer la historia desde el iterador
+        # (también se llama con listas internas de reportlab, que no se tocan)
+        if flowables is getattr(self, '_story', None):
+            self.fill_story()
+    
+    def fill_story(self):
+        while self._pending_flowables is not None and len(self._story) < self.lookahead:
+            try:
+                self._story.append(next(self._pending_flowables))
+            except StopIteration:
+                self._pending_flowables = None
+
 
 class GenericExportView(LoginRequiredMixin, PermissionRequiredMixin, View):
     """
@@ -26,6 +68,11 @@ class GenericExportView(LoginRequiredMixin, PermissionRequiredMixin, View):
     - exclude_fields: Lista de campos a excluir de la exportación
     - queryset: Para sobreescribir el queryset por defecto
     - filename_prefix: Prefijo para el nombre del archivo (por defecto es el nombre del modelo)
+    - export_chunk_size: Registros leídos por consulta al recorrer el queryset
+    - auto_optimize_queryset: Deducir select_related/prefetch_related/only/values de los campos
+    - background_export_threshold: Registros a partir de los cuales una solicitud con
+      ?background=1 se genera en Celery (None = siempre en la petición)
+    - export_job_ttl: Segundos durante los que una exportación idéntica reutiliza el archivo generado
     """
     model = None  # Debe ser definido en la clase hija
     permission_required = 'view_model'  # Debe ser definido en la clase hija o se auto-configurará
@@ -33,6 +80,14 @@ class GenericExportView(LoginRequiredMixin, PermissionRequiredMixin, View):
     exclude_fields = ['id', 'created_at', 'updated_at', 'image']  # Campos a excluir de la exportación
     queryset = None  # Para sobreescribir el queryset por defecto
     filename_prefix = None  # Prefijo para el nombre del archivo
+    export_chunk_size = 2000  # Registros por lote al iterar el queryset (iterator)
+    excel_max_rows = 1048576  # Límite de filas por hoja de Excel (incluye encabezados)
+    auto_optimize_queryset = True  # Aplicar select_related/prefetch_related/only/values según los campos
+    background_export_threshold = 5000  # Registros desde los que ?background=1 usa un trabajo en Celery
+    export_job_ttl = 60 * 10  # Vigencia (segundos) del archivo de un trabajo para solicitudes idénticas
+    export_extensions = {'csv': 'csv', 'pdf': 'pdf', 'excel': 'xlsx'}
+    pdf_rows_per_table = None  # Filas por bloque de la tabla PDF (None = las que caben en una página)
+    pdf_width_sample_rows = 500  # Filas leídas para calcular el ancho de las columnas del PDF
     
     def setup(self, request, *args, **kwargs):
         super().setup(request, *args, **kwargs)
@@ -49,6 +104,10 @@ class GenericExportView(LoginRequiredMixin, PermissionRequiredMixin, View):
                 self.filename_prefix = self.model_name
     
     def get(self, request, *args, **kwargs):
+        # Estado o descarga de una exportación en segundo plano
+        if 'export_job' in request.GET:
+            return self.export_job_status(request, request.GET['export_job'])
+        
         # Determinar el formato de exportación
         export_format = request.GET.get('format', 'csv').lower()
         
@@ -56,16 +115,147 @@ class GenericExportView(LoginRequiredMixin, PermissionRequiredMixin, View):
         if export_format not in ['csv', 'pdf', 'excel']:
             return JsonResponse({'error': _('Formato no soportado')}, status=400)
         
-        # Obtener los datos
-        data = self.get_data()
-        
-        # Ejecutar la exportación según el formato solicitado
+        # Exportación como trabajo en segundo plano (la interfaz consulta su estado)
+        if request.GET.get('background'):
+            store = None
+            if self.should_export_in_background():
+                store = self.enqueue_export(request, export_format)
+            if store:
+                return JsonResponse(self.get_export_job_payload(request, store))
+            
+            # Exportación pequeña o Celery no disponible: descarga directa
+            params = request.GET.copy()
+            params.pop('background', None)
+            return JsonResponse({
+                'status': 'sync',
+                'download_url': f"{request.path}?{params.urlencode()}",
+            })
+        
+        return self.render_export(export_format)
+    
+    def render_export(self, export_format):
+        """Genera la respuesta de la exportación en el formato indicado"""
+        # Todos los formatos se generan a partir del iterador, sin materializar los datos
         if export_format == 'csv':
-            return self.export_csv(data)
-        elif export_format == 'pdf':
-            return self.export_pdf(data)
+            return self.export_csv(self.iter_data())
         elif export_format == 'excel':
-            return self.export_excel(data)
+            return self.export_excel(self.iter_data())
+        elif export_format == 'pdf':
+            return self.export_pdf(self.iter_data())
+        
+        raise ValueError(f'Formato no soportado: {export_format}')
+    
+    def get_export_filename(self, extension):
+        """Nombre del archivo exportado"""
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        return f"{self.filename_prefix}_export_{timestamp}.{extension}"
+    
+    # --- Exportación en segundo plano ---
+    
+    def should_export_in_background(self):
+        """Decide si la exportación se genera en Celery según el número de registros"""
+        if self.background_export_threshold is None:
+            return False
+        return self.get_queryset().count() >= self.background_export_threshold
+    
+    def get_export_params(self, request):
+        """Parámetros GET que definen la exportación (formato y filtros)"""
+        params = {key: values for key, values in request.GET.lists() if key != 'background'}
+        return dict(sorted(params.items()))
+    
+    def enqueue_export(self, request, export_format):
+        """
+        Encola la exportación en Celery y devuelve su trabajo. Una solicitud idéntica
+        (misma vista, formato y filtros) dentro de export_job_ttl reutiliza el trabajo
+        existente y su archivo. Devuelve None si no se pudo encolar.
+        """
+        from apps.base.tasks.export_tasks import run_export_task
+        
+        view_path = f"{self.__class__.__module__}.{self.__class__.__qualname__}"
+        params = self.get_export_params(request)
+        # El usuario forma parte de la clave: las consultas pueden depender de él
+        # (scope_queryset, filtros por propietario) y el archivo solo es suyo
+        user_id = request.user.pk if request.user.is_authenticated else None
+        job_id = ExportJobStore.make_job_id(view=view_path, params=params, user=user_id)
+        
+        store = ExportJobStore(job_id)
+        if store.is_reusable(self.export_job_ttl):
+            print(f"Reusing export job {job_id}")
+            return store
+        
+        # Eliminar trabajos vencidos (y el anterior con los mismos parámetros)
+        ExportJobStore.purge_stale()
+        store.delete()
+        
+        store = ExportJobStore.create(
+            job_id,
+            status='queued',
+            model=self.model._meta.label,
+            format=export_format,
+            params=params,
+            user_id=user_id,
+            filename=self.get_export_filename(self.export_extensions[export_format])
+        )
+        try:
+            run_export_task.delay(view_path, job_id, params, user_id)
+        except Exception as e:
+            print(f"Could not enqueue export {job_id}: {str(e)}")
+            store.delete()
+            return None
+        return store
+    
+    def get_export_job(self, request, job_id):
+        """
+        Obtiene el trabajo de exportación si existe, pertenece al modelo de esta
+        vista y lo creó el usuario actual
+        """
+        try:
+            store = ExportJobStore(job_id)
+        except ValueError:
+            return None
+        if not store.exists():
+            return None
+        meta = store.read_meta()
+        if meta.get('model') != self.model._meta.label:
+            return None
+        if not request.user.is_authenticated or meta.get('user_id') != request.user.pk:
+            return None
+        return store
+    
+    def get_export_job_payload(self, request, store):
+        """Estado del trabajo para la interfaz"""
+        meta = store.read_meta()
+        payload = {
+            'job_id': store.job_id,
+            'status': meta.get('status'),
+            'error': meta.get('error'),
+            'size': meta.get('size'),
+            'filename': meta.get('filename'),
+            'status_url': f"{request.path}?export_job={store.job_id}",
+        }
+        if meta.get('status') == 'done':
+            payload['download_url'] = f"{request.path}?export_job={store.job_id}&download=1"
+        return payload
+    
+    def export_job_status(self, request, job_id):
+        """Devuelve el estado del trabajo o, con ?download=1, el archivo generado"""
+        store = self.get_export_job(request, job_id)
+        if not store:
+            return JsonResponse({'error': _('Exportación no encontrada')}, status=404)
+        
+        if 'download' not in request.GET:
+            return JsonResponse(self.get_export_job_payload(request, store))
+        
+        meta = store.read_meta()
+        if meta.get('status') != 'done' or not store.has_artifact():
+            return JsonResponse({'error': _('La exportación aún no está lista')}, status=409)
+        
+        return FileResponse(
+            open(store.artifact_path, 'rb'),
+            as_attachment=True,
+            filename=meta.get('filename'),
+            content_type=meta.get('content_type')
+        )
     
     def get_fields(self):
         """Obtener la lista de campos a exportar"""
@@ -109,68 +299,194 @@ class GenericExportView(LoginRequiredMixin, PermissionRequiredMixin, View):
     
     def get_data(self):
         """Obtener los datos a exportar"""
-        queryset = self.get_queryset()
+        return list(self.iter_data())
+    
+    def iter_data(self):
+        """
+        Recorre el queryset por lotes (iterator) y produce una fila (dict) por registro,
+        sin mantener todos los objetos en memoria
+        """
         fields = self.get_fields()
+        queryset = self.get_queryset()
+        
+        if not self.auto_optimize_queryset:
+            for obj in queryset.iterator(chunk_size=self.export_chunk_size):
+                yield self.get_row(obj, fields)
+            return
         
-        data = []
-        for obj in queryset:
-            row = {}
-            for field in fields:
-                # Gestionar campos con puntos (relaciones)
-                if '.' in field:
-                    parts = field.split('.')
-                    value = obj
-                    for part in parts:
-                        if value is None:
-                            break
-                        value = getattr(value, part, None)
-                else:
-                    value = getattr(obj, field, None)
+        plan = self.get_query_plan(fields)
+        
+        # Solo columnas del modelo: leer diccionarios con values(), sin instanciar objetos
+        if not plan['needs_objects']:
+            lookups = plan['lookups']
+            queryset = queryset.values(*dict.fromkeys(lookups.values()))
+            for record in queryset.iterator(chunk_size=self.export_chunk_size):
+                yield {field: record[lookup] for field, lookup in lookups.items()}
+            return
+        
+        queryset = self.optimize_queryset(queryset, plan)
+        for obj in queryset.iterator(chunk_size=self.export_chunk_size):
+            yield self.get_row(obj, fields)
+    
+    def get_query_plan(self, fields):
+        """
+        Analiza los campos a exportar (con puntos para relaciones) y determina cómo
+        consultarlos:
+        - lookups: campo -> lookup ORM, para los campos que son columnas
+        - select_related: caminos de relaciones a uno (ForeignKey/OneToOne)
+        - prefetch_related: caminos de relaciones a muchos (o genéricas)
+        - only: columnas a cargar, o None si algún método del modelo principal
+          puede necesitar cualquier columna
+        - needs_objects: False si todos los campos pueden leerse con values()
+        """
+        lookups = {}
+        select_related = set()
+        prefetch_related = set()
+        only = set()
+        restrict_columns = True
+        needs_objects = False
+        
+        for field_name in fields:
+            parts = field_name.split('.')
+            model = self.model
+            path = []
+            
+            for index, part in enumerate(parts):
+                is_last = index == len(parts) - 1
+                try:
+                    field = model._meta.get_field(part)
+                except FieldDoesNotExist:
+                    # Método o propiedad: se necesita el objeto completo donde se define
+                    needs_objects = True
+                    if path:
+                        select_related.add('__'.join(path))
+                        only.add('__'.join(path))
+                    else:
+                        restrict_columns = False
+                    break
                 
-                # Si el valor es una función, llamarla
-                if callable(value):
-                    value = value()
+                if field.many_to_many or field.one_to_many or (field.is_relation and field.related_model is None):
+                    # Relación a muchos o genérica: se precarga y se resuelve en Python
+                    needs_objects = True
+                    prefetch_related.add('__'.join(path + [part]))
+                    if path:
+                        select_related.add('__'.join(path))
+                        only.add('__'.join(path))
+                    elif field.related_model is None:
+                        # Una relación genérica necesita sus columnas de tipo e id
+                        only.update([field.ct_field, field.fk_field])
+                    break
                 
-                row[field] = value
+                path.append(part)
+                lookup = '__'.join(path)
+                
+                # get_field también acepta el attname ('pais_id'): es la columna
+                # de la llave foránea, no el objeto relacionado
+                if not field.is_relation or part == getattr(field, 'attname', None) != field.name:
+                    # Columna; atributos posteriores (p.ej. fecha.year) se leen del valor
+                    only.add(lookup)
+                    if len(path) > 1:
+                        select_related.add('__'.join(path[:-1]))
+                    if is_last:
+                        lookups[field_name] = lookup
+                    else:
+                        needs_objects = True
+                    break
+                
+                # Relación a uno: seguir por el modelo relacionado
+                model = field.related_model
+                if is_last:
+                    # El valor es el objeto relacionado (se exporta su __str__)
+                    needs_objects = True
+                    select_related.add(lookup)
+                    only.add(lookup)
+        
+        return {
+            'lookups': lookups,
+            'select_related': select_related,
+            'prefetch_related': prefetch_related,
+            'only': only if restrict_columns else None,
+            'needs_objects': needs_objects,
+        }
+    
+    def optimize_queryset(self, queryset, plan):
+        """Aplica select_related/prefetch_related/only según el plan de consulta"""
+        if plan['only']:
+            # only() no admite select_related sobre campos diferidos: reemplazar los del manager
+            queryset = queryset.select_related(None).only(*plan['only'])
+        if plan['select_related']:
+            queryset = queryset.select_related(*plan['select_related'])
+        if plan['prefetch_related']:
+            queryset = queryset.prefetch_related(*plan['prefetch_related'])
+        return queryset
+    
+    def get_row(self, obj, fields):
+        """Obtener los valores de un registro para los campos indicados"""
+        return {field: self.resolve_field_value(obj, field.split('.')) for field in fields}
+    
+    def resolve_field_value(self, obj, parts):
+        """Recorre un campo con puntos (relaciones) sobre el objeto y devuelve su valor"""
+        value = obj
+        for index, part in enumerate(parts):
+            if value is None:
+                break
+            value = getattr(value, part, None)
             
-            data.append(row)
+            # Relación a muchos: resolver el resto del camino en cada elemento precargado
+            if isinstance(value, models.Manager):
+                rest = parts[index + 1:]
+                items = [self.resolve_field_value(item, rest) if rest else item for item in value.all()]
+                return ', '.join(str(item) for item in items if item is not None)
         
-        return data
+        # Si el valor es una función, llamarla
+        if callable(value):
+            value = value()
+        
+        return value
     
     def export_csv(self, data):
-        """Exportar datos en formato CSV"""
+        """
+        Exportar datos en formato CSV.
+        
+        La respuesta se envía en streaming: cada fila se escribe a medida que se
+        lee del iterable `data`, con memoria constante sin importar el tamaño.
+        """
         fields = self.get_fields()
         headers = self.get_headers(fields)
         
-        # Crear archivo CSV
-        output = StringIO()
-        writer = csv.writer(output)
-        
-        # Escribir encabezados
-        writer.writerow(headers)
+        writer = csv.writer(EchoBuffer())
         
-        # Escribir datos
-        for row in data:
-            writer.writerow([str(row.get(field, '')) for field in fields])
+        def rows():
+            # Escribir encabezados
+            yield writer.writerow(headers)
+            
+            # Escribir datos
+            for row in data:
+                yield writer.writerow([str(row.get(field, '')) for field in fields])
         
         # Crear respuesta HTTP
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"{self.filename_prefix}_export_{timestamp}.csv"
+        filename = self.get_export_filename('csv')
         
-        response = HttpResponse(output.getvalue(), content_type='text/csv')
+        response = StreamingHttpResponse(rows(), content_type='text/csv')
         response['Content-Disposition'] = f'attachment; filename="{filename}"'
         
         return response
     
     def export_pdf(self, data):
-        """Exportar datos en formato PDF"""
+        """
+        Exportar datos en formato PDF.
+        
+        La tabla se divide en bloques del tamaño de una página, cada uno con su
+        encabezado, y los bloques se generan a medida que se maquetan a partir del
+        iterable `data`. El estilo es el mismo para todos los bloques (franjas con
+        ROWBACKGROUNDS), así el tiempo crece linealmente con el número de filas.
+        """
         fields = self.get_fields()
         headers = self.get_headers(fields)
         
         # Crear archivo PDF
         buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=landscape(letter))
-        elements = []
+        doc = StreamingDocTemplate(buffer, pagesize=landscape(letter))
         
         # Estilos para el PDF
         styles = getSampleStyleSheet()
@@ -179,43 +495,12 @@ class GenericExportView(LoginRequiredMixin, PermissionRequiredMixin, View):
         # Título del documento
         model_name = self.model._meta.verbose_name_plural.capitalize()
         title = Paragraph(f"Exportación de {model_name}", title_style)
-        elements.append(title)
-        
-        # Preparar datos para la tabla
-        table_data = [headers]  # Primera fila con encabezados
-        
-        for row in data:
-            table_data.append([str(row.get(field, '')) for field in fields])
-        
-        # Crear tabla
-        table = Table(table_data)
-        
-        # Estilo de la tabla
-        style = TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ])
-        
-        # Alternar colores para filas
-        for i in range(1, len(table_data)):
-            if i % 2 == 0:
-                style.add('BACKGROUND', (0, i), (-1, i), colors.whitesmoke)
-        
-        table.setStyle(style)
-        elements.append(table)
         
         # Construir el PDF
-        doc.build(elements)
+        doc.build_stream(self.iter_pdf_flowables(doc, title, headers, fields, data))
         
         # Crear respuesta HTTP
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"{self.filename_prefix}_export_{timestamp}.pdf"
+        filename = self.get_export_filename('pdf')
         
         response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
         response['Content-Disposition'] = f'attachment; filename="{filename}"'
@@ -225,8 +510,104 @@ class GenericExportView(LoginRequiredMixin, PermissionRequiredMixin, View):
         
         return response
     
+    def get_pdf_table_style(self):
+        """Estilo común a todos los bloques de la tabla del PDF"""
+        return TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            # Alternar colores para filas sin un comando por fila
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.beige, colors.whitesmoke]),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ])
+    
+    def get_pdf_cell_style(self):
+        """Estilo de las celdas que no caben en el ancho de su columna"""
+        return ParagraphStyle('export_cell', fontName='Helvetica', fontSize=10, leading=12, alignment=TA_CENTER)
+    
+    def wrap_pdf_row(self, row, col_widths, cell_style):
+        """
+        Convierte en Paragraph (que ajusta el texto en varias líneas) los valores
+        más anchos que su columna; el resto se deja como texto, que es más rápido
+        de maquetar
+        """
+        padding = 12  # Relleno izquierdo y derecho por defecto de las celdas
+        wrapped = []
+        for value, width in zip(row, col_widths):
+            if value and ('\n' in value or stringWidth(value, 'Helvetica', 10) + padding > width):
+                value = Paragraph(escape(value).replace('\n', '<br/>'), cell_style)
+            wrapped.append(value)
+        return wrapped
+    
+    def iter_pdf_flowables(self, doc, title, headers, fields, data):
+        """
+        Produce el título y la tabla en bloques de una página. El ancho de las
+        columnas se calcula sobre las primeras pdf_width_sample_rows filas y se
+        mantiene en todos los bloques para que las páginas queden alineadas; los
+        valores posteriores más largos se ajustan en varias líneas dentro de su
+        celda. Si un bloque con esas filas no cabe en la página, la tabla se
+        divide y continúa en la siguiente.
+        """
+        style = self.get_pdf_table_style()
+        rows = ([str(row.get(field, '')) for field in fields] for row in data)
+        
+        yield title
+        
+        # Espacio útil del marco (SimpleDocTemplate usa 6 puntos de relleno por lado)
+        frame_height = doc.height - 12
+        title_height = title.wrap(doc.width, frame_height)[1] + title.getSpaceBefore() + title.getSpaceAfter()
+        
+        sample = list(islice(rows, max(self.pdf_width_sample_rows, self.pdf_rows_per_table or 1)))
+        col_widths = self.get_pdf_col_widths(doc, headers, sample)
+        cell_style = self.get_pdf_cell_style()
+        rows = (self.wrap_pdf_row(row, col_widths, cell_style) for row in chain(sample, rows))
+        first_rows = list(islice(rows, 1))
+        
+        # Altura del encabezado y de una fila, medidas sobre una tabla de prueba
+        probe = Table([headers] + first_rows, colWidths=col_widths, style=style)
+        probe.wrap(doc.width, frame_height)
+        header_height = probe._rowHeights[0]
+        row_height = probe._rowHeights[1] if first_rows else header_height
+        
+        def page_rows(available):
+            if self.pdf_rows_per_table:
+                return self.pdf_rows_per_table
+            return max(int((available - header_height) // row_height), 1)
+        
+        # Primera página: descontar el título
+        chunk = first_rows + list(islice(rows, max(page_rows(frame_height - title_height) - len(first_rows), 0)))
+        while True:
+            yield Table([headers] + chunk, colWidths=col_widths, repeatRows=1, style=style)
+            chunk = list(islice(rows, page_rows(frame_height)))
+            if not chunk:
+                break
+    
+    def get_pdf_col_widths(self, doc, headers, rows):
+        """Anchos de columna según el contenido, ajustados al ancho de la página"""
+        padding = 12  # Relleno izquierdo y derecho por defecto de las celdas
+        widths = [stringWidth(str(header), 'Helvetica-Bold', 12) + padding for header in headers]
+        for row in rows:
+            for col, value in enumerate(row):
+                longest = max(value.split('\n'), key=len) if value else ''
+                widths[col] = max(widths[col], stringWidth(longest, 'Helvetica', 10) + padding)
+        
+        total = sum(widths)
+        if total > doc.width:
+            widths = [width * doc.width / total for width in widths]
+        return widths
+    
     def export_excel(self, data):
-        """Exportar datos en formato Excel (XLSX)"""
+        """
+        Exportar datos en formato Excel (XLSX).
+        
+        El libro se escribe en modo constant_memory (fila a fila, a medida que se
+        lee el iterable `data`) sobre un archivo temporal que se envía con
+        FileResponse. Al llegar al límite de filas de Excel se continúa en una
+        nueva hoja con los mismos encabezados.
+        """
         try:
             import xlsxwriter
         except ImportError:
@@ -235,16 +616,15 @@ class GenericExportView(LoginRequiredMixin, PermissionRequiredMixin, View):
         fields = self.get_fields()
         headers = self.get_headers(fields)
         
-        # Crear archivo Excel en memoria
-        output = BytesIO()
-        workbook = xlsxwriter.Workbook(output)
-        worksheet = workbook.add_worksheet()
+        # Archivo temporal: se elimina automáticamente al cerrarse la respuesta
+        output = tempfile.TemporaryFile(suffix='.xlsx')
+        workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
         
         # Estilos
         header_format = workbook.add_format({
             'bold': True,
             'bg_color': '#4F81BD',
-            'color': 'white',
+            'font_color': 'white',
             'align': 'center',
             'valign': 'vcenter',
             'border': 1
@@ -263,12 +643,26 @@ class GenericExportView(LoginRequiredMixin, PermissionRequiredMixin, View):
             'valign': 'vcenter'
         })
         
-        # Escribir encabezados
-        for col, header in enumerate(headers):
-            worksheet.write(0, col, header, header_format)
+        def add_sheet():
+            worksheet = workbook.add_worksheet()
+            # Ancho de 15 para todas las columnas (antes de escribir filas en constant_memory)
+            worksheet.set_column(0, max(len(headers) - 1, 0), 15)
+            # Escribir encabezados
+            for col, header in enumerate(headers):
+                worksheet.write(0, col, header, header_format)
+            return worksheet
+        
+        worksheet = add_sheet()
+        row_num = 0
         
         # Escribir datos
-        for row_num, row in enumerate(data, start=1):
+        for row in data:
+            row_num += 1
+            if row_num >= self.excel_max_rows:
+                # Límite de filas de la hoja alcanzado: continuar en una nueva
+                worksheet = add_sheet()
+                row_num = 1
+            
             # Alternar formatos para filas
             row_format = cell_format if row_num % 2 == 0 else alt_format
             for col, field in enumerate(fields):
@@ -279,28 +673,20 @@ class GenericExportView(LoginRequiredMixin, PermissionRequiredMixin, View):
                 if not isinstance(value, str):
                     try:
                         value = str(value)
-                    except:
+                    except Exception:
                         value = ''
-                worksheet.write(row_num, col, value, row_format)
-        
-        # Ajustar anchos de columna
-        for col, _ in enumerate(headers):
-            worksheet.set_column(col, col, 15)  # Ancho de 15 para todas las columnas
+                worksheet.write_string(row_num, col, value, row_format)
         
         # Cerrar el libro
         workbook.close()
+        output.seek(0)
         
         # Crear respuesta HTTP
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"{self.filename_prefix}_export_{timestamp}.xlsx"
+        filename = self.get_export_filename('xlsx')
         
-        response = HttpResponse(
-            output.getvalue(),
+        return FileResponse(
+            output,
+            as_attachment=True,
+            filename=filename,
             content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
         )
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        # Cerrar el buffer
-        output.close()
-        
-        return response
\ No newline at end of file
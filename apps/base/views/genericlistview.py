@@ -1,22 +1,109 @@
 # En apps/base/views/base_views.py (crear este archivo si no existe)
 
+from django.apps import apps
 from django.views.generic import ListView
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
-from django.db.models import Q
+from django.core.exceptions import FieldError, ValidationError
+from django.db.models import Count, Q
+from django.http import Http404
 from django.urls import reverse_lazy
 from django.utils.translation import gettext_lazy as _
 
+from apps.base.services.listcache import CachedCountPaginator, get_list_count_cache, get_list_count_cache_labels
+from apps.base.services.listfilters import (
+    compile_filters, compile_ordering, get_index_problem, register_list_view, resolve_lookup
+)
+from apps.base.services.pagination import CursorPage, CursorPaginator, InvalidCursor
+from apps.base.services.search import get_search_backend, register_search_fields
+
 class OptimizedListView(ListView):
     """
     Base para todas las vistas de lista con optimizaciones de rendimiento.
     Elimina el registro de auditoría de visualizaciones y añade funcionalidad
     de búsqueda común.
+
+    Con pagination_mode = 'cursor' las páginas se obtienen por conjunto de claves
+    (ordenamiento activo + pk) con tokens opacos en el parámetro ``cursor``, sin
+    COUNT(*) ni OFFSET: útil para listados grandes donde las páginas profundas
+    se vuelven lentas. Los parámetros search/filter_*/order_by se conservan.
+
+    La búsqueda usa el índice del motor (FTS5 en SQLite, pg_trgm en PostgreSQL)
+    cuando existe para el modelo (ver rebuild_search_index y
+    settings.SEARCH_INDEX) y __icontains si no.
+
+    filter_fields y order_fields declaran los filter_* y order_by permitidos; los
+    lookups se validan una vez por clase y los valores se convierten al tipo del
+    campo. Sin declaración se acepta cualquier campo, como hasta ahora, ignorando
+    los que no son válidos. check_list_indexes informa de los filtros y
+    ordenamientos declarados que no tienen un índice que los soporte.
     """
     paginate_by = 20  # Paginación por defecto
+    pagination_mode = 'offset'  # 'offset' (Paginator de Django) o 'cursor' (keyset)
+    cursor_param = 'cursor'  # Parámetro GET con el token de la página
+    cursor_count_mode = 'estimate'  # Total en modo cursor: None, 'estimate' o 'exact'
     search_fields = []  # Campos para búsqueda
     order_by = None  # Ordenamiento por defecto (puede ser string, list o tuple)
     exclude_search_fields = []  # Campos para búsqueda negativa
-    
+    use_search_index = True  # Usar el índice de búsqueda si existe
+    # Filtros permitidos: lista de campos o {nombre: lookup}, p.ej.
+    # {'tipo': 'third_party_type__code', 'alta': 'created_at__range'}. None = cualquiera
+    filter_fields = None
+    # Ordenamientos permitidos: lista de campos o {nombre: campo}. None = cualquiera
+    order_fields = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.model is not None:
+            # Registrar la vista para check_list_indexes y sus campos para
+            # rebuild_search_index
+            register_list_view(cls)
+            if cls.search_fields:
+                register_search_fields(cls.model, cls.search_fields)
+
+    @classmethod
+    def get_compiled_filters(cls):
+        """{nombre: ListFilter} de filter_fields, compilado una vez por clase"""
+        if cls.filter_fields is None:
+            return None
+        if '_compiled_filters' not in cls.__dict__:
+            cls._compiled_filters = compile_filters(cls.model, cls.filter_fields)
+        return cls._compiled_filters
+
+    @classmethod
+    def get_compiled_ordering(cls):
+        """{nombre: (campo, ruta)} de order_fields, compilado una vez por clase"""
+        if cls.order_fields is None:
+            return None
+        if '_compiled_ordering' not in cls.__dict__:
+            cls._compiled_ordering = compile_ordering(cls.model, cls.order_fields)
+        return cls._compiled_ordering
+
+    @classmethod
+    def get_index_report(cls):
+        """[(parámetro, lookup, problema)] de filtros y ordenamientos sin índice"""
+        report = []
+        for name, list_filter in (cls.get_compiled_filters() or {}).items():
+            problem = list_filter.index_problem
+            if problem:
+                report.append((f'filter_{name}', f'{list_filter.path}__{list_filter.lookup}', problem))
+
+        ordering = {
+            name: (path, fields) for name, (path, fields) in (cls.get_compiled_ordering() or {}).items()
+        }
+        default_order = [cls.order_by] if isinstance(cls.order_by, str) else list(cls.order_by or [])
+        for item in default_order:
+            path = item.lstrip('-')
+            if path not in ordering:
+                try:
+                    ordering[path] = (path, resolve_lookup(cls.model, path)[0])
+                except ValueError:
+                    continue
+        for name, (path, fields) in ordering.items():
+            problem = get_index_problem(fields)
+            if problem:
+                report.append((f'order_by={name}', path, problem))
+        return report
+
     def get_queryset(self):
         queryset = super().get_queryset()
         
@@ -24,51 +111,18 @@ class OptimizedListView(ListView):
         search_term = self.request.GET.get('search', '')
         if search_term and self.search_fields:
             print(f"Buscando: '{search_term}' en campos: {self.search_fields}")
-
-            filters = Q()
-            for field in self.search_fields:
-                filters |= Q(**{f"{field}__icontains": search_term})
-            queryset = queryset.filter(filters)
+            queryset = self.search_queryset(queryset, search_term)
         
         # Aplicar filtros adicionales desde parámetros GET
+        self.filter_errors = []
         for param, value in self.request.GET.items():
             if param.startswith('filter_') and value:
-                filter_field = param.replace('filter_', '')
-                # Manejar casos especiales para filtros de fecha y relaciones
-                if filter_field.endswith('_date'):
-                    # Usar __date si es un filtro de fecha (YYYY-MM-DD)
-                    queryset = queryset.filter(**{f"{filter_field}__date": value})
-                elif filter_field.endswith('_range'):
-                    # Formato esperado: start_date,end_date
-                    base_field = filter_field.replace('_range', '')
-                    try:
-                        start, end = value.split(',')
-                        if start:
-                            queryset = queryset.filter(**{f"{base_field}__gte": start})
-                        if end:
-                            queryset = queryset.filter(**{f"{base_field}__lte": end})
-                    except ValueError:
-                        pass  # Ignorar valores incorrectos
-                else:
-                    queryset = queryset.filter(**{filter_field: value})
-        
-        # Aplicar ordenamiento si está definido en la URL
-        order_param = self.request.GET.get('order_by', '')
-        if order_param:
-            # Manejar múltiples campos de ordenamiento separados por comas
-            if ',' in order_param:
-                order_fields = [field.strip() for field in order_param.split(',')]
-                queryset = queryset.order_by(*order_fields)
-            else:
-                queryset = queryset.order_by(order_param)
-        # Ordenamiento por defecto definido en la clase
-        elif self.order_by:
-            # Si es string, usarlo directamente
-            if isinstance(self.order_by, str):
-                queryset = queryset.order_by(self.order_by)
-            # Si es lista o tupla, desempaquetar los valores
-            elif isinstance(self.order_by, (list, tuple)):
-                queryset = queryset.order_by(*self.order_by)
+                queryset = self.apply_filter(queryset, param.replace('filter_', ''), value)
+
+        # Aplicar ordenamiento de la URL o el definido en la clase
+        order_fields = self.get_order_fields()
+        if order_fields:
+            queryset = queryset.order_by(*order_fields)
         
         # Select related para optimizar consultas con relaciones frecuentes
         # Solo aplicar si existen estos campos
@@ -82,9 +136,136 @@ class OptimizedListView(ListView):
             queryset = queryset.select_related(*select_related_fields)
             
         return queryset
-    
+
+    def apply_filter(self, queryset, name, value):
+        """Aplicar el filtro filter_<name>, ignorando los no permitidos o inválidos"""
+        filters = self.get_compiled_filters()
+        if filters is None:
+            return self.apply_undeclared_filter(queryset, name, value)
+
+        list_filter = filters.get(name)
+        if list_filter is None:
+            print(f"Filtro no permitido: {name}")
+            self.filter_errors.append(_('Filtro no permitido: %(name)s') % {'name': name})
+            return queryset
+        try:
+            return queryset.filter(list_filter.build(value))
+        except ValidationError as e:
+            print(f"Valor inválido para el filtro {name}: {value} ({e})")
+            self.filter_errors.append(_('Valor inválido para el filtro %(name)s') % {'name': name})
+            return queryset
+
+    def apply_undeclared_filter(self, queryset, filter_field, value):
+        """Filtros de vistas sin filter_fields: el nombre es el lookup"""
+        try:
+            # Manejar casos especiales para filtros de fecha y relaciones
+            if filter_field.endswith('_date'):
+                # Usar __date si es un filtro de fecha (YYYY-MM-DD)
+                return queryset.filter(**{f"{filter_field}__date": value})
+            elif filter_field.endswith('_range'):
+                # Formato esperado: start_date,end_date
+                base_field = filter_field.replace('_range', '')
+                try:
+                    start, end = value.split(',')
+                except ValueError:
+                    return queryset  # Ignorar valores incorrectos
+                if start:
+                    queryset = queryset.filter(**{f"{base_field}__gte": start})
+                if end:
+                    queryset = queryset.filter(**{f"{base_field}__lte": end})
+                return queryset
+            return queryset.filter(**{filter_field: value})
+        except (FieldError, ValidationError, ValueError) as e:
+            print(f"Filtro inválido {filter_field}={value}: {e}")
+            self.filter_errors.append(_('Filtro inválido: %(name)s') % {'name': filter_field})
+            return queryset
+
+    def get_order_fields(self):
+        """Campos de ordenamiento de la URL (validados) o los definidos en la clase"""
+        order_param = self.request.GET.get('order_by', '')
+        # Manejar múltiples campos de ordenamiento separados por comas
+        requested = [field.strip() for field in order_param.split(',') if field.strip()]
+
+        ordering = self.get_compiled_ordering()
+        order_fields = []
+        for field in requested:
+            descending = field.startswith('-')
+            name = field.lstrip('-')
+            if ordering is not None:
+                if name not in ordering:
+                    print(f"Ordenamiento no permitido: {name}")
+                    continue
+                name = ordering[name][0]
+            else:
+                try:
+                    valid = resolve_lookup(self.model, name)[1] == 'exact'
+                except ValueError:
+                    valid = False
+                if not valid:
+                    print(f"Ordenamiento inválido: {name}")
+                    continue
+            order_fields.append(f"-{name}" if descending else name)
+
+        if order_fields:
+            return order_fields
+        # Ordenamiento por defecto definido en la clase
+        if isinstance(self.order_by, str):
+            return [self.order_by]
+        if isinstance(self.order_by, (list, tuple)):
+            return list(self.order_by)
+        return []
+
+    def search_queryset(self, queryset, search_term):
+        """Filtrar por el término usando el índice de búsqueda o __icontains"""
+        backend = get_search_backend(queryset.db) if self.use_search_index else None
+        if backend is not None:
+            searched = backend.search(queryset, self.search_fields, search_term)
+            if searched is not None:
+                return searched
+
+        filters = Q()
+        for field in self.search_fields:
+            filters |= Q(**{f"{field}__icontains": search_term})
+        return queryset.filter(filters)
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.pagination_mode != 'cursor':
+            return super().paginate_queryset(queryset, page_size)
+
+        try:
+            paginator = CursorPaginator(queryset, page_size, count_mode=self.cursor_count_mode)
+        except ValueError as e:
+            # Ordenamientos por expresiones o relaciones: volver a OFFSET
+            print(f"Paginación por cursor no disponible ({e}), usando paginación por páginas")
+            return super().paginate_queryset(queryset, page_size)
+
+        try:
+            page = paginator.get_page(self.request.GET.get(self.cursor_param))
+        except InvalidCursor:
+            raise Http404(_('Cursor de paginación inválido'))
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def get_cursor_url(self, cursor=None):
+        """Querystring de la página indicada conservando búsqueda, filtros y orden"""
+        params = self.request.GET.copy()
+        params.pop('page', None)
+        params.pop(self.cursor_param, None)
+        if cursor:
+            params[self.cursor_param] = cursor
+        return f'?{params.urlencode()}'
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+
+        # Enlaces de la paginación por cursor
+        page_obj = context.get('page_obj')
+        if isinstance(page_obj, CursorPage):
+            context['cursor_pagination'] = True
+            context['first_page_url'] = self.get_cursor_url()
+            if page_obj.has_next():
+                context['next_page_url'] = self.get_cursor_url(page_obj.next_cursor)
+            if page_obj.has_previous():
+                context['previous_page_url'] = self.get_cursor_url(page_obj.previous_cursor)
         
         # Pasar los parámetros de búsqueda al contexto para mantener estado
         context['search_term'] = self.request.GET.get('search', '')
@@ -96,6 +277,9 @@ class OptimizedListView(ListView):
             if k.startswith('filter_') and v
         }
         
+        # Filtros u ordenamientos ignorados por no ser válidos
+        context['filter_errors'] = getattr(self, 'filter_errors', [])
+
         # Pasar parámetro de ordenamiento
         context['current_order'] = self.request.GET.get('order_by', '')
         
@@ -113,15 +297,92 @@ class OptimizedSecureListView(LoginRequiredMixin, PermissionRequiredMixin, Optim
     """
     Versión segura de la vista de lista optimizada que requiere autenticación y permisos.
     Incluye funcionalidades comunes para todas las vistas de lista seguras.
+
+    El total del paginador y las facetas (conteos por valor de facet_fields) se
+    guardan en caché por consulta y se invalidan al guardar o eliminar registros
+    de los modelos involucrados, así navegar por un mismo listado filtrado no
+    repite los COUNT(*).
     """
     template_name = 'core/list.html'  # Template por defecto
     add_permission = None  # Permiso para añadir registros
     edit_permission = None  # Permiso para editar registros
     delete_permission = None  # Permiso para eliminar registros
+    use_count_cache = True  # Guardar en caché el total y las facetas
+    facet_fields = []  # Campos para contar registros por valor (context['facets'])
+    # Otros modelos ('app_label.Model') que la consulta une y no aparecen en los
+    # campos declarados (p.ej. en scope_queryset); sus cambios invalidan los conteos
+    count_cache_dependencies = []
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.model is not None and cls.use_count_cache:
+            # La invalidación se conecta en BaseConfig.ready solo para los modelos
+            # declarados: sin ella los conteos en caché quedarían desactualizados
+            labels = {model._meta.label for model in cls.get_count_cache_models()}
+            missing = labels - get_list_count_cache_labels()
+            if missing:
+                print(
+                    f"{cls.__qualname__}: caché de conteos desactivada, faltan en "
+                    f"LIST_COUNT_CACHE['MODELS']: {', '.join(sorted(missing))}"
+                )
+                cls.use_count_cache = False
+
+    @classmethod
+    def get_count_cache_models(cls):
+        """
+        Modelo de la vista, los relacionados que recorren sus búsquedas, filtros,
+        ordenamientos y facetas, y los de count_cache_dependencies
+        """
+        paths = [*cls.search_fields, *cls.facet_fields]
+        for spec in (cls.filter_fields, cls.order_fields):
+            if isinstance(spec, dict):
+                paths.extend(spec.values())
+            elif spec:
+                paths.extend(spec)
+
+        models = {cls.model}
+        for path in paths:
+            try:
+                fields, _ = resolve_lookup(cls.model, path.lstrip('-'))
+            except ValueError:
+                continue
+            models.update(field.related_model for field in fields if field.related_model is not None)
+        for dependency in cls.count_cache_dependencies:
+            models.add(apps.get_model(dependency) if isinstance(dependency, str) else dependency)
+        return models
+
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        if not self.use_count_cache:
+            return super().get_paginator(queryset, per_page, orphans, allow_empty_first_page, **kwargs)
+        return CachedCountPaginator(
+            queryset,
+            per_page,
+            orphans=orphans,
+            allow_empty_first_page=allow_empty_first_page,
+            **kwargs
+        )
+
+    def get_cached_count(self, queryset=None):
+        """Total de registros del listado filtrado"""
+        queryset = self.object_list if queryset is None else queryset
+        if not self.use_count_cache:
+            return queryset.count()
+        return get_list_count_cache().count(queryset)
+
+    def get_facet(self, field, queryset=None):
+        """[(valor, total)] del listado filtrado agrupado por el campo"""
+        queryset = self.object_list if queryset is None else queryset
+        if not self.use_count_cache:
+            return list(queryset.order_by().values_list(field).annotate(total=Count('pk')).order_by(field))
+        return get_list_count_cache().facet(queryset, field)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
+        # Conteos por valor de los campos de facet_fields
+        if self.facet_fields:
+            context['facets'] = {field: self.get_facet(field) for field in self.facet_fields}
+
         # Datos básicos
         context['title'] = getattr(self, 'title', f'Listado de {self.model._meta.verbose_name_plural.title()}')
         context['entity'] = getattr(self, 'entity', self.model._meta.verbose_name.title())
@@ -1,10 +1,9 @@
 import os
-import hashlib
+import time
 from datetime import datetime, timedelta
 from io import BytesIO
 
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
-from django.core.cache import cache
 from django.http import HttpResponse, FileResponse
 from django.utils.translation import gettext as _
 from django.views.generic import View
@@ -16,6 +15,8 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
 
+from apps.base.services.pdfcache import get_pdf_cache, get_pdf_cache_labels, make_cache_key, register_report_view
+
 
 class GenericPDFReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
     """
@@ -31,6 +32,15 @@ class GenericPDFReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
     - logo_path: Ruta al logo para el encabezado (opcional)
     - cache_timeout: Tiempo en segundos que el PDF permanecerá en caché (por defecto 1 hora)
     - use_cache: Si se debe usar caché para los PDFs (por defecto True)
+    - cache_dependencies: Otros modelos ('app_label.Model') cuyos cambios invalidan el PDF.
+      El modelo y sus dependencias deben estar en settings.PDF_CACHE['MODELS'];
+      si falta alguno, la vista no usa la caché
+    - prerender_on_save: Generar en segundo plano el PDF de un objeto al guardarlo (por defecto False)
+
+    La caché es compartida entre procesos (settings.PDF_CACHE) y las claves incluyen
+    la versión de los modelos, que se incrementa al guardar o eliminar registros.
+    Se registran aciertos, fallos, tiempo de generación y consultas por objeto
+    (ver los comandos pdf_cache_stats y warm_pdf_cache).
     - force_refresh: Parámetro URL para forzar la regeneración del PDF (por defecto 'refresh')
     """
     model = None  # Debe ser definido en la clase hija
@@ -41,8 +51,25 @@ class GenericPDFReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
     logo_path = None  # Ruta al logo para el encabezado
     cache_timeout = 3600  # 1 hora por defecto
     use_cache = True  # Usar caché por defecto
+    cache_dependencies = []  # Modelos relacionados que aparecen en el PDF
+    prerender_on_save = False  # Generar el PDF en Celery al guardar el objeto
     force_refresh = 'refresh'  # Parámetro URL para forzar la regeneración del PDF
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Registrar las vistas concretas para la pregeneración y el precalentamiento
+        if cls.model is not None:
+            register_report_view(cls)
+            # La invalidación se conecta en BaseConfig.ready solo para los modelos
+            # declarados: sin ella los PDFs en caché quedarían desactualizados
+            missing = set(cls.get_cache_models()) - get_pdf_cache_labels()
+            if cls.use_cache and missing:
+                print(
+                    f"{cls.__qualname__}: caché de PDFs desactivada, faltan en "
+                    f"PDF_CACHE['MODELS']: {', '.join(sorted(missing))}"
+                )
+                cls.use_cache = False
+
     def setup(self, request, *args, **kwargs):
         super().setup(request, *args, **kwargs)
         if self.model:
@@ -188,38 +215,97 @@ class GenericPDFReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
         """
         raise NotImplementedError("Las clases hijas deben implementar este método")
 
+    @classmethod
+    def get_cache_models(cls):
+        """Modelos cuyos cambios invalidan los PDFs de esta vista"""
+        labels = [cls.model._meta.label]
+        for dependency in cls.cache_dependencies:
+            labels.append(dependency if isinstance(dependency, str) else dependency._meta.label)
+        return labels
+
     def get_cache_key(self, obj=None):
         """
         Generar una clave única para la caché basada en el objeto o queryset.
+        La clave es un hash de la vista, el objeto o la consulta del listado y la
+        versión actual de los modelos involucrados.
         """
+        pdf_cache = get_pdf_cache()
+        versions = [f"{label}:{pdf_cache.get_version(label)}" for label in self.get_cache_models()]
+        view_path = f"{self.__class__.__module__}.{self.__class__.__qualname__}"
+
         if obj:
             # Clave para un objeto específico
-            key = f"pdf_report_{self.model_name}_{obj.pk}"
+            return make_cache_key(view_path, 'object', obj.pk, *versions)
+
+        # Clave para un listado: la consulta diferencia entre distintos filtros
+        queryset = self.get_queryset()
+        return make_cache_key(view_path, 'list', str(queryset.query), *versions)
+
+    def get_cached_pdf(self, cache_key):
+        """Obtener un PDF de la caché (None si no está o la caché no responde)"""
+        try:
+            cached_pdf = get_pdf_cache().get(cache_key)
+            self.record_stats(**{'hits' if cached_pdf else 'misses': 1})
+            return cached_pdf
+        except Exception as e:
+            print(f"Error al leer la caché de PDFs: {e}")
+            return None
+
+    def set_cached_pdf(self, cache_key, content):
+        """Guardar un PDF en la caché sin interrumpir la respuesta si falla"""
+        try:
+            get_pdf_cache().set(cache_key, content, self.cache_timeout)
+        except Exception as e:
+            print(f"Error al guardar en la caché de PDFs: {e}")
 
-            # Incluir la fecha de última modificación si está disponible
-            if hasattr(obj, 'updated_at'):
-                key += f"_{obj.updated_at.strftime('%Y%m%d%H%M%S')}"
-            elif hasattr(obj, 'modified_at'):
-                key += f"_{obj.modified_at.strftime('%Y%m%d%H%M%S')}"
+    def record_stats(self, **values):
+        """Acumular contadores de la caché para el modelo de la vista"""
+        try:
+            get_pdf_cache().incr_stats(self.model._meta.label, **values)
+        except Exception as e:
+            print(f"Error al registrar métricas de la caché de PDFs: {e}")
 
-            return key
+    def record_view(self, obj):
+        """Contar la consulta del PDF del objeto (warm_pdf_cache usa los más vistos)"""
+        try:
+            get_pdf_cache().record_view(self.model._meta.label, obj.pk)
+        except Exception as e:
+            print(f"Error al registrar la consulta del PDF: {e}")
+
+    def render_pdf(self, obj=None, queryset=None):
+        """Generar el PDF del objeto (o del listado) midiendo el tiempo de generación"""
+        start = time.monotonic()
+        if obj is not None:
+            response = self.generate_pdf_report(obj)
         else:
-            # Clave para un listado
-            # Incluir un hash del queryset para diferenciar entre diferentes filtros
-            queryset = self.get_queryset()
-            queryset_str = str(queryset.query)
-            queryset_hash = hashlib.md5(queryset_str.encode()).hexdigest()
+            response = self.generate_pdf_list_report(queryset)
+        self.record_stats(renders=1, render_time=time.monotonic() - start)
+        return response
 
-            return f"pdf_list_report_{self.model_name}_{queryset_hash}"
+    def prerender(self, obj):
+        """
+        Generar y guardar en caché el PDF del objeto si aún no está.
+        Devuelve True si se generó, False si ya estaba en caché.
+        """
+        cache_key = self.get_cache_key(obj)
+        if get_pdf_cache().get(cache_key):
+            return False
+        response = self.render_pdf(obj)
+        self.set_cached_pdf(cache_key, response.content)
+        return True
 
     def get_pdf_response(self, obj, force_refresh=False):
         """
         Obtener la respuesta HTTP con el PDF, ya sea de la caché o generándolo.
         """
+        cache_key = self.get_cache_key(obj) if self.use_cache else None
+
+        if self.use_cache:
+            self.record_view(obj)
+
         if self.use_cache and not force_refresh:
             # Intentar obtener el PDF de la caché
-            cache_key = self.get_cache_key(obj)
-            cached_pdf = cache.get(cache_key)
+            cached_pdf = self.get_cached_pdf(cache_key)
 
             if cached_pdf:
                 # Si el PDF está en caché, devolverlo
@@ -229,12 +315,11 @@ class GenericPDFReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
                 return response
 
         # Si no está en caché o se fuerza la regeneración, generar el PDF
-        response = self.generate_pdf_report(obj)
+        response = self.render_pdf(obj)
 
         # Guardar el PDF en caché si está habilitado
         if self.use_cache:
-            cache_key = self.get_cache_key(obj)
-            cache.set(cache_key, response.content, self.cache_timeout)
+            self.set_cached_pdf(cache_key, response.content)
 
         return response
 
@@ -242,10 +327,11 @@ class GenericPDFReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
         """
         Obtener la respuesta HTTP con el PDF de lista, ya sea de la caché o generándolo.
         """
+        cache_key = self.get_cache_key() if self.use_cache else None
+
         if self.use_cache and not force_refresh:
             # Intentar obtener el PDF de la caché
-            cache_key = self.get_cache_key()
-            cached_pdf = cache.get(cache_key)
+            cached_pdf = self.get_cached_pdf(cache_key)
 
             if cached_pdf:
                 # Si el PDF está en caché, devolverlo
@@ -255,12 +341,11 @@ class GenericPDFReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
                 return response
 
         # Si no está en caché o se fuerza la regeneración, generar el PDF
-        response = self.generate_pdf_list_report(queryset)
+        response = self.render_pdf(queryset=queryset)
 
         # Guardar el PDF en caché si está habilitado
         if self.use_cache:
-            cache_key = self.get_cache_key()
-            cache.set(cache_key, response.content, self.cache_timeout)
+            self.set_cached_pdf(cache_key, response.content)
 
         return response
 
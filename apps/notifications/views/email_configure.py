@@ -107,12 +107,12 @@ class EmailConfigurationListView(OptimizedSecureListView):
         # URL de cancelación
         context['cancel_url'] = reverse_lazy('dashboard')
         
-        # Agregar estadísticas
-        current_configurations = self.get_queryset()
+        # Agregar estadísticas (conteos en caché sobre el listado ya filtrado)
+        active_counts = dict(self.get_facet('is_active'))
         context['stats'] = {
-            'total_count': current_configurations.count(),
-            'active_count': current_configurations.filter(is_active=True).count(),
-            'inactive_count': current_configurations.filter(is_active=False).count(),
+            'total_count': self.get_cached_count(),
+            'active_count': active_counts.get(True, 0),
+            'inactive_count': active_counts.get(False, 0),
         }
         
         return context
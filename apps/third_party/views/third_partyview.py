@@ -29,6 +29,17 @@ class ThirdPartyListView(OptimizedSecureListView):
     search_fields = ['first_name', 'last_name', 'document_number', 'email', 'mobile']
     # Ordenamiento por defecto
     order_by = ('last_name', 'first_name')
+    # Filtros filter_<nombre> y ordenamientos permitidos
+    filter_fields = {
+        'tipo': 'third_party_type__code',
+        'tipo_documento': 'document_type',
+        'documento': 'document_number',
+        'email': 'email',
+        'pais': 'country',
+        'activo': 'is_active',
+        'creado': 'created_at__range',
+    }
+    order_fields = ['first_name', 'last_name', 'document_number', 'email', 'created_at']
     
     # Atributos específicos
     title = _('Listado de Terceros')
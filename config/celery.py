@@ -0,0 +1,27 @@
+# config/celery.py
+import os
+
+from celery import Celery
+from celery.signals import worker_init
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.base')
+
+app = Celery('config')
+
+# Toda la configuración de Celery se lee de settings con el prefijo CELERY_
+app.config_from_object('django.conf:settings', namespace='CELERY')
+
+# Busca el módulo tasks de cada aplicación instalada
+app.autodiscover_tasks()
+
+
+@worker_init.connect
+def load_registered_views(**kwargs):
+    """
+    Las vistas se registran al importarse y conectan entonces las señales de sus
+    modelos (caché de PDFs, índices de búsqueda, conteos de listados). El worker
+    no carga las URLs por sí mismo: sin esto, sus guardados no actualizarían nada.
+    """
+    from django.urls import get_resolver
+
+    get_resolver().url_patterns
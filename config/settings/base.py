@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 import os
+import tempfile
 from pathlib import Path
 import environ
 from django.core.exceptions import ImproperlyConfigured
@@ -356,4 +357,140 @@ CELERY_TASK_TRACK_STARTED = True
 # --- Celery Beat Configuration (SOLO si usas ScheduledMessage con DatabaseScheduler) ---
 # Asegúrate de añadir 'django_celery_beat' a INSTALLED_APPS
 # y ejecutar sus migraciones.
-# CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
\ No newline at end of file
+# CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+
+# --- Importación CSV ---
+# Directorio donde se preparan las importaciones CSV antes de confirmarlas.
+# En despliegues con varios servidores debe ser un volumen compartido.
+CSV_IMPORT_STAGING_DIR = os.environ.get(
+    'CSV_IMPORT_STAGING_DIR',
+    os.path.join(tempfile.gettempdir(), 'csv_imports')
+)
+
+# --- Exportaciones en segundo plano ---
+# Directorio donde los trabajos de exportación guardan los archivos generados.
+# Debe ser compartido entre los servidores web y los workers de Celery.
+EXPORT_JOBS_DIR = os.environ.get(
+    'EXPORT_JOBS_DIR',
+    os.path.join(tempfile.gettempdir(), 'exports')
+)
+
+# --- Índices de búsqueda ---
+# Modelos con índice de búsqueda (rebuild_search_index) para los search_fields de
+# sus vistas de lista. En SQLite el índice es una tabla FTS5 aparte que se
+# actualiza con señales: BaseConfig.ready() conecta los receptores de estos
+# modelos en todos los procesos (web, Celery, comandos, shell). Un modelo que no
+# esté en la lista no se indexa y se busca con __icontains.
+SEARCH_INDEX = {
+    'MODELS': [
+        'auth.Group',
+        'base.User',
+        'base.Menu',
+        'base.MenuItem',
+        'third_party.ThirdParty',
+        'notifications.EmailConfiguration',
+        'notifications.SMSConfiguration',
+        'evaluations.Competence',
+        'evaluations.Evaluation',
+        'evaluations.Option',
+        'evaluations.ProfessionalArea',
+        'evaluations.Question',
+        'evaluations.Report',
+    ],
+}
+
+# --- Caché de PDFs ---
+# Caché compartida para los PDFs de GenericPDFReportView.
+# BACKEND: 'filesystem' (LOCATION = directorio compartido) o 'redis'
+# (LOCATION = URL de Redis o de un servidor compatible).
+# MODELS: modelos de los reportes y sus cache_dependencies. BaseConfig.ready()
+# conecta su invalidación en todos los procesos (web, Celery, comandos, shell);
+# una vista con algún modelo fuera de la lista no usa la caché.
+PDF_CACHE = {
+    'BACKEND': os.environ.get('PDF_CACHE_BACKEND', 'filesystem'),
+    'LOCATION': os.environ.get('PDF_CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'pdf_cache')),
+    'MAX_SIZE': int(os.environ.get('PDF_CACHE_MAX_SIZE', 512 * 1024 * 1024)),  # bytes
+    'MODELS': [],
+}
+
+# --- Conteos de listados ---
+# Caché de los conteos y facetas de los listados (OptimizedSecureListView). Debe
+# ser compartida por todos los procesos que guardan datos (web y Celery) para que
+# las invalidaciones lleguen a todos: con LIST_COUNT_CACHE_URL (Redis) se usa el
+# alias 'list_counts'; sin ella el alias es una caché local y los conteos no se
+# guardan en caché.
+# MODELS: modelos que recorren los listados (el de la vista, los relacionados de
+# sus búsquedas, filtros, ordenamientos y facetas, y count_cache_dependencies).
+# BaseConfig.ready() conecta su invalidación en todos los procesos; una vista o
+# consulta con algún modelo fuera de la lista no usa la caché.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+LIST_COUNT_CACHE_URL = os.environ.get('LIST_COUNT_CACHE_URL')
+if LIST_COUNT_CACHE_URL:
+    CACHES['list_counts'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': LIST_COUNT_CACHE_URL,
+    }
+LIST_COUNT_CACHE = {
+    'ALIAS': 'list_counts' if LIST_COUNT_CACHE_URL else 'default',
+    'TIMEOUT': 120,
+    'MODELS': [
+        'auth.Group',
+        'base.Country',
+        'base.DocType',
+        'base.Menu',
+        'base.MenuItem',
+        'base.User',
+        'evaluations.Answer',
+        'evaluations.Competence',
+        'evaluations.Evaluation',
+        'evaluations.Option',
+        'evaluations.ProfessionalArea',
+        'evaluations.Question',
+        'evaluations.Report',
+        'notifications.EmailConfiguration',
+        'notifications.SMSConfiguration',
+        'third_party.ThirdParty',
+        'third_party.ThirdPartyType',
+    ],
+}
+
+# --- Auditoría ---
+# Los registros de auditoría se escriben por lotes al confirmarse cada transacción.
+# MODE: 'sync' (bulk_create en el mismo proceso) o 'celery' (se envían a una tarea;
+# si no se pueden encolar se escriben en el proceso).
+AUDIT_WRITER = {
+    'MODE': os.environ.get('AUDIT_WRITER_MODE', 'sync'),
+    'BATCH_SIZE': 500,
+}
+
+# AuditLog se consulta y archiva por meses (AuditLog.partition = AAAAMM).
+# HOT_MONTHS: meses recientes que muestra la vista de auditoría sin filtro de fechas.
+# ARCHIVE_AFTER_MONTHS / ARCHIVE_DIR: ver el comando archive_audit_logs.
+AUDIT_PARTITIONS = {
+    'HOT_MONTHS': int(os.environ.get('AUDIT_HOT_MONTHS', 3)),
+    'ARCHIVE_AFTER_MONTHS': int(os.environ.get('AUDIT_ARCHIVE_AFTER_MONTHS', 12)),
+    'ARCHIVE_DIR': os.environ.get('AUDIT_ARCHIVE_DIR', BASE_DIR / 'archive' / 'audit'),
+}
+
+# Los UPDATE auditados guardan solo los campos modificados; cada SNAPSHOT_INTERVAL
+# actualizaciones de un objeto se guarda su estado completo, así reconstruirlo
+# (AuditLog.objects.state_at) aplica a lo sumo SNAPSHOT_INTERVAL - 1 diffs.
+# 1 = siempre el estado completo.
+AUDIT_DIFFS = {
+    'SNAPSHOT_INTERVAL': int(os.environ.get('AUDIT_SNAPSHOT_INTERVAL', 20)),
+}
+
+# Exportación NDJSON de AuditLog (vista audit/export/ y comando export_audit_logs).
+# SETTLE_SECONDS: se retienen los registros insertados en los últimos segundos
+# para no saltarse los que aún no se confirmaron; debe superar la duración de la
+# escritura de un lote de auditoría (AuditWriter.write_logs) y la diferencia de
+# reloj entre servidores.
+AUDIT_EXPORT = {
+    'SETTLE_SECONDS': int(os.environ.get('AUDIT_EXPORT_SETTLE_SECONDS', 5)),
+    'MAX_LIMIT': 10000,
+    'CHUNK_SIZE': 2000,
+}